@@ -0,0 +1,79 @@
+"""
+Merge throughput and output size, PyPDF2 vs pikepdf.
+
+Builds N input PDFs that each embed the same TrueType font and logo image
+(as files produced by one template would), merges them with every available
+engine and reports time, pages/s and output size.
+
+    python benchmarks/merge_bench.py --files 40 --pages 10
+"""
+from __future__ import annotations
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import reportlab
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from utils.pdf_tools import MERGE_ENGINES
+
+
+def _logo() -> bytes:
+    img = Image.effect_noise((400, 400), 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def make_inputs(out_dir: Path, files: int, pages: int) -> list[str]:
+    pdfmetrics.registerFont(TTFont("Vera", os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")))
+    logo = _logo()
+    paths = []
+    for n in range(files):
+        path = out_dir / f"in_{n:03d}.pdf"
+        c = canvas.Canvas(str(path), pagesize=A4)
+        for p in range(pages):
+            c.drawImage(ImageReader(io.BytesIO(logo)), 40, 600, 150, 150)
+            c.setFont("Vera", 11)
+            for line in range(40):
+                c.drawString(40, 560 - line * 12, f"Document {n} page {p + 1} line {line}: the quick brown fox")
+            c.showPage()
+        c.save()
+        paths.append(str(path))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        inputs = make_inputs(tmp, args.files, args.pages)
+        in_size = sum(os.path.getsize(p) for p in inputs)
+        total_pages = args.files * args.pages
+        print(f"{args.files} files, {total_pages} pages, {in_size / 1e6:.1f} MB in")
+        print(f"{'engine':<10}{'seconds':>10}{'pages/s':>10}{'out MB':>10}")
+        for name, engine in MERGE_ENGINES.items():
+            out = tmp / f"merged_{name}.pdf"
+            start = time.perf_counter()
+            engine(inputs, out, None)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10}{elapsed:>10.2f}{total_pages / elapsed:>10.0f}{out.stat().st_size / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+TXT -> PDF throughput in MB/s: bulk text objects vs one drawString per line.
+
+Generates a log-like text file (timestamped lines of 4-30 words, so many
+need wrapping), renders it with both layouts of utils/text_pdf.py and with
+the previous drawString loop, and reports time, MB/s, pages and output size.
+
+    python benchmarks/txt_pdf_bench.py --mb 20
+"""
+from __future__ import annotations
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from utils.text_pdf import txt_to_pdf
+
+WORDS = ("GET POST /api/v1/items status=200 latency_ms=12 user_id=8812 session trace_id=4f1c "
+         "error warning request completed handler retry upstream timeout cache hit miss").split()
+
+
+def make_log(path: Path, mb: float):
+    rng = random.Random(1)
+    with open(path, "w") as f:
+        n = 0
+        while f.tell() < mb * 1e6:
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30)))
+            f.write(f"2026-10-17T10:{n // 60 % 60:02d}:{n % 60:02d}Z [{rng.choice(('INFO', 'WARN', 'DEBUG'))}] {words}\n")
+            n += 1
+
+
+def draw_string_loop(src: Path, out: Path) -> int:
+    """The previous converter: one drawString per line, no wrapping."""
+    c = canvas.Canvas(str(out), pagesize=A4)
+    width, height = A4
+    y = height - 40
+    pages = 1
+    with open(src, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            c.drawString(40, y, line.strip())
+            y -= 14
+            if y < 40:
+                c.showPage()
+                pages += 1
+                y = height - 40
+    c.save()
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=float, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        src = tmp / "log.txt"
+        make_log(src, args.mb)
+        size = src.stat().st_size / 1e6
+        print(f"{size:.1f} MB of text")
+        print(f"{'mode':<14}{'seconds':>10}{'MB/s':>8}{'pages':>8}{'out MB':>8}")
+        runs = {
+            "monospace": lambda out: txt_to_pdf(src, out, monospace=True),
+            "proportional": lambda out: txt_to_pdf(src, out, monospace=False),
+            "drawString": lambda out: draw_string_loop(src, out),
+        }
+        for name, run in runs.items():
+            out = tmp / f"{name}.pdf"
+            start = time.perf_counter()
+            pages = run(out)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<14}{elapsed:>10.2f}{size / elapsed:>8.2f}{pages:>8}{out.stat().st_size / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -53,3 +53,18 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+def update_document(collection_name: str, filter_dict: dict, data: Union[BaseModel, dict]):
+    """Update the first matching document with timestamp"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    if isinstance(data, BaseModel):
+        data_dict = data.model_dump()
+    else:
+        data_dict = data.copy()
+
+    data_dict['updated_at'] = datetime.now(timezone.utc)
+
+    result = db[collection_name].update_one(filter_dict, {"$set": data_dict})
+    return result.modified_count
@@ -1,13 +1,21 @@
+import asyncio
+import hashlib
+import json
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, NamedTuple, Optional
+from urllib.parse import quote
 
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Form
+from fastapi import Depends, FastAPI, HTTPException, Form, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from utils.pdf_tools import (
     merge_pdfs_task,
@@ -15,22 +23,91 @@ from utils.pdf_tools import (
     reorder_pages_task,
     rotate_pages_task,
     compress_pdf_task,
+    compress_to_target_task,
     convert_task,
-    generate_pdf_thumbnails,
+    page_count,
     edit_to_docx_task,
     edit_to_pdf_task,
 )
+from utils.archive import follow_dir, stream_zip
+from utils.ghostscript import PDFSETTINGS
+from utils.extract import ENGINES as EXTRACT_ENGINES, EXTRACT_ENGINE
+from utils.converters import CONVERTERS, find_route, normalize as normalize_format, targets as conversion_targets
+from utils.events import JobEvents
+from utils.executor import JobExecutor, QueueFull
+from utils.job_store import TERMINAL_STATUSES, get_job_store
+from utils.scheduler import estimate_cost
+from utils.pipeline import MANIFEST as PIPELINE_MANIFEST, PipelineError, final_steps, plan, run_pipeline_task
+from utils.blob_store import BlobStore, cached_task, file_digest
+from utils.thumbnails import (
+    SPRITE_COLUMNS,
+    SPRITE_PER_SHEET,
+    SPRITE_SIZE,
+    THUMBNAIL_SIZE,
+    RasterizerUnavailable,
+    ThumbnailCache,
+    clamp_size,
+    clamp_sprite,
+    image_format,
+    media_type,
+    render_page,
+    render_sheet,
+    sprite_index,
+)
+from utils.uploads import ResumableUpload, StreamingUploadParser, UploadConflict, UploadRejected
 
 BASE_DIR = Path(__file__).parent
 UPLOAD_DIR = BASE_DIR / "uploads"
 OUTPUT_DIR = BASE_DIR / "converted"
 STATIC_DIR = BASE_DIR / "static"
 TEMPLATES_DIR = BASE_DIR / "templates"
+BLOB_DIR = BASE_DIR / "blobs"
+DATA_DIR = BASE_DIR / "data"
+BATCH_DIR = DATA_DIR / "batches"
 
 for d in [UPLOAD_DIR, OUTPUT_DIR, STATIC_DIR, TEMPLATES_DIR]:
     d.mkdir(parents=True, exist_ok=True)
 
-app = FastAPI(title="All-File Converter + PDF/DOCX Editor")
+ALLOWED_TYPES = {
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "text/plain",
+    "image/jpeg",
+    "image/png",
+    "video/mp4",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "text/csv",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB per file
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # write buffer per upload; bounds memory, not file size
+# Seconds GET /split/{job_id}/download waits for a queued split to start before giving up
+SPLIT_START_WAIT = int(os.getenv("SPLIT_START_WAIT", 300))
+
+BLOB_STORE = BlobStore(BLOB_DIR)
+THUMBNAILS = ThumbnailCache(BLOB_DIR / "thumbnails")
+# Seconds between sweeps for unreferenced blobs and over-budget derived outputs
+BLOB_GC_INTERVAL = int(os.getenv("BLOB_GC_INTERVAL", 3600))
+
+
+async def _collect_blobs():
+    while True:
+        try:
+            await run_in_threadpool(BLOB_STORE.collect)
+        except OSError:
+            pass
+        await asyncio.sleep(BLOB_GC_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    collector = asyncio.create_task(_collect_blobs())
+    yield
+    collector.cancel()
+    EXECUTOR.shutdown()
+
+
+app = FastAPI(title="All-File Converter + PDF/DOCX Editor", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -53,13 +130,38 @@ class JobStatus(BaseModel):
     progress: int = 0
 
 
-# In-memory job store (metadata only; files on disk)
-JOB_STORE: dict[str, JobStatus] = {}
+# Persistent job store (metadata only; files on disk), shared by all workers.
+# Backend from JOB_STORE_BACKEND: sqlite (default), mongo or memory.
+JOB_STORE = get_job_store(path=DATA_DIR / "jobs.sqlite3")
+
+# Push channel for status changes (SSE / WebSocket), fed by every store update and task _update
+JOB_EVENTS = JobEvents()
+JOB_STORE.add_listener(JOB_EVENTS.publish)
+
+# CPU-bound tasks run in worker processes (JOB_WORKERS, JOB_TIMEOUT), never in the web process.
+# Queue depth per operation is capped by JOB_QUEUE_LIMIT / JOB_QUEUE_LIMIT_<OPERATION>.
+EXECUTOR = JobExecutor(JOB_STORE, cancel_dir=DATA_DIR / "cancel")
+
+
+def get_tenant(request: Request, x_api_key: Optional[str] = Header(None)) -> str:
+    """Fair-share key: the caller's API key, else its address."""
+    if x_api_key:
+        return "key:" + hashlib.sha256(x_api_key.encode()).hexdigest()[:16]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+async def submit_job(job_id: str, operation: str, fn, *args, inputs: List[str] = (), outputs: List[Path] = (),
+                     tenant: str = "anonymous"):
+    cost = await run_in_threadpool(estimate_cost, operation, inputs)
+    try:
+        EXECUTOR.submit(job_id, operation, fn, *args, tenant=tenant, cost=cost, outputs=outputs)
+    except QueueFull as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
 
 
 def new_job(status: str = "queued", message: str = "") -> str:
     job_id = uuid.uuid4().hex
-    JOB_STORE[job_id] = JobStatus(job_id=job_id, status=status, message=message, progress=0)
+    JOB_STORE.create(JobStatus(job_id=job_id, status=status, message=message, progress=0).model_dump())
     (UPLOAD_DIR / job_id).mkdir(parents=True, exist_ok=True)
     (OUTPUT_DIR / job_id).mkdir(parents=True, exist_ok=True)
     return job_id
@@ -69,7 +171,24 @@ def ensure_job(job_id: str) -> JobStatus:
     job = JOB_STORE.get(job_id)
     if not job:
         raise HTTPException(404, "Job not found")
-    return job
+    return JobStatus(**job)
+
+
+def job_files(job_id: str, pattern: str = "*") -> List[str]:
+    """Uploaded files for a job; dotfiles (in-progress resumable uploads) are never exposed to tasks."""
+    up_dir = UPLOAD_DIR / job_id
+    return sorted(str(p) for p in up_dir.glob(pattern) if p.is_file() and not p.name.startswith("."))
+
+
+def thumbnail_urls(job_id: str, saved_files: List[str]) -> List[str]:
+    # Lazy URLs, one per PDF page; GET /thumbnail renders a page on first access
+    thumb_urls: List[str] = []
+    for path in saved_files:
+        if path.lower().endswith(".pdf"):
+            name = quote(Path(path).name)
+            pages = page_count(path)
+            thumb_urls.extend(f"/thumbnail/{job_id}/{name}/{n}" for n in range(1, pages + 1))
+    return thumb_urls
 
 
 @app.get("/")
@@ -77,169 +196,655 @@ def health():
     return {"message": "Backend running", "version": "1.0"}
 
 
-@app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
+@app.post("/upload", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+        }}},
+    },
+})
+async def upload_files(request: Request):
     job_id = new_job(status="uploading", message="Saving files")
     dest_dir = UPLOAD_DIR / job_id
 
-    allowed = {
-        "application/pdf",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "text/plain",
-        "image/jpeg",
-        "image/png",
-        "video/mp4",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "text/csv",
-        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-    }
-    max_size = 100 * 1024 * 1024  # 100MB per file
-
-    saved_files = []
-    for f in files:
-        if f.content_type not in allowed:
-            raise HTTPException(status_code=400, detail=f"Unsupported type: {f.content_type}")
-        content = await f.read()
-        if len(content) > max_size:
-            raise HTTPException(status_code=400, detail=f"File too large: {f.filename}")
-        safe_name = Path(f.filename).name
-        out_path = dest_dir / safe_name
-        with open(out_path, "wb") as out:
-            out.write(content)
-        saved_files.append(str(out_path))
-
-    JOB_STORE[job_id].status = "uploaded"
-    JOB_STORE[job_id].message = "Files uploaded"
-
-    # Generate thumbnails for PDFs
-    thumb_urls: List[str] = []
-    for path in saved_files:
-        if path.lower().endswith(".pdf"):
-            try:
-                thumbs_dir = dest_dir / "thumbnails"
-                thumbs_dir.mkdir(exist_ok=True)
-                tpaths = generate_pdf_thumbnails(Path(path), thumbs_dir)
-                for p in tpaths:
-                    # Expose via mounted /uploads
-                    rel = p.relative_to(UPLOAD_DIR)
-                    thumb_urls.append(f"/uploads/{rel.as_posix()}")
-            except Exception:
-                pass
-
+    # Stream parts straight from the request body to disk instead of letting the
+    # form parser spool each file first, so peak memory is one chunk per upload.
+    try:
+        parser = StreamingUploadParser(
+            request.headers.get("content-type", ""), dest_dir,
+            ALLOWED_TYPES, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE, BLOB_STORE,
+        )
+    except UploadRejected as e:
+        JOB_STORE.update(job_id, status="error", message=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(parser.feed, chunk)
+        saved_files = [str(p) for p in parser.finish()]
+    except UploadRejected as e:
+        # Nothing of a rejected upload is kept, including files that arrived before the bad part
+        parser.discard()
+        JOB_STORE.update(job_id, status="error", message=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    if not saved_files:
+        JOB_STORE.update(job_id, status="error", message="No files uploaded")
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    JOB_STORE.update(job_id, status="uploaded", message="Files uploaded")
+
+    thumb_urls = await run_in_threadpool(thumbnail_urls, job_id, saved_files)
     return {"job_id": job_id, "files": saved_files, "thumbnails": thumb_urls}
 
 
+# ---------- Resumable uploads (tus-style) ----------
+
+def _load_session(job_id: str, upload_id: str) -> ResumableUpload:
+    if not job_id.isalnum() or not upload_id.isalnum():
+        raise HTTPException(404, "Upload session not found")
+    session = ResumableUpload(UPLOAD_DIR / job_id, upload_id)
+    if not session.meta_path.exists():
+        raise HTTPException(404, "Upload session not found")
+    return session
+
+
+def _session_headers(session: ResumableUpload) -> dict:
+    return {"Upload-Offset": str(session.offset), "Upload-Length": str(session.length), "Cache-Control": "no-store"}
+
+
+@app.post("/upload/sessions", status_code=201)
+def create_upload_session(
+    response: Response,
+    filename: str = Form(...),
+    length: int = Form(...),
+    content_type: str = Form(...),
+    job_id: Optional[str] = Form(None),
+):
+    if content_type not in ALLOWED_TYPES:
+        raise HTTPException(400, f"Unsupported type: {content_type}")
+    if not 0 < length <= MAX_UPLOAD_SIZE:
+        raise HTTPException(400, f"File too large: {filename}" if length > 0 else "Empty upload")
+    if job_id:
+        ensure_job(job_id)
+    else:
+        job_id = new_job(status="uploading", message="Receiving resumable upload")
+    try:
+        session = ResumableUpload.create(UPLOAD_DIR / job_id, filename, length, content_type)
+    except UploadRejected as e:
+        raise HTTPException(400, str(e))
+    location = f"/upload/sessions/{job_id}/{session.upload_id}"
+    response.headers["Location"] = location
+    response.headers.update(_session_headers(session))
+    return {"job_id": job_id, "upload_id": session.upload_id, "location": location, "offset": 0, "length": length}
+
+
+@app.api_route("/upload/sessions/{job_id}/{upload_id}", methods=["GET", "HEAD"])
+def upload_session_status(job_id: str, upload_id: str, response: Response):
+    session = _load_session(job_id, upload_id)
+    response.headers.update(_session_headers(session))
+    return {"job_id": job_id, "upload_id": upload_id, "offset": session.offset, "length": session.length}
+
+
+@app.patch("/upload/sessions/{job_id}/{upload_id}", status_code=204)
+async def upload_session_chunk(job_id: str, upload_id: str, request: Request):
+    session = _load_session(job_id, upload_id)
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(400, "Upload-Offset header required")
+    try:
+        with session.writer(offset) as writer:
+            async for chunk in request.stream():
+                await run_in_threadpool(writer.write, chunk)
+    except UploadConflict as e:
+        raise HTTPException(409, str(e), headers=_session_headers(session))
+    except UploadRejected as e:
+        raise HTTPException(400, str(e), headers=_session_headers(session))
+    return Response(status_code=204, headers=_session_headers(session))
+
+
+@app.post("/upload/sessions/{job_id}/{upload_id}/finalize")
+def finalize_upload_session(job_id: str, upload_id: str):
+    session = _load_session(job_id, upload_id)
+    try:
+        out_path = session.finalize(BLOB_STORE)
+    except UploadConflict as e:
+        raise HTTPException(409, str(e), headers=_session_headers(session))
+    except UploadRejected as e:
+        session.discard()
+        raise HTTPException(400, str(e))
+    if job_id not in JOB_STORE:
+        # Job record lost (e.g. memory backend restarted); files on disk are the source of truth
+        JOB_STORE.create(JobStatus(job_id=job_id, status="uploaded").model_dump())
+    JOB_STORE.update(job_id, status="uploaded", message="Files uploaded")
+    saved_files = [str(out_path)]
+    return {"job_id": job_id, "files": saved_files, "thumbnails": thumbnail_urls(job_id, saved_files)}
+
+
 @app.get("/job/{job_id}")
 def job_status(job_id: str):
     return ensure_job(job_id)
 
 
-@app.post("/merge")
-async def merge_pdfs(background_tasks: BackgroundTasks, job_id: Optional[str] = Form(None)):
-    job = job_id or new_job(status="processing", message="Merging PDFs")
-    up_dir = UPLOAD_DIR / job
-    if not up_dir.exists():
-        raise HTTPException(400, "Job has no uploads")
-    pdfs = sorted([str(p) for p in up_dir.glob("*.pdf")])
+def _job_stream(job: JobStatus):
+    return JOB_EVENTS.stream(job.job_id, job.model_dump(), lambda: JOB_STORE.get(job.job_id))
+
+
+@app.get("/job/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: one `status` event per (coalesced) change until the job finishes."""
+    job = ensure_job(job_id)
+
+    async def events():
+        async for state in _job_stream(job):
+            if state is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/job/{job_id}/ws")
+async def job_socket(websocket: WebSocket, job_id: str):
+    await websocket.accept()
+    data = JOB_STORE.get(job_id)
+    if not data:
+        await websocket.close(code=4404, reason="Job not found")
+        return
+    try:
+        async for state in _job_stream(JobStatus(**data)):
+            if state is not None:
+                await websocket.send_json(state)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.delete("/job/{job_id}")
+def cancel_job(job_id: str):
+    job = ensure_job(job_id)
+    if job.status in TERMINAL_STATUSES:
+        raise HTTPException(409, f"Job already {job.status}")
+    if not EXECUTOR.cancel(job_id) and job.status not in ("queued", "processing"):
+        raise HTTPException(409, "Job has no queued or running task")
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+# ---------- Operations ----------
+
+class PreparedTask(NamedTuple):
+    operation: str
+    fn: Callable
+    args: tuple
+    inputs: List[str]
+    outputs: List[Path]  # files or directories the task produces
+    result: dict  # response fields
+
+
+def _first_pdf(job_id: str) -> str:
+    ensure_job(job_id)
+    pdfs = job_files(job_id, "*.pdf")
     if not pdfs:
         raise HTTPException(400, "No PDFs uploaded for this job")
+    return pdfs[0]
 
-    out_path = OUTPUT_DIR / job / "merged.pdf"
-    background_tasks.add_task(merge_pdfs_task, pdfs, out_path, JOB_STORE[job])
-    return {"job_id": job, "output": str(out_path)}
 
+def _cached(operation: str, inputs: List[str], params: dict, out_path: Path, fn, *args) -> tuple:
+    return (BLOB_STORE, operation, inputs, params, out_path, fn, list(args))
 
-@app.post("/split")
-async def split_pdf(background_tasks: BackgroundTasks, job_id: str = Form(...), ranges: str = Form("")):
-    ensure_job(job_id)
-    up_dir = UPLOAD_DIR / job_id
-    pdfs = sorted([str(p) for p in up_dir.glob("*.pdf")])
+
+def prepare_merge(job_id: str) -> PreparedTask:
+    if not (UPLOAD_DIR / job_id).exists():
+        raise HTTPException(400, "Job has no uploads")
+    pdfs = job_files(job_id, "*.pdf")
     if not pdfs:
         raise HTTPException(400, "No PDFs uploaded for this job")
-    src_pdf = pdfs[0]
+    out_path = OUTPUT_DIR / job_id / "merged.pdf"
+    args = _cached("merge", pdfs, {}, out_path, merge_pdfs_task, pdfs, out_path)
+    return PreparedTask("merge", cached_task, args, pdfs, [out_path], {"output": str(out_path)})
+
 
+def prepare_split(job_id: str, ranges: str = "") -> PreparedTask:
+    src_pdf = _first_pdf(job_id)
     out_dir = OUTPUT_DIR / job_id / "split"
+    # Emptied by the task itself, so a rejected or still-queued request leaves earlier parts alone
     out_dir.mkdir(parents=True, exist_ok=True)
-    background_tasks.add_task(split_pdf_task, src_pdf, ranges, out_dir, JOB_STORE[job_id])
-    return {"job_id": job_id, "output_dir": str(out_dir)}
+    args = (src_pdf, ranges, out_dir)
+    return PreparedTask("split", split_pdf_task, args, [src_pdf], [out_dir],
+                        {"output_dir": str(out_dir), "download": f"/split/{job_id}/download"})
 
 
-@app.post("/reorder")
-async def reorder_pages(background_tasks: BackgroundTasks, job_id: str = Form(...), order: str = Form(...)):
-    ensure_job(job_id)
-    up_dir = UPLOAD_DIR / job_id
-    pdfs = sorted([str(p) for p in up_dir.glob("*.pdf")])
-    if not pdfs:
-        raise HTTPException(400, "No PDFs uploaded for this job")
-    src_pdf = pdfs[0]
+def prepare_reorder(job_id: str, order: str) -> PreparedTask:
+    src_pdf = _first_pdf(job_id)
     out_path = OUTPUT_DIR / job_id / "reordered.pdf"
-    background_tasks.add_task(reorder_pages_task, src_pdf, order, out_path, JOB_STORE[job_id])
-    return {"job_id": job_id, "output": str(out_path)}
+    args = _cached("reorder", [src_pdf], {"order": order}, out_path, reorder_pages_task, src_pdf, order, out_path)
+    return PreparedTask("reorder", cached_task, args, [src_pdf], [out_path], {"output": str(out_path)})
 
 
-@app.post("/rotate")
-async def rotate_pages(background_tasks: BackgroundTasks, job_id: str = Form(...), degrees: int = Form(90), pages: str = Form("")):
-    ensure_job(job_id)
-    up_dir = UPLOAD_DIR / job_id
-    pdfs = sorted([str(p) for p in up_dir.glob("*.pdf")])
-    if not pdfs:
-        raise HTTPException(400, "No PDFs uploaded for this job")
-    src_pdf = pdfs[0]
+def prepare_rotate(job_id: str, degrees: int = 90, pages: str = "") -> PreparedTask:
+    src_pdf = _first_pdf(job_id)
     out_path = OUTPUT_DIR / job_id / "rotated.pdf"
-    background_tasks.add_task(rotate_pages_task, src_pdf, degrees, pages, out_path, JOB_STORE[job_id])
-    return {"job_id": job_id, "output": str(out_path)}
+    args = _cached("rotate", [src_pdf], {"degrees": degrees, "pages": pages}, out_path,
+                   rotate_pages_task, src_pdf, degrees, pages, out_path)
+    return PreparedTask("rotate", cached_task, args, [src_pdf], [out_path], {"output": str(out_path)})
+
+
+def prepare_compress(job_id: str, preset: str = "medium", target_bytes: Optional[int] = None) -> PreparedTask:
+    src_pdf = _first_pdf(job_id)
+    if target_bytes is not None:
+        try:
+            target_bytes = int(target_bytes)
+        except (TypeError, ValueError):
+            raise HTTPException(400, "target_bytes must be an integer")
+        if target_bytes <= 0:
+            raise HTTPException(400, "target_bytes must be positive")
+        out_path = OUTPUT_DIR / job_id / "compressed_target.pdf"
+        args = _cached("compress", [src_pdf], {"target_bytes": target_bytes}, out_path,
+                       compress_to_target_task, src_pdf, target_bytes, out_path)
+    else:
+        preset = (preset or "medium").lower()
+        if preset not in PDFSETTINGS:
+            raise HTTPException(400, f"Unknown preset '{preset}'; use one of {', '.join(PDFSETTINGS)}")
+        out_path = OUTPUT_DIR / job_id / f"compressed_{preset}.pdf"
+        args = _cached("compress", [src_pdf], {"preset": preset}, out_path, compress_pdf_task, src_pdf, preset, out_path)
+    return PreparedTask("compress", cached_task, args, [src_pdf], [out_path], {"output": str(out_path)})
+
+
+def prepare_convert(job_id: str, target: str, engine: Optional[str] = None, monospace: bool = False) -> PreparedTask:
+    ensure_job(job_id)
+    files = job_files(job_id)
+    if not files:
+        raise HTTPException(400, "No files uploaded for this job")
+    target = normalize_format(target)
+    if not find_route(Path(files[0]).suffix, target):
+        raise HTTPException(400, f"Unsupported conversion: {Path(files[0]).suffix} -> {target}")
+    engine = (engine or EXTRACT_ENGINE).lower()
+    if engine != "auto" and engine not in EXTRACT_ENGINES:
+        raise HTTPException(400, f"Unknown extraction engine '{engine}'")
+    out_path = OUTPUT_DIR / job_id / f"converted.{Path(target).name}"
+    task = partial(convert_task, engine=engine, monospace=monospace)
+    params = {"target": target, "engine": engine, "monospace": monospace}
+    args = _cached("convert", [files[0]], params, out_path, task, files[0], target, out_path)
+    return PreparedTask("convert", cached_task, args, [files[0]], [out_path], {"output": str(out_path)})
+
+
+def prepare_pipeline(job_id: str, steps: List[dict]) -> PreparedTask:
+    ensure_job(job_id)
+    uploads = job_files(job_id)
+    if not uploads:
+        raise HTTPException(400, "No files uploaded for this job")
+    try:
+        planned = plan(steps, uploads)
+    except PipelineError as e:
+        raise HTTPException(400, str(e))
+    out_dir = OUTPUT_DIR / job_id
+    work_dir = out_dir / ".pipeline"
+    finals = {step_id: str(out_dir / step_id) for step_id in final_steps(planned)}
+    return PreparedTask(
+        "pipeline", run_pipeline_task, (planned, uploads, work_dir, out_dir), uploads,
+        [work_dir, out_dir / PIPELINE_MANIFEST, *map(Path, finals.values())],
+        {"steps": [s["id"] for s in planned], "outputs": finals, "download": f"/pipeline/{job_id}/download"},
+    )
+
+
+# Operations addressable by name (batch API)
+OPERATIONS: dict[str, Callable[..., PreparedTask]] = {
+    "merge": prepare_merge,
+    "split": prepare_split,
+    "reorder": prepare_reorder,
+    "rotate": prepare_rotate,
+    "compress": prepare_compress,
+    "convert": prepare_convert,
+    "pipeline": prepare_pipeline,
+}
+
+
+async def submit_prepared(job_id: str, prepared: PreparedTask, tenant: str) -> dict:
+    await submit_job(job_id, prepared.operation, prepared.fn, *prepared.args,
+                     inputs=prepared.inputs, outputs=prepared.outputs, tenant=tenant)
+    return {"job_id": job_id, **prepared.result}
+
+
+@app.post("/merge")
+async def merge_pdfs(job_id: Optional[str] = Form(None), tenant: str = Depends(get_tenant)):
+    job = job_id or new_job(status="processing", message="Merging PDFs")
+    return await submit_prepared(job, prepare_merge(job), tenant)
+
+
+@app.post("/split")
+async def split_pdf(job_id: str = Form(...), ranges: str = Form(""), tenant: str = Depends(get_tenant)):
+    return await submit_prepared(job_id, prepare_split(job_id, ranges), tenant)
+
+
+@app.get("/split/{job_id}/download")
+def split_download(job_id: str):
+    """ZIP of the split parts, streamed while the split is still running: parts are sent as they are written."""
+    job = ensure_job(job_id)
+    out_dir = OUTPUT_DIR / job_id / "split"
+    if not out_dir.is_dir():
+        raise HTTPException(404, "No split output for this job")
+    if job.status not in ("queued", "processing", "done"):
+        raise HTTPException(409, f"No split pending or finished for this job (job is {job.status})")
+
+    def finished() -> bool:
+        status = (JOB_STORE.get(job_id) or {}).get("status")
+        if status in TERMINAL_STATUSES and status != "done":
+            # Abort the transfer so the client sees a broken download, not a short archive
+            raise RuntimeError(f"Split {status}")
+        return status == "done"
+
+    def parts():
+        # Until the task has cleared the directory (its first progress update), it may hold an earlier run's parts
+        deadline = time.monotonic() + SPLIT_START_WAIT
+        while True:
+            job = JOB_STORE.get(job_id) or {}
+            if job.get("status") not in ("queued", "processing") or job.get("progress"):
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError("Split did not start in time")
+            time.sleep(0.2)
+        for path in follow_dir(out_dir, finished, "*.pdf"):
+            yield path, path.name
+
+    return StreamingResponse(
+        stream_zip(parts()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="split_{job_id}.zip"'},
+    )
+
+
+@app.post("/reorder")
+async def reorder_pages(job_id: str = Form(...), order: str = Form(...), tenant: str = Depends(get_tenant)):
+    return await submit_prepared(job_id, prepare_reorder(job_id, order), tenant)
+
+
+@app.post("/rotate")
+async def rotate_pages(job_id: str = Form(...), degrees: int = Form(90), pages: str = Form(""), tenant: str = Depends(get_tenant)):
+    return await submit_prepared(job_id, prepare_rotate(job_id, degrees, pages), tenant)
 
 
 @app.post("/compress")
-async def compress_pdf(background_tasks: BackgroundTasks, job_id: str = Form(...), preset: str = Form("medium")):
-    ensure_job(job_id)
-    up_dir = UPLOAD_DIR / job_id
-    pdfs = sorted([str(p) for p in up_dir.glob("*.pdf")])
-    if not pdfs:
-        raise HTTPException(400, "No PDFs uploaded for this job")
-    src_pdf = pdfs[0]
-    out_path = OUTPUT_DIR / job_id / f"compressed_{preset}.pdf"
-    background_tasks.add_task(compress_pdf_task, src_pdf, preset, out_path, JOB_STORE[job_id])
-    return {"job_id": job_id, "output": str(out_path)}
+async def compress_pdf(job_id: str = Form(...), preset: str = Form("medium"), target_bytes: Optional[int] = Form(None),
+                       tenant: str = Depends(get_tenant)):
+    return await submit_prepared(job_id, prepare_compress(job_id, preset, target_bytes), tenant)
 
 
 @app.post("/convert")
-async def convert(background_tasks: BackgroundTasks, job_id: str = Form(...), target: str = Form(...)):
-    ensure_job(job_id)
-    up_dir = UPLOAD_DIR / job_id
-    files = [str(p) for p in up_dir.iterdir() if p.is_file()]
-    if not files:
-        raise HTTPException(400, "No files uploaded for this job")
+async def convert(job_id: str = Form(...), target: str = Form(...), engine: Optional[str] = Form(None),
+                  monospace: bool = Form(False), tenant: str = Depends(get_tenant)):
+    return await submit_prepared(job_id, prepare_convert(job_id, target, engine, monospace), tenant)
+
+
+@app.get("/formats")
+def formats():
+    """Conversions /convert can run: every source format with the targets reachable from it (possibly in several steps)."""
+    return {source: conversion_targets(source) for source in sorted(CONVERTERS)}
+
+
+class PipelineRequest(BaseModel):
+    job_id: str
+    steps: List[dict]
+
+
+@app.post("/pipeline")
+async def run_pipeline(req: PipelineRequest, tenant: str = Depends(get_tenant)):
+    """
+    Chain operations on a job's uploads in one job, e.g. merge -> compress and
+    merge -> thumbnails. Steps run in a single worker; intermediates never
+    leave it and only the final steps' outputs are kept.
+    """
+    return await submit_prepared(req.job_id, prepare_pipeline(req.job_id, req.steps), tenant)
+
 
+@app.get("/pipeline/{job_id}/download")
+def pipeline_download(job_id: str):
+    """ZIP of a finished pipeline's results, as `<step id>/<file>`."""
+    job = ensure_job(job_id)
     out_dir = OUTPUT_DIR / job_id
-    out_path = out_dir / f"converted.{target.lower()}"
-    background_tasks.add_task(convert_task, files[0], target, out_path, JOB_STORE[job_id])
-    return {"job_id": job_id, "output": str(out_path)}
+    manifest = out_dir / PIPELINE_MANIFEST
+    if job.status != "done" or not manifest.is_file():
+        raise HTTPException(409, "No finished pipeline for this job")
+    files = []
+    for step_id in json.loads(manifest.read_text())["outputs"]:
+        for path in sorted((out_dir / step_id).rglob("*")):
+            if path.is_file():
+                files.append((path, str(path.relative_to(out_dir))))
+    return StreamingResponse(
+        stream_zip(files),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="pipeline_{job_id}.zip"'},
+    )
 
 
 @app.post("/edit/docx")
-async def edit_docx(background_tasks: BackgroundTasks, job_id: Optional[str] = Form(None), content: str = Form("")):
+async def edit_docx(job_id: Optional[str] = Form(None), content: str = Form(""), tenant: str = Depends(get_tenant)):
     job = job_id or new_job(status="processing", message="Editing DOCX")
     out_path = OUTPUT_DIR / job / "edited.docx"
-    background_tasks.add_task(edit_to_docx_task, content, out_path, JOB_STORE[job])
+    await submit_job(job, "edit_docx", edit_to_docx_task, content, out_path, outputs=[out_path], tenant=tenant)
     return {"job_id": job, "output": str(out_path)}
 
 
 @app.post("/edit/pdf")
-async def edit_pdf(background_tasks: BackgroundTasks, job_id: Optional[str] = Form(None), content: str = Form("")):
+async def edit_pdf(job_id: Optional[str] = Form(None), content: str = Form(""), tenant: str = Depends(get_tenant)):
     job = job_id or new_job(status="processing", message="Editing PDF")
     out_path = OUTPUT_DIR / job / "edited.pdf"
-    background_tasks.add_task(edit_to_pdf_task, content, out_path, JOB_STORE[job])
+    await submit_job(job, "edit_pdf", edit_to_pdf_task, content, out_path, outputs=[out_path], tenant=tenant)
     return {"job_id": job, "output": str(out_path)}
 
 
+# ---------- Batches ----------
+
+class BatchEntry(BaseModel):
+    job_id: str
+    operation: str
+    params: dict = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchEntry]
+
+
+def _batch_path(batch_id: str) -> Path:
+    return BATCH_DIR / f"{Path(batch_id).name}.json"
+
+
+def _load_batch(batch_id: str) -> dict:
+    try:
+        return json.loads(_batch_path(batch_id).read_text())
+    except FileNotFoundError:
+        raise HTTPException(404, "Batch not found")
+
+
+@app.post("/batch", status_code=201)
+async def submit_batch(batch: BatchRequest, tenant: str = Depends(get_tenant)):
+    """
+    Submit several (job_id, operation, params) entries at once. Entries are
+    validated up front and admitted to the executor together: a bad entry or a
+    full queue rejects the whole batch.
+    """
+    if not batch.operations:
+        raise HTTPException(400, "Batch has no operations")
+    job_ids = [e.job_id for e in batch.operations]
+    if len(set(job_ids)) != len(job_ids):
+        raise HTTPException(400, "Each job may appear only once per batch")
+
+    prepared = []
+    for i, entry in enumerate(batch.operations):
+        prepare = OPERATIONS.get(entry.operation)
+        if prepare is None:
+            raise HTTPException(400, f"Entry {i}: unknown operation '{entry.operation}'")
+        try:
+            prepared.append(prepare(entry.job_id, **entry.params))
+        except TypeError:
+            raise HTTPException(400, f"Entry {i}: invalid params for {entry.operation}")
+        except HTTPException as e:
+            raise HTTPException(e.status_code, f"Entry {i}: {e.detail}")
+
+    costs = [await run_in_threadpool(estimate_cost, p.operation, p.inputs) for p in prepared]
+    try:
+        EXECUTOR.submit_many(
+            (job_id, p.operation, p.fn, p.args, {"tenant": tenant, "cost": cost, "outputs": p.outputs})
+            for job_id, p, cost in zip(job_ids, prepared, costs)
+        )
+    except QueueFull as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+
+    batch_id = uuid.uuid4().hex
+    entries = [
+        {"job_id": job_id, "operation": p.operation, "outputs": [str(o) for o in p.outputs]}
+        for job_id, p in zip(job_ids, prepared)
+    ]
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    _batch_path(batch_id).write_text(json.dumps({"batch_id": batch_id, "entries": entries}))
+    return {"batch_id": batch_id, "jobs": [{"job_id": e["job_id"], "operation": e["operation"]} for e in entries]}
+
+
+@app.get("/batch/{batch_id}")
+def batch_status(batch_id: str):
+    batch = _load_batch(batch_id)
+    jobs = []
+    for entry in batch["entries"]:
+        job = JOB_STORE.get(entry["job_id"]) or {"job_id": entry["job_id"], "status": "error", "progress": 0}
+        jobs.append({**job, "operation": entry["operation"]})
+
+    counts: dict[str, int] = {}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+    if any(j["status"] not in TERMINAL_STATUSES for j in jobs):
+        status = "queued" if counts.get("queued") == len(jobs) else "processing"
+    elif counts.get("done") == len(jobs):
+        status = "done"
+    else:
+        status = "partial" if counts.get("done") else "error"
+    progress = sum(100 if j["status"] in TERMINAL_STATUSES else (j.get("progress") or 0) for j in jobs)
+    return {
+        "batch_id": batch_id,
+        "status": status,
+        "progress": progress // len(jobs),
+        "counts": counts,
+        "jobs": jobs,
+    }
+
+
+@app.get("/batch/{batch_id}/download")
+def batch_download(batch_id: str):
+    """One ZIP with the outputs of every finished job in the batch, as `<job_id>/<file>`."""
+    batch = _load_batch(batch_id)
+    files = []
+    for entry in batch["entries"]:
+        job = JOB_STORE.get(entry["job_id"])
+        if not job or job["status"] != "done":
+            continue
+        for out in map(Path, entry["outputs"]):
+            members = sorted(p for p in out.rglob("*") if p.is_file()) if out.is_dir() else [out]
+            for path in members:
+                if path.exists():
+                    files.append((path, f"{entry['job_id']}/{path.relative_to(out.parent)}"))
+    if not files:
+        raise HTTPException(409, "No finished outputs in this batch yet")
+    return StreamingResponse(
+        stream_zip(files),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch_{batch_id}.zip"'},
+    )
+
+
+THUMBNAIL_CACHE_HEADERS = {"Cache-Control": "private, max-age=86400"}
+
+
+def _thumbnail_source(job_id: str, filename: str) -> Path:
+    ensure_job(job_id)
+    src = UPLOAD_DIR / job_id / Path(filename).name
+    if filename.startswith(".") or not src.is_file() or src.suffix.lower() != ".pdf":
+        raise HTTPException(404, "File not found")
+    return src
+
+
+def _image_format(name: str) -> str:
+    try:
+        return image_format(name)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+def _sprite_index(src: Path, per_sheet: int, size: int) -> dict:
+    # Walking every page box is slow for long documents; the index is cached next to the sheets
+    return THUMBNAILS.get_json(file_digest(src), f"index_{per_sheet}x{size}",
+                               lambda: sprite_index(src, size, per_sheet, SPRITE_COLUMNS))
+
+
+@app.get("/thumbnail/{job_id}/{filename}/sprites")
+def thumbnail_sprites(job_id: str, filename: str, per_sheet: int = SPRITE_PER_SHEET,
+                      size: int = SPRITE_SIZE, format: str = "jpeg"):
+    """
+    Index of sprite sheets for a page grid: each sheet holds `per_sheet` pages
+    as `size` x `size` tiles, and every page lists its sheet and x/y/w/h box.
+    Sheets are rendered on first request, like single-page thumbnails.
+    """
+    src = _thumbnail_source(job_id, filename)
+    fmt = _image_format(format)
+    per_sheet, size = clamp_sprite(per_sheet, size)
+    index = dict(_sprite_index(src, per_sheet, size))
+    query = f"per_sheet={per_sheet}&size={size}&format={fmt}"
+    index["format"] = media_type(fmt)
+    index["sheets"] = [
+        {"url": f"/thumbnail/{job_id}/{quote(src.name)}/sprites/{n}?{query}", "pages": tiles}
+        for n, tiles in enumerate(index["sheets"])
+    ]
+    return index
+
+
+@app.get("/thumbnail/{job_id}/{filename}/sprites/{sheet}")
+def thumbnail_sprite_sheet(job_id: str, filename: str, sheet: int, per_sheet: int = SPRITE_PER_SHEET,
+                           size: int = SPRITE_SIZE, format: str = "jpeg"):
+    src = _thumbnail_source(job_id, filename)
+    fmt = _image_format(format)
+    per_sheet, size = clamp_sprite(per_sheet, size)
+
+    def render():
+        # Only on a cache miss: a cached sheet is served without building the index
+        sheets = _sprite_index(src, per_sheet, size)["sheets"]
+        if not 0 <= sheet < len(sheets):
+            raise HTTPException(404, "Sheet not found")
+        return render_sheet(src, sheets[sheet], size, SPRITE_COLUMNS)
+
+    try:
+        path = THUMBNAILS.get(file_digest(src), f"sheet{sheet}_{per_sheet}x{size}", render, fmt)
+    except RasterizerUnavailable as e:
+        raise HTTPException(503, f"Thumbnail rendering unavailable: {e}")
+    return FileResponse(path, media_type=media_type(fmt), headers=THUMBNAIL_CACHE_HEADERS)
+
+
+@app.get("/thumbnail/{job_id}/{filename}/{page}")
+def thumbnail(job_id: str, filename: str, page: int, size: int = THUMBNAIL_SIZE, format: str = "jpeg"):
+    """Preview of one page (JPEG, or WebP/AVIF via `format`), rendered on first request and then served from the LRU cache."""
+    src = _thumbnail_source(job_id, filename)
+    fmt = _image_format(format)
+    if not 1 <= page <= page_count(src):
+        raise HTTPException(404, "Page not found")
+    size = clamp_size(size)
+    try:
+        path = THUMBNAILS.get(file_digest(src), f"p{page}_{size}", lambda: render_page(src, page, size), fmt)
+    except RasterizerUnavailable as e:
+        raise HTTPException(503, f"Thumbnail rendering unavailable: {e}")
+    return FileResponse(path, media_type=media_type(fmt), headers=THUMBNAIL_CACHE_HEADERS)
+
+
+@app.get("/metrics")
+def metrics():
+    return EXECUTOR.metrics()
+
+
 @app.get("/download/{job_id}")
 def download(job_id: str):
     out_dir = OUTPUT_DIR / job_id
     if not out_dir.exists():
         raise HTTPException(404, "Not found")
-    # pick first file
-    files = sorted(out_dir.glob("*"))
+    # pick first file; directories (split parts, pipeline steps) have their own ZIP downloads
+    files = sorted(p for p in out_dir.glob("*") if p.is_file() and not p.name.startswith("."))
     if not files:
         raise HTTPException(404, "No output")
     return FileResponse(files[0])
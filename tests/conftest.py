@@ -0,0 +1,24 @@
+import pytest
+from reportlab.pdfgen import canvas
+
+
+class _Status:
+    """Bare `job_status` for calling tasks directly; `_update` sets status, message and progress on it."""
+
+
+@pytest.fixture
+def job_status():
+    return _Status()
+
+
+@pytest.fixture
+def numbered_pdf():
+    """Writes a PDF whose page n reads 'page n' and returns its path."""
+    def make(path, pages):
+        c = canvas.Canvas(str(path))
+        for n in range(1, pages + 1):
+            c.drawString(50, 500, f'page {n}')
+            c.showPage()
+        c.save()
+        return path
+    return make
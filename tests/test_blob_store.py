@@ -0,0 +1,40 @@
+import hashlib
+import os
+import time
+
+from utils import blob_store
+from utils.blob_store import BlobStore
+
+
+def _ingest(store, data: bytes) -> str:
+    tmp = store.tmp_path()
+    tmp.write_bytes(data)
+    digest = hashlib.sha256(data).hexdigest()
+    store.ingest(tmp, digest)
+    return digest
+
+
+def test_unlinked_blobs_are_collected(tmp_path, monkeypatch):
+    store = BlobStore(tmp_path / 'blobs')
+    kept, orphan = _ingest(store, b'kept'), _ingest(store, b'orphan')
+    store.link_into(store.blob_path(kept), tmp_path / 'job.pdf')
+    # Fresh blobs are within the grace period
+    assert store.collect() == 0
+    monkeypatch.setattr(blob_store, 'BLOB_GC_GRACE', -1)
+    assert store.collect() == len(b'orphan')
+    assert store.blob_path(kept).exists()
+    assert not store.blob_path(orphan).exists()
+
+
+def test_derived_outputs_are_evicted_least_recently_used(tmp_path):
+    store = BlobStore(tmp_path / 'blobs', budget=2500)
+    src = tmp_path / 'out.pdf'
+    src.write_bytes(b'x' * 1000)
+    for n, key in enumerate(('a', 'b')):
+        store.store_derived(key * 64, src)
+        os.utime(store.derived_dir(key * 64) / 'output', (time.time() - 100 + n, time.time() - 100 + n))
+    assert store.fetch_derived('a' * 64, tmp_path / 'hit.pdf')  # now the most recently used
+    store.store_derived('c' * 64, src)
+    assert not store.derived_dir('b' * 64).exists()
+    assert store.fetch_derived('a' * 64, tmp_path / 'again.pdf')
+    assert store.fetch_derived('c' * 64, tmp_path / 'new.pdf')
@@ -0,0 +1,94 @@
+import io
+
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from utils import compressor
+
+
+def _photo_pdf(path, images=1, side=2400):
+    c = canvas.Canvas(str(path))
+    for n in range(images):
+        # Smooth gradient: large as raw Flate, small as JPEG
+        img = Image.linear_gradient('L').resize((side, side)).convert('RGB')
+        img = Image.merge('RGB', (img.getchannel(0), img.rotate(90 + n).getchannel(0), img.getchannel(0)))
+        buf = io.BytesIO()
+        img.save(buf, format='PNG')
+        c.drawImage(ImageReader(io.BytesIO(buf.getvalue())), 50, 300, 400, 400)
+        c.showPage()
+    c.save()
+    return path
+
+
+@pytest.mark.parametrize('preset', ['low', 'max'])
+def test_images_are_recompressed(tmp_path, preset):
+    pytest.importorskip('pikepdf')
+    src = _photo_pdf(tmp_path / 'photo.pdf')
+    out = tmp_path / 'out.pdf'
+    stats = compressor.compress_pdf(str(src), out, preset)
+    assert stats['images_recompressed'] == 1
+    assert stats['after'] < stats['before'] / 2
+    page = PdfReader(str(out)).pages[0]
+    assert page.extract_text() == ''  # still a readable PDF
+    xobj = next(iter(page['/Resources']['/XObject'].values())).get_object()
+    assert xobj['/Filter'] == '/DCTDecode'
+    if preset == 'low':
+        assert max(xobj['/Width'], xobj['/Height']) <= compressor.PRESETS['low'][0]
+
+
+def test_images_use_pool(tmp_path, monkeypatch):
+    pytest.importorskip('pikepdf')
+    monkeypatch.setattr(compressor, 'COMPRESS_WORKERS', 2)
+    src = _photo_pdf(tmp_path / 'photos.pdf', images=4, side=600)
+    stats = compressor.compress_pdf(str(src), tmp_path / 'out.pdf', 'medium')
+    assert stats['images_recompressed'] == 4
+
+
+def test_output_is_never_larger(tmp_path):
+    c = canvas.Canvas(str(tmp_path / 'text.pdf'))
+    c.drawString(50, 500, 'tiny')
+    c.save()
+    src = tmp_path / 'text.pdf'
+    stats = compressor.compress_pdf(str(src), tmp_path / 'out.pdf', 'medium')
+    assert stats['after'] <= stats['before']
+
+
+def test_target_size_picks_least_aggressive_fitting_preset(tmp_path, job_status):
+    pytest.importorskip('pikepdf')
+    from utils import pdf_tools
+    src = _photo_pdf(tmp_path / 'photos.pdf', images=8, side=1800)
+    sizes = {}
+    for preset in compressor.PRESET_ORDER:
+        sizes[preset] = compressor.compress_pdf(str(src), tmp_path / f'{preset}.pdf', preset)['after']
+    # A target between the `high` and `max` outputs must land on `high`
+    target = (sizes['high'] + sizes['max']) // 2
+    assert sizes['high'] < target < sizes['max']
+    out = tmp_path / 'target.pdf'
+    pdf_tools.compress_to_target_task(str(src), target, out, job_status)
+    assert job_status.status == 'done', job_status.message
+    assert 'with high' in job_status.message
+    assert out.stat().st_size <= target
+
+
+def test_compress_timing_names_the_engine_that_ran(tmp_path, job_status, monkeypatch):
+    pytest.importorskip('pikepdf')
+    from utils import ghostscript, pdf_tools
+
+    def broken_gs(*args):
+        raise RuntimeError('gs crashed')
+
+    monkeypatch.setattr(ghostscript, 'find_gs', lambda: '/usr/bin/gs')
+    monkeypatch.setattr(ghostscript, 'compress_with_gs', broken_gs)
+    timings = []
+    job_status.metric = lambda name, seconds: timings.append(name)
+    src = _photo_pdf(tmp_path / 'photo.pdf', side=600)
+    pdf_tools.compress_pdf_task(str(src), 'LOW', tmp_path / 'out.pdf', job_status)
+    assert job_status.status == 'done', job_status.message
+    assert timings == ['compress.builtin.low']
+
+    pdf_tools.compress_pdf_task(str(src), 'x' * 40, tmp_path / 'bad.pdf', job_status)
+    assert job_status.status == 'error' and 'Unknown preset' in job_status.message
+    assert timings == ['compress.builtin.low']
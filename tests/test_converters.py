@@ -0,0 +1,63 @@
+import sys
+
+from PIL import Image
+from PyPDF2 import PdfReader
+
+from utils import converters
+
+
+def test_cheapest_route_is_found():
+    route = converters.find_route('.csv', 'pdf')
+    assert [(c.source, c.target) for c in route] == [('csv', 'txt'), ('txt', 'pdf')]
+    assert [c.target for c in converters.find_route('xlsx', 'pdf')] == ['csv', 'txt', 'pdf']
+    assert len(converters.find_route('PNG', 'docx')) == 1
+    assert converters.find_route('pdf', 'xlsx') is None
+    assert 'pdf' in converters.targets('xlsx')
+
+
+
+def test_previously_supported_pairs_stay_direct():
+    # Every pair convert_task handled before the registry must not detour through another format
+    for source, target in [('pdf', 'docx'), ('docx', 'pdf'), ('jpg', 'pdf'), ('jpeg', 'pdf'), ('png', 'pdf'),
+                           ('txt', 'pdf'), ('csv', 'xlsx'), ('jpg', 'png'), ('jpeg', 'png'), ('png', 'jpg')]:
+        route = converters.find_route(source, target)
+        assert route is not None and len(route) == 1, (source, target, route)
+
+def test_registering_a_cheaper_converter_changes_the_route(monkeypatch):
+    monkeypatch.setattr(converters, 'CONVERTERS', {k: dict(v) for k, v in converters.CONVERTERS.items()})
+    converters.find_route.cache_clear()
+    try:
+        converters.register('csv', 'pdf', cost=0.5)(lambda src, out, progress, options: None)
+        assert len(converters.find_route('csv', 'pdf')) == 1
+    finally:
+        converters.find_route.cache_clear()
+
+
+def test_multi_hop_conversion_through_temp_files(tmp_path):
+    src = tmp_path / 'table.csv'
+    src.write_text('name,qty\nwidget,3\ngadget,12\n')
+    out = tmp_path / 'out' / 'table.pdf'
+    progress = []
+    formats, notes = converters.convert_file(src, 'pdf', out, lambda msg, pct: progress.append(pct))
+    assert formats == ['csv', 'txt', 'pdf']
+    assert 'widget' in PdfReader(str(out)).pages[0].extract_text()
+    assert [p.name for p in out.parent.iterdir()] == ['table.pdf']
+    assert progress == sorted(progress)
+
+
+def test_png_to_docx(tmp_path):
+    from docx import Document
+    src = tmp_path / 'img.png'
+    Image.new('RGB', (4000, 1000), 'red').save(src)
+    out = tmp_path / 'img.docx'
+    converters.convert_file(src, 'docx', out)
+    shape = Document(str(out)).inline_shapes[0]
+    assert shape.width < 4000 * 914400 / 72
+
+
+def test_registry_does_not_import_converter_libraries():
+    import subprocess
+    code = ("import sys, utils.converters; "
+            "print(any(m in sys.modules for m in ('docx', 'openpyxl', 'pdfplumber', 'reportlab')))")
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                          check=True).stdout.strip() == 'False'
@@ -0,0 +1,74 @@
+from docx import Document
+from docx.enum.text import WD_BREAK
+from PyPDF2 import PdfReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from utils import docx_layout
+
+
+def _docx(path, paragraphs=3, words=200):
+    doc = Document()
+    doc.add_heading('Report', 1)
+    for n in range(paragraphs):
+        p = doc.add_paragraph(' '.join(['wide'] * words) + ' ')
+        p.add_run('bold tail').bold = True
+    doc.save(str(path))
+    return path
+
+
+def test_paragraphs_stream_with_styles(tmp_path):
+    src = _docx(tmp_path / 'in.docx', paragraphs=2, words=3)
+    paragraphs = list(docx_layout.iter_paragraphs(src))
+    assert paragraphs[0] == [docx_layout.Run('Report', 'Helvetica-Bold', 18.0)]
+    assert paragraphs[1] == [docx_layout.Run('wide wide wide ', 'Helvetica', 12.0),
+                             docx_layout.Run('bold tail', 'Helvetica-Bold', 12.0)]
+
+
+def test_lines_wrap_by_measured_width(tmp_path, monkeypatch):
+    lines = []
+    original = docx_layout._Page.line
+
+    def record(self, x, segments):
+        lines.append(sum(stringWidth(s.text, s.font, s.size) for s in segments))
+        return original(self, x, segments)
+
+    monkeypatch.setattr(docx_layout._Page, 'line', record)
+    src = _docx(tmp_path / 'in.docx', paragraphs=40)
+    out = tmp_path / 'out.pdf'
+    pages = docx_layout.docx_to_pdf(src, out)
+    max_width = 612 - 2 * docx_layout.MARGIN
+    assert max(lines) <= max_width
+    assert max(lines) > max_width * 0.9  # lines are filled, not cut at a character count
+    assert pages == len(PdfReader(str(out)).pages) > 1
+    assert 'bold tail' in PdfReader(str(out)).pages[0].extract_text()
+
+
+def test_font_is_set_only_when_it_changes(tmp_path):
+    src = _docx(tmp_path / 'in.docx', paragraphs=5)
+    out = tmp_path / 'out.pdf'
+    docx_layout.docx_to_pdf(src, out)
+    content = PdfReader(str(out)).pages[0].get_contents().get_data()
+    # heading, body and bold: one Tf for each change of font on the page
+    assert content.count(b' Tf') <= 2 + 2 * 5
+
+
+def test_page_breaks_start_new_pages(tmp_path):
+    doc = Document()
+    doc.add_paragraph('one').add_run().add_break(WD_BREAK.PAGE)
+    doc.add_paragraph('two')
+    src = tmp_path / 'in.docx'
+    doc.save(str(src))
+    out = tmp_path / 'out.pdf'
+    assert docx_layout.docx_to_pdf(src, out) == 2
+    assert [p.extract_text().strip() for p in PdfReader(str(out)).pages] == ['one', 'two']
+
+
+def test_convert_task_uses_the_layout_engine(tmp_path, job_status):
+    from utils.pdf_tools import convert_task
+    src = _docx(tmp_path / 'in.docx', paragraphs=1, words=5)
+    out = tmp_path / 'out.pdf'
+    convert_task(str(src), 'pdf', out, job_status)
+    assert job_status.status == 'done', job_status.message
+    assert 'via' not in job_status.message
+    fonts = {str(f.get_object()['/BaseFont']) for f in PdfReader(str(out)).pages[0]['/Resources']['/Font'].values()}
+    assert fonts == {'/Helvetica', '/Helvetica-Bold'}
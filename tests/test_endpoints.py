@@ -1,4 +1,7 @@
 import io
+import uuid
+
+import pytest
 from fastapi.testclient import TestClient
 from main import app, UPLOAD_DIR, OUTPUT_DIR
 
@@ -34,9 +37,494 @@ def test_upload_and_merge(tmp_path):
     r2 = client.post('/merge', data={'job_id': job})
     assert r2.status_code == 200
     out = OUTPUT_DIR / job / 'merged.pdf'
-    # Background task runs after response; simulate by calling merge directly if needed.
+    # Merge runs in a worker process after the response
+    assert wait_for_job(job)['status'] == 'done'
+    assert out.exists()
 
 
 def test_compress_requires_upload():
     r = client.post('/compress', data={'job_id': 'missing'})
     assert r.status_code in (400, 404)
+
+
+def test_upload_rejects_oversize_file(monkeypatch):
+    import main
+    monkeypatch.setattr(main, 'MAX_UPLOAD_SIZE', 1024)
+    files = [('files', ('big.txt', b'x' * 4096, 'text/plain'))]
+    r = client.post('/upload', files=files)
+    assert r.status_code == 400
+    assert 'too large' in r.json()['detail']
+
+
+
+def test_upload_rejects_malformed_body_and_keeps_nothing(monkeypatch):
+    import main
+    jobs = []
+    new_job = main.new_job
+    monkeypatch.setattr(main, 'new_job', lambda **kw: jobs.append(new_job(**kw)) or jobs[-1])
+    body = (b'--xyz\r\nContent-Disposition: form-data; name="files"; filename="a.pdf"\r\n'
+            b'Content-Type: application/pdf\r\n\r\n' + _pdf_bytes() + b'\r\n'
+            b'--xyz\r\nbroken header line without colon\r\n\r\nx\r\n--xyz--\r\n')
+    r = client.post('/upload', content=body, headers={'content-type': 'multipart/form-data; boundary=xyz'})
+    assert r.status_code == 400
+    assert 'Malformed' in r.json()['detail']
+    assert client.get(f'/job/{jobs[0]}').json()['status'] == 'error'
+    assert list((UPLOAD_DIR / jobs[0]).iterdir()) == []
+
+def test_upload_counts_pages_off_the_event_loop(monkeypatch):
+    import asyncio
+    import main
+    page_count = main.page_count
+    loops = []
+
+    def counting(path):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return page_count(path)
+
+    monkeypatch.setattr(main, 'page_count', counting)
+    r = client.post('/upload', files=[('files', ('a.pdf', _pdf_bytes(), 'application/pdf'))])
+    assert r.status_code == 200 and len(r.json()['thumbnails']) == 1
+    assert loops == [None]
+
+
+def test_compress_rejects_unknown_preset():
+    r = client.post('/upload', files=[('files', ('a.pdf', _pdf_bytes(), 'application/pdf'))])
+    r = client.post('/compress', data={'job_id': r.json()['job_id'], 'preset': '../../x'})
+    assert r.status_code == 400 and 'Unknown preset' in r.json()['detail']
+
+
+def test_upload_rejects_unsupported_type():
+    files = [('files', ('a.exe', b'MZ', 'application/x-msdownload'))]
+    r = client.post('/upload', files=files)
+    assert r.status_code == 400
+
+
+def wait_for_job(job_id: str, timeout: float = 30) -> dict:
+    import time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/job/{job_id}').json()
+        if job['status'] in ('done', 'error', 'cancelled', 'timeout'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish: {job}')
+
+
+def _pdf_bytes(text: str = 'A') -> bytes:
+    from reportlab.pdfgen import canvas
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    c.drawString(72, 720, text)
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def test_resumable_upload_roundtrip():
+    data = _pdf_bytes()
+    r = client.post('/upload/sessions', data={
+        'filename': 'scan.pdf', 'length': str(len(data)), 'content_type': 'application/pdf',
+    })
+    assert r.status_code == 201
+    location = r.json()['location']
+    job = r.json()['job_id']
+
+    half = len(data) // 2
+    r = client.patch(location, content=data[:half], headers={'Upload-Offset': '0'})
+    assert r.status_code == 204
+    assert r.headers['Upload-Offset'] == str(half)
+
+    # A retried chunk at a stale offset is rejected with the real offset
+    r = client.patch(location, content=data[:half], headers={'Upload-Offset': '0'})
+    assert r.status_code == 409
+    assert r.headers['Upload-Offset'] == str(half)
+
+    # The in-progress file is invisible to tasks until finalized
+    r = client.post('/compress', data={'job_id': job})
+    assert r.status_code == 400
+
+    r = client.patch(location, content=data[half:], headers={'Upload-Offset': str(half)})
+    assert r.status_code == 204
+    r = client.post(f'{location}/finalize')
+    assert r.status_code == 200
+    assert (UPLOAD_DIR / job / 'scan.pdf').read_bytes() == data
+
+
+def test_resumable_upload_rejects_corrupt_pdf():
+    data = b'%PDF-1.4 not really a pdf'
+    r = client.post('/upload/sessions', data={
+        'filename': 'bad.pdf', 'length': str(len(data)), 'content_type': 'application/pdf',
+    })
+    location = r.json()['location']
+    client.patch(location, content=data, headers={'Upload-Offset': '0'})
+    r = client.post(f'{location}/finalize')
+    assert r.status_code == 400
+
+
+def test_identical_uploads_share_one_blob():
+    import os
+    data = _pdf_bytes('shared')
+    jobs = []
+    for _ in range(2):
+        r = client.post('/upload', files=[('files', ('form.pdf', data, 'application/pdf'))])
+        assert r.status_code == 200
+        jobs.append(r.json()['job_id'])
+    a, b = (UPLOAD_DIR / j / 'form.pdf' for j in jobs)
+    assert os.stat(a).st_ino == os.stat(b).st_ino
+
+    # Derived outputs are reused across jobs that share the input blob
+    for j in jobs:
+        client.post('/rotate', data={'job_id': j, 'degrees': '90'})
+        assert wait_for_job(j)['status'] == 'done'
+    assert (OUTPUT_DIR / jobs[1] / 'rotated.pdf').exists()
+    assert 'cached' in client.get(f'/job/{jobs[1]}').json()['message']
+
+
+def _crash(job_status):
+    import os
+    os._exit(3)
+
+
+def test_worker_crash_is_isolated():
+    import main
+    from utils.pdf_tools import edit_to_pdf_task
+    job = main.new_job()
+    # A task that kills its own process must fail the job, not the server
+    main.EXECUTOR.submit(job, 'crash', _crash)
+    status = wait_for_job(job)
+    assert status['status'] == 'error'
+    assert 'exit code 3' in status['message']
+
+    job2 = main.new_job()
+    main.EXECUTOR.submit(job2, 'edit_pdf', edit_to_pdf_task, 'still alive', OUTPUT_DIR / job2 / 'edited.pdf')
+    assert wait_for_job(job2)['status'] == 'done'
+
+
+def _hang(job_status):
+    import time
+    time.sleep(60)
+
+
+def test_task_timeout_kills_worker():
+    import main
+    job = main.new_job()
+    main.EXECUTOR.submit(job, 'hang', _hang, timeout=0.5)
+    assert wait_for_job(job, timeout=10)['status'] == 'timeout'
+
+
+def test_full_queue_returns_429(monkeypatch):
+    import main
+    r = client.post('/upload', files=[('files', ('q.pdf', _pdf_bytes('q'), 'application/pdf'))])
+    job = r.json()['job_id']
+    monkeypatch.setitem(main.EXECUTOR.queue_limits, 'compress', 0)
+    r = client.post('/compress', data={'job_id': job})
+    assert r.status_code == 429
+    assert int(r.headers['Retry-After']) >= 1
+    assert client.get('/metrics').json()['operations']['compress']['rejected'] >= 1
+
+
+def test_cancel_running_and_queued_jobs(monkeypatch):
+    import time
+    import main
+    monkeypatch.setattr(main.EXECUTOR, 'workers', 1)
+    running, queued = main.new_job(), main.new_job()
+    main.EXECUTOR.submit(running, 'hang', _hang)
+    main.EXECUTOR.submit(queued, 'hang', _hang)
+    deadline = time.monotonic() + 10
+    while client.get(f'/job/{running}').json()['status'] != 'processing':
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+    assert client.delete(f'/job/{queued}').status_code == 200
+    assert client.get(f'/job/{queued}').json()['status'] == 'cancelled'
+    assert client.delete(f'/job/{running}').status_code == 200
+    assert wait_for_job(running, timeout=10)['status'] == 'cancelled'
+    assert client.delete(f'/job/{running}').status_code == 409
+
+
+
+def test_cancel_without_task_does_not_affect_next_task():
+    r = client.post('/upload', files=[('files', ('c.pdf', _pdf_bytes(uuid.uuid4().hex), 'application/pdf'))])
+    job = r.json()['job_id']
+    assert client.delete(f'/job/{job}').status_code == 409
+    client.post('/rotate', data={'job_id': job, 'degrees': '90'})
+    assert wait_for_job(job)['status'] == 'done'
+
+def test_job_events_stream_until_done():
+    import json
+    import main
+    from utils.pdf_tools import edit_to_pdf_task
+    job = main.new_job()
+    main.EXECUTOR.submit(job, 'edit_pdf', edit_to_pdf_task, 'hello', OUTPUT_DIR / job / 'edited.pdf')
+    states = []
+    with client.stream('GET', f'/job/{job}/events') as r:
+        assert r.headers['content-type'].startswith('text/event-stream')
+        for line in r.iter_lines():
+            if line.startswith('data: '):
+                states.append(json.loads(line[6:]))
+    assert states[-1]['status'] == 'done'
+
+    with client.websocket_connect(f'/job/{job}/ws') as ws:
+        assert ws.receive_json()['status'] == 'done'
+
+
+def test_batch_runs_operations_and_zips_outputs():
+    import zipfile
+    jobs = []
+    for text in ('one', 'two'):
+        r = client.post('/upload', files=[('files', (f'{text}.pdf', _pdf_bytes(text), 'application/pdf'))])
+        jobs.append(r.json()['job_id'])
+    r = client.post('/batch', json={'operations': [
+        {'job_id': jobs[0], 'operation': 'rotate', 'params': {'degrees': 180}},
+        {'job_id': jobs[1], 'operation': 'split'},
+    ]})
+    assert r.status_code == 201
+    batch_id = r.json()['batch_id']
+    for j in jobs:
+        wait_for_job(j)
+    status = client.get(f'/batch/{batch_id}').json()
+    assert status['status'] == 'done' and status['progress'] == 100
+
+    r = client.get(f'/batch/{batch_id}/download')
+    assert r.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(r.content)).namelist()
+    assert f'{jobs[0]}/rotated.pdf' in names
+    assert any(n.startswith(f'{jobs[1]}/split/') for n in names)
+
+
+def test_batch_is_rejected_as_a_whole():
+    r = client.post('/upload', files=[('files', ('a.pdf', _pdf_bytes(), 'application/pdf'))])
+    job = r.json()['job_id']
+    r = client.post('/batch', json={'operations': [
+        {'job_id': job, 'operation': 'rotate'},
+        {'job_id': job, 'operation': 'nope'},
+    ]})
+    assert r.status_code == 400
+    r = client.post('/batch', json={'operations': [{'job_id': job, 'operation': 'explode'}]})
+    assert r.status_code == 400
+    assert client.get(f'/job/{job}').json()['status'] != 'queued'
+
+
+def test_pipeline_chains_steps_without_round_trips():
+    files = [('files', (f'{t}.pdf', _pdf_bytes(t), 'application/pdf')) for t in ('a', 'b')]
+    job = client.post('/upload', files=files).json()['job_id']
+    r = client.post('/pipeline', json={'job_id': job, 'steps': [
+        {'id': 'merged', 'operation': 'merge'},
+        {'id': 'small', 'operation': 'compress', 'params': {'preset': 'low'}},
+        {'id': 'turned', 'operation': 'rotate', 'inputs': ['merged'], 'params': {'degrees': 90}},
+    ]})
+    assert r.status_code == 200
+    assert set(r.json()['outputs']) == {'small', 'turned'}
+    status = wait_for_job(job)
+    assert status['status'] == 'done', status
+    from PyPDF2 import PdfReader
+    assert len(PdfReader(str(OUTPUT_DIR / job / 'small' / 'merged.pdf')).pages) == 2
+    assert PdfReader(str(OUTPUT_DIR / job / 'turned' / 'merged.pdf')).pages[0].get('/Rotate') == 90
+    # Intermediate steps are not kept
+    assert not (OUTPUT_DIR / job / 'merged').exists()
+    assert not (OUTPUT_DIR / job / '.pipeline').exists()
+
+    r = client.get(r.json()['download'])
+    assert r.status_code == 200
+    import zipfile
+    assert sorted(zipfile.ZipFile(io.BytesIO(r.content)).namelist()) == ['small/merged.pdf', 'turned/merged.pdf']
+    # Step directories are not served as the job's single output file
+    assert client.get(f'/download/{job}').status_code == 404
+
+
+def test_pipeline_rejects_forward_references():
+    job = client.post('/upload', files=[('files', ('a.pdf', _pdf_bytes(), 'application/pdf'))]).json()['job_id']
+    r = client.post('/pipeline', json={'job_id': job, 'steps': [
+        {'id': 'x', 'operation': 'rotate', 'inputs': ['y']},
+        {'id': 'y', 'operation': 'merge'},
+    ]})
+    assert r.status_code == 400
+
+
+def test_pipeline_compress_honours_target_bytes(tmp_path, monkeypatch):
+    from utils import pipeline
+    calls = []
+
+    def to_target(src, target, out, job_status):
+        calls.append(target)
+        job_status.status = 'done'
+
+    monkeypatch.setattr(pipeline, 'compress_to_target_task', to_target)
+    steps = pipeline.plan([{'operation': 'compress', 'params': {'target_bytes': '2000'}}], ['a.pdf'])
+    pipeline.STEPS['compress']([tmp_path / 'a.pdf'], steps[0]['params'], tmp_path)
+    assert calls == [2000]
+    for bad in ('big', 0):
+        with pytest.raises(pipeline.PipelineError):
+            pipeline.plan([{'operation': 'compress', 'params': {'target_bytes': bad}}], ['a.pdf'])
+    assert pipeline.plan([{'operation': 'compress', 'params': {'preset': 'HIGH'}}], ['a.pdf'])[0]['params'] == {'preset': 'high'}
+    with pytest.raises(pipeline.PipelineError):
+        pipeline.plan([{'operation': 'compress', 'params': {'preset': 'tiny'}}], ['a.pdf'])
+
+
+def test_pipeline_steps_do_not_fork_pools(tmp_path, monkeypatch, job_status):
+    from utils import pipeline
+    from utils.executor import inner_workers
+    seen = []
+
+    def probe(inputs, params, step_dir):
+        seen.append(inner_workers(4))
+        return inputs
+
+    monkeypatch.setitem(pipeline.STEPS, 'probe', probe)
+    src = tmp_path / 'a.pdf'
+    src.write_bytes(_pdf_bytes())
+    steps = pipeline.plan([{'id': 'x', 'operation': 'probe'}, {'id': 'y', 'operation': 'probe', 'inputs': ['upload']}],
+                          [str(src)])
+    pipeline.run_pipeline_task(steps, [str(src)], tmp_path / 'work', tmp_path / 'out', job_status)
+    assert seen == [1, 1]
+    assert inner_workers(4) == 4
+
+def test_pipeline_rejects_unsafe_step_ids():
+    job = client.post('/upload', files=[('files', ('a.pdf', _pdf_bytes(), 'application/pdf'))]).json()['job_id']
+    for step_id in ('..', '.pipeline', 'a/b', 'x' * 65):
+        r = client.post('/pipeline', json={'job_id': job, 'steps': [{'id': step_id, 'operation': 'rotate'}]})
+        assert r.status_code == 400, step_id
+    assert (OUTPUT_DIR / job).is_dir()
+
+def test_split_download_streams_zip_of_parts():
+    import zipfile
+    from PyPDF2 import PdfWriter
+    writer = PdfWriter()
+    for _ in range(4):
+        writer.add_blank_page(200, 200)
+    buf = io.BytesIO()
+    writer.write(buf)
+    job = client.post('/upload', files=[('files', ('four.pdf', buf.getvalue(), 'application/pdf'))]).json()['job_id']
+    r = client.post('/split', data={'job_id': job, 'ranges': '1,2,3-4'})
+    assert r.json()['download'] == f'/split/{job}/download'
+    # Requested right away; the response follows the job until it is done
+    r = client.get(f'/split/{job}/download')
+    assert r.status_code == 200
+    assert sorted(zipfile.ZipFile(io.BytesIO(r.content)).namelist()) == [
+        'split_1_1-1.pdf', 'split_2_2-2.pdf', 'split_3_3-4.pdf',
+    ]
+
+
+
+def test_rejected_split_keeps_previous_parts(monkeypatch):
+    import main
+    from PyPDF2 import PdfWriter
+    writer = PdfWriter()
+    for _ in range(2):
+        writer.add_blank_page(200, 200)
+    buf = io.BytesIO()
+    writer.write(buf)
+    job = client.post('/upload', files=[('files', ('two.pdf', buf.getvalue(), 'application/pdf'))]).json()['job_id']
+    client.post('/split', data={'job_id': job, 'ranges': '1,2'})
+    assert wait_for_job(job)['status'] == 'done'
+    monkeypatch.setitem(main.EXECUTOR.queue_limits, 'split', 0)
+    assert client.post('/split', data={'job_id': job, 'ranges': '1-2'}).status_code == 429
+    assert sorted(p.name for p in (OUTPUT_DIR / job / 'split').iterdir()) == ['split_1_1-1.pdf', 'split_2_2-2.pdf']
+
+
+def test_split_download_without_pending_split_is_refused(monkeypatch):
+    import main
+    job = client.post('/upload', files=[('files', ('one.pdf', _pdf_bytes(), 'application/pdf'))]).json()['job_id']
+    monkeypatch.setitem(main.EXECUTOR.queue_limits, 'split', 0)
+    assert client.post('/split', data={'job_id': job}).status_code == 429
+    assert client.get(f'/split/{job}/download').status_code == 409
+
+def _timed(job_status):
+    job_status.metric('test.step', 0.25)
+    job_status.set('done', 'ok', 100)
+
+
+def test_task_timings_reach_metrics():
+    import main
+    job = main.new_job()
+    main.EXECUTOR.submit(job, 'timed', _timed)
+    assert wait_for_job(job)['status'] == 'done'
+    timings = client.get('/metrics').json()['timings']
+    assert timings['test.step']['count'] >= 1
+
+
+
+def _inner(job_status):
+    from utils.executor import inner_workers
+    job_status.set('done', str(inner_workers(8)), 100)
+
+
+def test_task_pools_are_sized_from_executor_budget(monkeypatch):
+    import main
+    monkeypatch.setattr(main.EXECUTOR, 'inner', 2)
+    job = main.new_job()
+    main.EXECUTOR.submit(job, 'inner', _inner)
+    assert wait_for_job(job)['message'] == '2'
+
+def test_thumbnails_are_rendered_lazily(monkeypatch):
+    import main
+    from PIL import Image
+    rendered = []
+
+    def fake_render(src, page, size):
+        rendered.append(page)
+        return Image.new('RGB', (size, size), 'white')
+
+    monkeypatch.setattr(main, 'render_page', fake_render)
+    import uuid
+    data = _pdf_bytes(uuid.uuid4().hex)  # fresh content: nothing cached yet
+    r = client.post('/upload', files=[('files', ('thumbs.pdf', data, 'application/pdf'))])
+    job = r.json()['job_id']
+    assert r.json()['thumbnails'] == [f'/thumbnail/{job}/thumbs.pdf/1']
+    assert rendered == []
+    for _ in range(2):
+        r = client.get(f'/thumbnail/{job}/thumbs.pdf/1?size=64')
+        assert r.status_code == 200 and r.headers['content-type'] == 'image/jpeg'
+    assert rendered == [1]
+    assert client.get(f'/thumbnail/{job}/thumbs.pdf/2').status_code == 404
+    r = client.get(f'/thumbnail/{job}/thumbs.pdf/1?size=64&format=webp')
+    assert r.status_code == 200 and r.headers['content-type'] == 'image/webp'
+    assert client.get(f'/thumbnail/{job}/thumbs.pdf/1?format=bmp').status_code == 400
+
+    index = client.get(f'/thumbnail/{job}/thumbs.pdf/sprites?size=64').json()
+    assert index['pages'] == 1 and index['sheets'][0]['pages'][0]['page'] == 1
+    assert index['sheets'][0]['url'].startswith(f'/thumbnail/{job}/thumbs.pdf/sprites/0?')
+    monkeypatch.setattr(main, 'render_sheet', lambda src, sheet, size, columns: Image.new('RGB', (size, size)))
+    sheet = client.get(index['sheets'][0]['url'])
+    assert sheet.status_code == 200
+
+    def no_walk(*args):
+        raise AssertionError('sprite index rebuilt on a cache hit')
+
+    monkeypatch.setattr(main, 'sprite_index', no_walk)
+    assert client.get(f'/thumbnail/{job}/thumbs.pdf/sprites?size=64').json() == index
+    assert client.get(index['sheets'][0]['url']).content == sheet.content
+    assert client.get(f'/thumbnail/{job}/thumbs.pdf/sprites/1?size=64').status_code == 404
+
+
+def test_convert_pdf_to_docx_with_engine():
+    import uuid
+    r = client.post('/upload', files=[('files', ('text.pdf', _pdf_bytes(uuid.uuid4().hex), 'application/pdf'))])
+    job = r.json()['job_id']
+    assert client.post('/convert', data={'job_id': job, 'target': 'docx', 'engine': 'ocr'}).status_code == 400
+    r = client.post('/convert', data={'job_id': job, 'target': 'docx', 'engine': 'fast'})
+    assert r.status_code == 200
+    done = wait_for_job(job)
+    assert done['status'] == 'done' and 'fast' in done['message']
+
+
+def test_formats_and_unsupported_conversion():
+    formats = client.get('/formats').json()
+    assert 'pdf' in formats['csv'] and 'docx' in formats['png']
+    r = client.post('/upload', files=[('files', ('a.pdf', _pdf_bytes(), 'application/pdf'))])
+    r = client.post('/convert', data={'job_id': r.json()['job_id'], 'target': 'xlsx'})
+    assert r.status_code == 400
+
+
+def test_convert_txt_to_pdf_monospace():
+    from PyPDF2 import PdfReader
+    r = client.post('/upload', files=[('files', ('log.txt', b'x' * 500 + b'\nend\n', 'text/plain'))])
+    job = r.json()['job_id']
+    r = client.post('/convert', data={'job_id': job, 'target': 'pdf', 'monospace': 'true'})
+    assert r.status_code == 200
+    assert wait_for_job(job)['status'] == 'done'
+    text = PdfReader(r.json()['output']).pages[0].extract_text()
+    assert text.count('x') == 500 and 'end' in text
@@ -0,0 +1,48 @@
+import pytest
+from docx import Document
+from reportlab.pdfgen import canvas
+
+from utils import extract
+
+
+def _table_pdf(path):
+    c = canvas.Canvas(str(path))
+    for row in range(20):
+        for col in range(3):
+            c.rect(50 + col * 150, 700 - row * 20, 150, 20)
+            c.drawString(55 + col * 150, 705 - row * 20, f'r{row}c{col}')
+    c.showPage()
+    c.save()
+
+
+
+@pytest.mark.parametrize('engine', ['fast', 'layout'])
+def test_parallel_extraction_keeps_page_order(tmp_path, monkeypatch, engine, numbered_pdf):
+    monkeypatch.setattr(extract, 'EXTRACT_WORKERS', 3)
+    monkeypatch.setattr(extract, 'EXTRACT_PARALLEL_MIN_PAGES', 1)
+    monkeypatch.setattr(extract, 'EXTRACT_CHUNK_PAGES', 4)
+    src = tmp_path / 'src.pdf'
+    numbered_pdf(src, 30)
+    progress = []
+    texts = list(extract.iter_page_texts(str(src), 30, lambda msg, pct: progress.append(pct), engine))
+    assert texts == [f'page {n}' for n in range(1, 31)]
+    assert progress == sorted(progress) and len(progress) == 8
+
+
+def test_pdf_to_docx_writes_a_paragraph_per_page(tmp_path, numbered_pdf):
+    src = tmp_path / 'src.pdf'
+    numbered_pdf(src, 3)
+    out = tmp_path / 'out.docx'
+    assert extract.pdf_to_docx(str(src), out, 3, engine='fast') == 'fast'
+    paragraphs = [p.text for p in Document(str(out)).paragraphs if p.text.strip()]
+    assert paragraphs == ['page 1', 'page 2', 'page 3']
+
+
+def test_auto_engine_picks_layout_for_tables(tmp_path, numbered_pdf):
+    plain, table = tmp_path / 'plain.pdf', tmp_path / 'table.pdf'
+    numbered_pdf(plain, 12)
+    _table_pdf(table)
+    assert extract.resolve_engine('auto', str(plain), 12) == 'fast'
+    assert extract.resolve_engine('auto', str(table), 1) == 'layout'
+    with pytest.raises(ValueError):
+        extract.resolve_engine('ocr', str(plain), 12)
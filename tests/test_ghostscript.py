@@ -0,0 +1,74 @@
+import sys
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from utils import ghostscript
+
+# Stand-in for gs: writes the requested page range of the input unchanged
+FAKE_GS = f'''#!{sys.executable}
+import sys
+from PyPDF2 import PdfReader, PdfWriter
+opts = dict(a.lstrip('-').split('=', 1) for a in sys.argv[1:-1] if '=' in a)
+reader = PdfReader(sys.argv[-1])
+first, last = int(opts.get('dFirstPage', 1)), int(opts.get('dLastPage', len(reader.pages)))
+writer = PdfWriter()
+for i in range(first - 1, last):
+    writer.add_page(reader.pages[i])
+with open(opts['sOutputFile'], 'wb') as f:
+    writer.write(f)
+'''
+
+
+def test_page_ranges_cover_document():
+    assert ghostscript.page_ranges(10, 3) == [(1, 4), (5, 8), (9, 10)]
+    assert ghostscript.page_ranges(5, 1) == [(1, 5)]
+
+
+def test_slots_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(ghostscript, 'GS_SLOT_DIR', tmp_path)
+    monkeypatch.setattr(ghostscript, 'GS_SLOTS', 3)
+    with ghostscript.gs_slots(2) as a:
+        with ghostscript.gs_slots(5) as b:
+            assert (a, b) == (2, 1)
+    with ghostscript.gs_slots(5) as c:
+        assert c == 3
+
+
+def test_large_document_is_compressed_in_parallel_parts(tmp_path, monkeypatch):
+    gs = tmp_path / 'gs'
+    gs.write_text(FAKE_GS)
+    gs.chmod(0o755)
+    monkeypatch.setattr(ghostscript, 'GS_SLOT_DIR', tmp_path / 'slots')
+    monkeypatch.setattr(ghostscript, 'GS_SLOTS', 3)
+    monkeypatch.setattr(ghostscript, 'GS_SPLIT_MIN_PAGES', 100)
+    writer = PdfWriter()
+    for _ in range(150):
+        writer.add_blank_page(100, 100)
+    src = tmp_path / 'big.pdf'
+    with open(src, 'wb') as f:
+        writer.write(f)
+    out = tmp_path / 'out.pdf'
+    steps = []
+    ghostscript.compress_with_gs(str(gs), str(src), out, '/ebook', 150, 60, lambda m, p: steps.append(m))
+    assert len(PdfReader(str(out)).pages) == 150
+    assert steps[0] == 'Compressing 150 pages in 3 parallel parts'
+    assert not list(tmp_path.glob('.gs-*'))
+
+
+def test_large_document_is_compressed_whole_by_default(tmp_path, monkeypatch):
+    gs = tmp_path / 'gs'
+    gs.write_text(FAKE_GS)
+    gs.chmod(0o755)
+    monkeypatch.setattr(ghostscript, 'GS_SLOT_DIR', tmp_path / 'slots')
+    monkeypatch.setattr(ghostscript, 'GS_SLOTS', 3)
+    writer = PdfWriter()
+    for _ in range(400):
+        writer.add_blank_page(100, 100)
+    src = tmp_path / 'big.pdf'
+    with open(src, 'wb') as f:
+        writer.write(f)
+    out = tmp_path / 'out.pdf'
+    steps = []
+    ghostscript.compress_with_gs(str(gs), str(src), out, '/ebook', 400, 60, lambda m, p: steps.append(m))
+    assert steps == ['Compressing with Ghostscript']
+    assert len(PdfReader(str(out)).pages) == 400
@@ -0,0 +1,43 @@
+import pikepdf
+import pytest
+from PyPDF2 import PdfReader
+
+from utils import pdf_tools
+
+
+@pytest.fixture(params=['table', 'stream'])
+def src(request, tmp_path, numbered_pdf):
+    path = numbered_pdf(tmp_path / 'src.pdf', 5)
+    if request.param == 'stream':
+        # Same document saved with an xref stream (as pikepdf/qpdf and Acrobat write it)
+        with pikepdf.open(path) as pdf:
+            pdf.save(tmp_path / 'stream.pdf', object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        path = tmp_path / 'stream.pdf'
+    return path
+
+
+def test_rotate_appends_update_section(src, tmp_path, job_status):
+    out = tmp_path / 'rotated.pdf'
+    pdf_tools.rotate_pages_task(str(src), 90, '2,4', out, job_status)
+    assert job_status.message == 'Rotated (incremental update)'
+    assert out.read_bytes().startswith(src.read_bytes())
+    assert out.stat().st_size - src.stat().st_size < 2048
+    for reader in (PdfReader(str(out)), pikepdf.open(out)):
+        assert [int(p.get('/Rotate', 0)) for p in reader.pages] == [0, 90, 0, 90, 0]
+
+
+def test_reorder_appends_new_page_tree(src, tmp_path, job_status):
+    out = tmp_path / 'reordered.pdf'
+    pdf_tools.reorder_pages_task(str(src), '5,1,3', out, job_status)
+    assert job_status.message == 'Reordered (incremental update)'
+    texts = [p.extract_text().strip() for p in PdfReader(str(out)).pages]
+    assert texts == ['page 5', 'page 1', 'page 3']
+    assert len(pikepdf.open(out).pages) == 3
+
+
+def test_reorder_with_repeated_pages_rewrites(tmp_path, numbered_pdf, job_status):
+    src = numbered_pdf(tmp_path / 'src.pdf', 3)
+    out = tmp_path / 'reordered.pdf'
+    pdf_tools.reorder_pages_task(str(src), '1,1,2', out, job_status)
+    assert job_status.message == 'Reordered'
+    assert len(PdfReader(str(out)).pages) == 3
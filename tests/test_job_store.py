@@ -0,0 +1,45 @@
+import pytest
+
+from utils.job_store import JobStore, SQLiteJobStore
+from utils.pdf_tools import _update
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    store = SQLiteJobStore(tmp_path / 'jobs.sqlite3')
+    store.create({'job_id': 'j1', 'status': 'queued', 'message': '', 'progress': 0})
+    store.update('j1', status='processing', progress=40)
+
+    reopened = SQLiteJobStore(tmp_path / 'jobs.sqlite3')
+    job = reopened.get('j1')
+    assert job['status'] == 'processing'
+    assert job['progress'] == 40
+    assert reopened.get('missing') is None
+
+
+def test_handle_coalesces_progress_writes(tmp_path):
+    store = SQLiteJobStore(tmp_path / 'jobs.sqlite3')
+    store.create({'job_id': 'j1', 'status': 'queued', 'message': '', 'progress': 0})
+    handle = store.handle('j1', min_interval=3600)
+
+    _update(handle, 'processing', 'start', 1)  # status change: written
+    for i in range(2, 90):
+        _update(handle, 'processing', f'step {i}', i)  # coalesced
+    assert store.get('j1')['progress'] == 1
+
+    _update(handle, 'done', 'finished', 100)  # terminal: written
+    assert store.get('j1')['status'] == 'done'
+    assert store.get('j1')['progress'] == 100
+
+
+def test_backends_must_implement_storage():
+    class NoSave(JobStore):
+        def create(self, job):
+            pass
+
+        def get(self, job_id):
+            return None
+
+    with pytest.raises(TypeError):
+        JobStore()
+    with pytest.raises(TypeError):
+        NoSave()
@@ -0,0 +1,45 @@
+import io
+
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from utils import pdf_tools
+
+
+def _pdf_with_logo(path, text):
+    img = Image.effect_noise((200, 200), 64).convert('RGB')
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    c = canvas.Canvas(str(path))
+    c.drawImage(ImageReader(io.BytesIO(buf.getvalue())), 50, 500, 200, 200)
+    c.drawString(50, 450, text)
+    c.save()
+
+
+@pytest.mark.parametrize('engine', sorted(pdf_tools.MERGE_ENGINES))
+def test_merge_engines_keep_every_page(tmp_path, monkeypatch, engine, job_status):
+    monkeypatch.setattr(pdf_tools, 'MERGE_ENGINE', engine)
+    srcs = []
+    for n in range(3):
+        srcs.append(str(tmp_path / f'{n}.pdf'))
+        _pdf_with_logo(srcs[-1], f'doc {n}')
+    out = tmp_path / 'merged.pdf'
+    pdf_tools.merge_pdfs_task(srcs, out, job_status)
+    assert job_status.status == 'done'
+    reader = PdfReader(str(out))
+    assert [p.extract_text().strip() for p in reader.pages] == ['doc 0', 'doc 1', 'doc 2']
+
+
+def test_pikepdf_merge_shares_identical_images(tmp_path, monkeypatch, job_status):
+    pytest.importorskip('pikepdf')
+    monkeypatch.setattr(pdf_tools, 'MERGE_ENGINE', 'pikepdf')
+    src = tmp_path / 'a.pdf'
+    _pdf_with_logo(src, 'same')
+    out = tmp_path / 'merged.pdf'
+    pdf_tools.merge_pdfs_task([str(src)] * 4, out, job_status)
+    assert job_status.status == 'done'
+    # Four copies of the same page carry one image, not four
+    assert out.stat().st_size < 2 * src.stat().st_size
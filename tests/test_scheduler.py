@@ -0,0 +1,74 @@
+import time
+
+from utils.scheduler import FairQueue, INTERACTIVE
+
+
+class Task:
+    def __init__(self, job_id, operation, tenant='t', cost=1.0, age=0.0):
+        self.job_id = job_id
+        self.operation = operation
+        self.tenant = tenant
+        self.cost = cost
+        self.enqueued_at = time.monotonic() - age
+
+
+def test_interactive_jumps_ahead_of_bulk():
+    q = FairQueue(aging=3600)
+    q.push(Task('c1', 'compress'))
+    q.push(Task('c2', 'compress'))
+    q.push(Task('r1', 'rotate'))
+    assert q.pop().job_id == 'r1'
+    assert q.pop((INTERACTIVE,)) is None  # heavy slots full: only interactive allowed
+    assert [q.pop().job_id, q.pop().job_id] == ['c1', 'c2']
+    assert len(q) == 0
+
+
+def test_tenants_share_fairly_by_cost():
+    q = FairQueue(aging=3600)
+    for i in range(4):
+        q.push(Task(f'big{i}', 'merge', tenant='heavy', cost=10))
+    q.push(Task('small0', 'merge', tenant='light', cost=1))
+    q.push(Task('small1', 'merge', tenant='light', cost=1))
+    order = [q.pop().job_id for _ in range(6)]
+    # The light tenant is not stuck behind the heavy tenant's backlog
+    assert order.index('small1') < order.index('big2')
+
+
+def test_aging_prevents_starvation():
+    q = FairQueue(aging=1)
+    q.push(Task('old', 'compress', age=5))
+    q.push(Task('new', 'rotate'))
+    assert q.pop().job_id == 'old'
+
+
+def test_remove_pending_task():
+    q = FairQueue()
+    q.push(Task('a', 'merge'))
+    q.push(Task('b', 'merge'))
+    assert q.remove('a').job_id == 'a'
+    assert q.remove('a') is None
+    assert [t.job_id for t in q] == ['b']
+
+
+def test_returning_tenant_gets_no_banked_credit():
+    q = FairQueue(aging=3600)
+    q.push(Task('a0', 'merge', tenant='a'))
+    q.pop()
+    for i in range(500):
+        q.push(Task(f'b{i}', 'merge', tenant='b'))
+    for _ in range(400):
+        q.pop()
+    for i in range(50):
+        q.push(Task(f'a{i + 1}', 'merge', tenant='a'))
+    first = [q.pop().job_id[0] for _ in range(20)]
+    assert first.count('b') >= 9
+
+
+def test_idle_tenants_are_forgotten():
+    q = FairQueue(aging=3600)
+    for i in range(100):
+        q.push(Task(f'j{i}', 'merge', tenant=f'ip:{i}'))
+    q.remove('j0')
+    while q.pop():
+        pass
+    assert q._vtime == {} and q._queued == {}
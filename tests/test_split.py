@@ -0,0 +1,17 @@
+from PyPDF2 import PdfReader
+
+from utils import pdf_tools
+
+
+def test_parallel_split_writes_every_chunk(tmp_path, monkeypatch, numbered_pdf, job_status):
+    monkeypatch.setattr(pdf_tools, 'SPLIT_WORKERS', 3)
+    monkeypatch.setattr(pdf_tools, 'SPLIT_PARALLEL_MIN_PAGES', 1)
+    src = tmp_path / 'src.pdf'
+    numbered_pdf(src, 30)
+    out_dir = tmp_path / 'split'
+    pdf_tools.split_pdf_task(str(src), '1-5, 6, 7-30', out_dir, job_status)
+    assert job_status.status == 'done'
+    assert sorted(p.name for p in out_dir.iterdir()) == ['split_1_1-5.pdf', 'split_2_6-6.pdf', 'split_3_7-30.pdf']
+    last = PdfReader(str(out_dir / 'split_3_7-30.pdf'))
+    assert len(last.pages) == 24
+    assert last.pages[0].extract_text().strip() == 'page 7'
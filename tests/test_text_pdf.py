@@ -0,0 +1,40 @@
+from PyPDF2 import PdfReader
+from reportlab import rl_config
+
+from utils import text_pdf
+
+
+def test_wrap_monospace_prefers_spaces():
+    assert text_pdf.wrap_monospace('aaaa bbbb cccc', 10) == ['aaaa bbbb', 'cccc']
+    assert text_pdf.wrap_monospace('x' * 25, 10) == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+def test_lines_stream_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_pdf, 'TXT_CHUNK_CHARS', 7)
+    src = tmp_path / 'in.txt'
+    src.write_text('first line\r\nsecond\tline\nthird\fpage\nlast')
+    assert list(text_pdf.iter_lines(src)) == ['first line', 'second  line', 'third', None, 'page', 'last']
+
+
+def test_long_lines_wrap_instead_of_clipping(tmp_path):
+    src = tmp_path / 'in.txt'
+    a85 = rl_config.useA85
+    words = ' '.join(f'w{n}' for n in range(400))
+    src.write_text(words + '\n' + 'short\n' * 200)
+    for monospace in (False, True):
+        out = tmp_path / f'out{monospace}.pdf'
+        pages = text_pdf.txt_to_pdf(src, out, monospace)
+        reader = PdfReader(str(out))
+        assert pages == len(reader.pages) > 1
+        text = reader.pages[0].extract_text()
+        assert 'w0' in text and 'w399' in text
+        assert max(len(line) for line in text.splitlines()) < 120
+    assert rl_config.useA85 == a85
+
+
+def test_form_feed_starts_a_page(tmp_path):
+    src = tmp_path / 'in.txt'
+    src.write_text('one\n\ftwo\n')
+    out = tmp_path / 'out.pdf'
+    assert text_pdf.txt_to_pdf(src, out, monospace=True) == 2
+    assert [p.extract_text().strip() for p in PdfReader(str(out)).pages] == ['one', 'two']
@@ -0,0 +1,109 @@
+import os
+
+from PIL import Image
+
+from utils.thumbnails import MAX_SHEET_PIXELS, ThumbnailCache, clamp_sprite, render_sheet, sprite_index
+
+
+def _noise():
+    return Image.effect_noise((200, 200), 80).convert('RGB')
+
+
+def test_cache_renders_once_per_key(tmp_path):
+    cache = ThumbnailCache(tmp_path, budget=10 ** 9)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return _noise()
+
+    first = cache.get('ab' * 32, 'p1_320', render)
+    again = cache.get('ab' * 32, 'p1_320', render)
+    other = cache.get('ab' * 32, 'p1_160', render)
+    assert first == again != other
+    assert len(calls) == 2
+    webp = cache.get('ab' * 32, 'p1_320', render, 'webp')
+    assert webp.suffix == '.webp' and Image.open(webp).format == 'WEBP'
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ThumbnailCache(tmp_path, budget=10 ** 9)
+    paths = [cache.get('cd' * 32, f'p{page}_320', _noise) for page in range(1, 5)]
+    for i, p in enumerate(paths):
+        os.utime(p, (1000 + i, 1000 + i))
+    cache.get('cd' * 32, 'p1_320', _noise)  # hit: page 1 becomes most recent
+    each = paths[0].stat().st_size
+    cache.budget = int(each * 3.5)
+    cache.get('cd' * 32, 'p5_320', _noise)
+    left = {p.name for p in tmp_path.glob('*/*.jpg')}
+    assert paths[1].name not in left and paths[2].name not in left
+    assert paths[0].name in left
+
+
+def test_thumbnails_render_ranges_straight_to_files(tmp_path, monkeypatch):
+    import pdf2image
+    from PyPDF2 import PdfWriter
+    from utils import pdf_tools
+
+    calls = []
+
+    def fake_convert(path, size, first_page, last_page, output_folder, paths_only, **kwargs):
+        assert paths_only and size == 100
+        calls.append((first_page, last_page))
+        out = []
+        for n in range(first_page, last_page + 1):
+            p = os.path.join(output_folder, f'x-{n:03d}.jpg')
+            Image.new('RGB', (10, 10)).save(p)
+            out.append(p)
+        return out
+
+    monkeypatch.setattr(pdf2image, 'convert_from_path', fake_convert)
+    monkeypatch.setattr(pdf_tools, 'THUMBNAIL_CHUNK_PAGES', 4)
+    writer = PdfWriter()
+    for _ in range(10):
+        writer.add_blank_page(100, 100)
+    src = tmp_path / 'doc.pdf'
+    with open(src, 'wb') as f:
+        writer.write(f)
+
+    paths = pdf_tools.generate_pdf_thumbnails(src, tmp_path / 'thumbs', size=100)
+    assert [p.name for p in paths] == [f'doc_p{n}.jpg' for n in range(1, 11)]
+    assert sorted(calls) == [(1, 4), (5, 8), (9, 10)]
+    assert not list((tmp_path / 'thumbs').glob('.render-*'))
+
+
+def test_sprite_index_and_sheet(tmp_path, monkeypatch):
+    import pdf2image
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for n in range(7):
+        writer.add_blank_page(200, 100) if n == 2 else writer.add_blank_page(100, 200)
+    src = tmp_path / 'doc.pdf'
+    with open(src, 'wb') as f:
+        writer.write(f)
+
+    index = sprite_index(src, size=50, per_sheet=4, columns=2)
+    assert [len(s) for s in index['sheets']] == [4, 3]
+    assert index['sheets'][0][2] == {'page': 3, 'x': 0, 'y': 50, 'w': 50, 'h': 25}
+    assert index['sheets'][1][1] == {'page': 6, 'x': 50, 'y': 0, 'w': 25, 'h': 50}
+
+    calls = []
+
+    def fake_convert(path, size, first_page, last_page, **kwargs):
+        calls.append((first_page, last_page))
+        return [Image.new('RGB', (24, 50), 'black') for _ in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(pdf2image, 'convert_from_path', fake_convert)
+    sheet = render_sheet(src, index['sheets'][1], 50, 2)
+    assert calls == [(5, 7)]
+    assert sheet.size == (100, 100)
+    assert sheet.getpixel((10, 60)) == (0, 0, 0) and sheet.getpixel((60, 60)) == (255, 255, 255)
+
+
+def test_sprite_sheets_are_bounded():
+    assert clamp_sprite(50, 160) == (50, 160)
+    per_sheet, size = clamp_sprite(100, 1024)
+    assert size == 256
+    assert per_sheet * size * size <= MAX_SHEET_PIXELS
+    assert clamp_sprite(0, 1) == (1, 32)
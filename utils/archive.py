@@ -0,0 +1,70 @@
+from __future__ import annotations
+import io
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Tuple
+
+ZIP_CHUNK = 1024 * 1024
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable write target that hands back whatever zipfile wrote since the last `take`."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files: Iterable[Tuple[Path, str]], chunk_size: int = ZIP_CHUNK) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of `(path, arcname)` pairs piece by piece, without a
+    temp file or holding whole members in memory. Members are stored, not
+    deflated: the outputs are PDFs/images that are already compressed.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for path, arcname in files:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            large = path.stat().st_size > zipfile.ZIP64_LIMIT
+            with open(path, "rb") as src, zf.open(info, "w", force_zip64=large) as dst:
+                for chunk in iter(lambda: src.read(chunk_size), b""):
+                    dst.write(chunk)
+                    data = sink.take()
+                    if data:
+                        yield data
+    data = sink.take()
+    if data:
+        yield data
+
+
+def follow_dir(directory: Path, finished: Callable[[], bool], pattern: str = "*",
+               poll_interval: float = 0.2) -> Iterator[Path]:
+    """
+    Yield files in `directory` as they appear until `finished()` is true and
+    none are left. Dotfiles are skipped: writers create `.name.part` and rename
+    it once complete, so only finished files are ever yielded.
+    """
+    seen: set[Path] = set()
+    while True:
+        done = finished()  # checked before listing, so files from the last moments are not lost
+        new = sorted(p for p in directory.glob(pattern)
+                     if p not in seen and not p.name.startswith(".") and p.is_file())
+        for path in new:
+            seen.add(path)
+            yield path
+        if done:
+            return
+        if not new:
+            time.sleep(poll_interval)
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+MANIFEST_NAME = ".manifest.json"
+HASH_CHUNK = 1024 * 1024
+DERIVED_CACHE_BYTES = int(os.getenv("DERIVED_CACHE_BYTES", 2 * 1024 * 1024 * 1024))
+# Unlinked blobs are kept this long after their last link change, so an upload
+# between `ingest` and `link_into` never loses its blob
+BLOB_GC_GRACE = 3600
+
+
+def _link_or_copy(src: Path, dest: Path):
+    """Hardlink `src` to `dest`, falling back to a copy across filesystems."""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def hash_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed store for uploads, keyed by SHA-256.
+
+    Each distinct file is kept once under `<root>/sha256/<ab>/<digest>` (read-only)
+    and hardlinked into the job directories that use it; a per-job manifest maps
+    file names back to digests. Outputs derived from blobs (thumbnails, merged or
+    converted files) are cached under `<root>/derived/<key>` so jobs that share
+    inputs reuse them instead of recomputing.
+
+    `collect` reclaims space: blobs no job links any more (hardlink count 1)
+    are removed, and derived outputs are evicted least recently used first
+    once they outgrow `budget`. It runs whenever a new derived output takes
+    the cache over budget, and periodically from the server.
+    """
+
+    def __init__(self, root: Path, budget: int = DERIVED_CACHE_BYTES):
+        self.root = root
+        self.budget = budget
+        self.tmp_dir = root / "tmp"
+        for d in (root / "sha256", root / "derived", self.tmp_dir):
+            d.mkdir(parents=True, exist_ok=True)
+        self._derived_size: Optional[int] = None  # this process's running estimate
+
+    # ----- blobs -----
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / "sha256" / digest[:2] / digest
+
+    def tmp_path(self) -> Path:
+        return self.tmp_dir / uuid.uuid4().hex
+
+    def ingest(self, tmp_path: Path, digest: str) -> Path:
+        """Move a fully written temp file into the store, or drop it if the blob already exists."""
+        blob = self.blob_path(digest)
+        if blob.exists():
+            try:
+                os.utime(blob)  # refreshes ctime, so `collect` leaves it alone until it is linked
+            except PermissionError:
+                pass
+            except FileNotFoundError:
+                return self.ingest(tmp_path, digest)  # collected meanwhile
+            tmp_path.unlink(missing_ok=True)
+            return blob
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, blob)
+        return blob
+
+    def ingest_file(self, path: Path) -> str:
+        """Hash an existing file, store it and replace `path` with a link to the blob."""
+        digest = hash_file(path)
+        tmp = self.tmp_path()
+        os.replace(path, tmp)
+        self.link_into(self.ingest(tmp, digest), path)
+        return digest
+
+    def link_into(self, blob: Path, dest: Path):
+        _link_or_copy(blob, dest)
+
+    # ----- derived outputs -----
+
+    @staticmethod
+    def derived_key(operation: str, digests: Iterable[str], params: Optional[dict] = None) -> str:
+        payload = json.dumps([operation, list(digests), params or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def derived_dir(self, key: str) -> Path:
+        return self.root / "derived" / key[:2] / key
+
+    def fetch_derived(self, key: str, dest: Path) -> bool:
+        cached = self.derived_dir(key) / "output"
+        try:
+            os.utime(cached)  # LRU order for `collect`
+        except FileNotFoundError:
+            return False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            _link_or_copy(cached, dest)
+        except FileNotFoundError:
+            return False  # evicted between the two calls
+        return True
+
+    def store_derived(self, key: str, src: Path):
+        d = self.derived_dir(key)
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = self.tmp_path()
+        shutil.copyfile(src, tmp)
+        os.chmod(tmp, 0o444)
+        added = tmp.stat().st_size
+        os.replace(tmp, d / "output")
+        if self._derived_size is None:
+            self._derived_size = sum(size for _, size, _ in self._derived_entries())
+        else:
+            self._derived_size += added
+        if self._derived_size > self.budget:
+            self.collect()
+
+    # ----- garbage collection -----
+
+    def _derived_entries(self):
+        for p in (self.root / "derived").glob("*/*/output"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            yield st.st_mtime, st.st_size, p
+
+    def collect(self) -> int:
+        """Remove unreferenced blobs and evict derived outputs beyond the budget; returns bytes freed."""
+        freed = 0
+        with open(self.root / ".gc.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            cutoff = time.time() - BLOB_GC_GRACE
+            for blob in (self.root / "sha256").glob("*/*"):
+                try:
+                    st = blob.stat()
+                except FileNotFoundError:
+                    continue
+                if st.st_nlink == 1 and st.st_ctime < cutoff:
+                    blob.unlink(missing_ok=True)
+                    freed += st.st_size
+            entries = sorted(self._derived_entries())
+            total = sum(size for _, size, _ in entries)
+            if total > self.budget:
+                goal = int(self.budget * 0.9)
+                for _, size, path in entries:
+                    if total <= goal:
+                        break
+                    shutil.rmtree(path.parent, ignore_errors=True)
+                    total -= size
+                    freed += size
+            self._derived_size = total
+        return freed
+
+
+# ---------- Job manifests ----------
+
+def record_digest(job_dir: Path, filename: str, digest: str):
+    manifest = job_dir / MANIFEST_NAME
+    with open(manifest, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        raw = f.read()
+        entries = json.loads(raw) if raw else {}
+        entries[filename] = digest
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(entries))
+
+
+def file_digest(path: Path) -> str:
+    """Digest of an uploaded file from its job manifest, hashing it if it predates the store."""
+    try:
+        entries = json.loads((path.parent / MANIFEST_NAME).read_text())
+        return entries[path.name]
+    except (FileNotFoundError, KeyError, ValueError):
+        return hash_file(path)
+
+
+def cached_task(store: BlobStore, operation: str, inputs: List[str], params: dict,
+                out_path: Path, task, args: List, job_status):
+    """
+    Run `task(*args, job_status)` unless an output of `operation` on the same
+    input blobs with the same params is cached, in which case it is linked to
+    `out_path`. Successful outputs are added to the cache.
+    """
+    from utils.pdf_tools import _update
+    try:
+        key = store.derived_key(operation, [file_digest(Path(p)) for p in inputs], params)
+    except OSError:
+        key = None
+    if key and store.fetch_derived(key, out_path):
+        _update(job_status, "done", f"Saved to {out_path} (cached)", 100)
+        return
+    out_path.unlink(missing_ok=True)  # never write through a hardlink into the cache
+    task(*args, job_status)
+    if key and getattr(job_status, "status", None) == "done" and out_path.exists():
+        try:
+            store.store_derived(key, out_path)
+        except OSError:
+            pass
@@ -0,0 +1,230 @@
+from __future__ import annotations
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image
+
+from utils.executor import inner_workers
+
+try:
+    import pikepdf
+except Exception:
+    pikepdf = None
+
+# Preset -> (longest image side in pixels or None to keep, JPEG quality)
+PRESETS = {
+    'low': (1000, 45),
+    'medium': (1600, 65),
+    'high': (2400, 80),
+    'max': (None, 90),
+}
+# Least to most aggressive, for target-size mode
+PRESET_ORDER = ("max", "high", "medium", "low")
+SAMPLE_PAGES = 6
+COMPRESS_WORKERS = int(os.getenv("COMPRESS_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+# Below this many images the pool costs more than it saves
+_POOL_MIN_IMAGES = 4
+_MIN_IMAGE_BYTES = 8 * 1024
+
+ProgressFn = Callable[[str, int], None]
+
+
+# ---------- Image recompression (runs in pool workers) ----------
+
+def _decode(job: dict) -> Optional[Image.Image]:
+    if job["filter"] == "/DCTDecode":
+        img = Image.open(io.BytesIO(job["data"]))
+        img.load()
+        return img if img.mode in ("L", "RGB") else None
+    mode = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}[job["colorspace"]]
+    return Image.frombytes(mode, (job["width"], job["height"]), job["data"])
+
+
+def recompress_image(job: dict) -> Optional[tuple[bytes, int, int, str]]:
+    """Downsample and JPEG-encode one image; None if that would not make it smaller."""
+    try:
+        img = _decode(job)
+    except Exception:
+        return None
+    if img is None:
+        return None
+    max_side, quality = PRESETS[job["preset"]]
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    data = buf.getvalue()
+    if len(data) >= job["raw_size"]:
+        return None
+    return data, img.width, img.height, "/DeviceRGB" if img.mode == "RGB" else "/DeviceGray"
+
+
+# ---------- Document side ----------
+
+_LOSSLESS_FILTERS = {"/FlateDecode", "/ASCII85Decode", "/ASCIIHexDecode", "/LZWDecode", "/RunLengthDecode"}
+
+
+def _image_job(obj, preset: str) -> Optional[dict]:
+    """Data for an image we know how to rebuild, or None to leave it alone."""
+    filt = obj.get("/Filter")
+    filters = [str(f) for f in filt] if isinstance(filt, pikepdf.Array) else [str(filt)] if filt else []
+    colorspace = obj.get("/ColorSpace")
+    if not isinstance(colorspace, pikepdf.Name) or str(colorspace) not in ("/DeviceRGB", "/DeviceGray"):
+        return None
+    if obj.get("/BitsPerComponent") != 8 or "/Decode" in obj or obj.get("/ImageMask"):
+        return None
+    raw_size = len(obj.read_raw_bytes())
+    if raw_size < _MIN_IMAGE_BYTES:
+        return None
+    if filters == ["/DCTDecode"]:
+        data, kind = obj.read_raw_bytes(), "/DCTDecode"
+    elif set(filters) <= _LOSSLESS_FILTERS:
+        # qpdf undoes the lossless filters (and PNG predictors) for us
+        data, kind = obj.read_bytes(), None
+    else:
+        return None
+    return {"data": data, "filter": kind, "colorspace": str(colorspace), "preset": preset,
+            "width": int(obj.Width), "height": int(obj.Height), "raw_size": raw_size}
+
+
+def _collect_images(pdf) -> Dict[tuple, object]:
+    images: Dict[tuple, object] = {}
+    seen_forms = set()
+
+    def walk(resources):
+        xobjects = resources.get("/XObject") if resources is not None else None
+        if xobjects is None:
+            return
+        for _, xobj in xobjects.items():
+            if not xobj.is_indirect:
+                continue
+            subtype = xobj.get("/Subtype")
+            if subtype == pikepdf.Name.Image:
+                images.setdefault(xobj.objgen, xobj)
+            elif subtype == pikepdf.Name.Form and xobj.objgen not in seen_forms:
+                seen_forms.add(xobj.objgen)
+                walk(xobj.get("/Resources"))
+
+    for page in pdf.pages:
+        walk(page.obj.get("/Resources"))
+    return images
+
+
+def _map(jobs: List[dict], progress: ProgressFn) -> List:
+    workers = inner_workers(COMPRESS_WORKERS)
+    if len(jobs) < _POOL_MIN_IMAGES or workers < 2:
+        results = []
+        for i, job in enumerate(jobs, start=1):
+            results.append(recompress_image(job))
+            progress(f"Recompressed image {i}/{len(jobs)}", int(10 + i / len(jobs) * 70))
+        return results
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+    results = []
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context("fork")) as pool:
+        for i, result in enumerate(pool.map(recompress_image, jobs, chunksize=2), start=1):
+            results.append(result)
+            progress(f"Recompressed image {i}/{len(jobs)}", int(10 + i / len(jobs) * 70))
+    return results
+
+
+def compress_pdf(src: str, out_path: Path, preset: str = "medium",
+                 progress: Optional[ProgressFn] = None) -> dict:
+    """
+    Pure-Python compression: downsample/re-encode RGB and gray images per
+    preset (in a process pool), Flate-compress uncompressed streams, drop
+    unused resources and unreachable objects, and pack objects into object
+    streams. Needs pikepdf; without it only content streams are compressed.
+    Never produces a file larger than `src`. Returns size statistics.
+    """
+    progress = progress or (lambda msg, pct: None)
+    preset = preset if preset in PRESETS else "medium"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    replaced = 0
+    if pikepdf is None:
+        from PyPDF2 import PdfReader, PdfWriter
+        reader = PdfReader(src)
+        writer = PdfWriter()
+        for page in reader.pages:
+            page.compress_content_streams()
+            writer.add_page(page)
+        with open(out_path, "wb") as f:
+            writer.write(f)
+    else:
+        with pikepdf.open(src) as pdf:
+            progress("Scanning images", 5)
+            images = [(obj, _image_job(obj, preset)) for obj in _collect_images(pdf).values()]
+            images = [(obj, job) for obj, job in images if job]
+            results = _map([job for _, job in images], progress)
+            for (obj, _), result in zip(images, results):
+                if result is None:
+                    continue
+                data, width, height, colorspace = result
+                obj.write(data, filter=pikepdf.Name.DCTDecode)
+                if "/DecodeParms" in obj:
+                    del obj["/DecodeParms"]  # PNG predictor parameters of the old Flate data
+                obj.Width, obj.Height = width, height
+                obj.ColorSpace = pikepdf.Name(colorspace)
+                obj.BitsPerComponent = 8
+                replaced += 1
+            progress("Writing", 85)
+            pdf.remove_unreferenced_resources()
+            pdf.save(
+                str(out_path),
+                compress_streams=True,
+                recompress_flate=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            )
+    before, after = os.path.getsize(src), out_path.stat().st_size
+    if after >= before:
+        shutil.copyfile(src, out_path)
+        after = before
+    return {"before": before, "after": after, "images_recompressed": replaced}
+
+
+# ---------- Target size ----------
+
+def sample_pdf(src: str, out_path: Path, pages: int = SAMPLE_PAGES) -> int:
+    """Write up to `pages` evenly spaced pages of `src` to `out_path`; returns how many."""
+    from PyPDF2 import PdfReader, PdfWriter
+    reader = PdfReader(src)
+    total = len(reader.pages)
+    picks = sorted({round(i * (total - 1) / max(pages - 1, 1)) for i in range(min(pages, total))})
+    if pikepdf is not None:
+        with pikepdf.open(src) as pdf, pikepdf.new() as sample:
+            sample.pages.extend(pdf.pages[i] for i in picks)
+            sample.save(str(out_path))
+    else:
+        writer = PdfWriter()
+        for i in picks:
+            writer.add_page(reader.pages[i])
+        with open(out_path, "wb") as f:
+            writer.write(f)
+    return len(picks)
+
+
+def estimate_sizes(src: str, compress: Callable[[str, str, Path], object], target_bytes: int,
+                   sample_pages: int = SAMPLE_PAGES) -> Dict[str, int]:
+    """
+    Estimate the compressed size of `src` per preset by running `compress(sample,
+    preset, out)` on a few sample pages and scaling the ratio to the whole file.
+    Presets are tried least aggressive first and the search stops at the first
+    one estimated to fit `target_bytes`.
+    """
+    size = os.path.getsize(src)
+    estimates: Dict[str, int] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = Path(tmp) / "sample.pdf"
+        sample_pdf(src, sample, sample_pages)
+        sample_size = sample.stat().st_size
+        for preset in PRESET_ORDER:
+            out = Path(tmp) / f"{preset}.pdf"
+            compress(str(sample), preset, out)
+            estimates[preset] = int(size * out.stat().st_size / sample_size)
+            if estimates[preset] <= target_bytes:
+                break
+    return estimates
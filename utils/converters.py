@@ -0,0 +1,223 @@
+from __future__ import annotations
+import heapq
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+ProgressFn = Callable[[str, int], None]
+# Converters take (src, out, progress, options) and may return a note for the job message
+ConvertFn = Callable[[Path, Path, ProgressFn, dict], Optional[str]]
+
+ALIASES = {"jpeg": "jpg"}
+# Added to the cost of converters that throw away formatting or structure, so a route only
+# goes through one when no route that keeps it exists (or its target is asked for directly)
+LOSSY = 10.0
+
+
+class Converter(NamedTuple):
+    source: str
+    target: str
+    cost: float  # relative time per document, plus LOSSY for steps that drop content; routes minimise the sum
+    fn: ConvertFn
+
+
+# source format -> target format -> converter
+CONVERTERS: Dict[str, Dict[str, Converter]] = {}
+
+
+def normalize(fmt: str) -> str:
+    fmt = fmt.lower().lstrip(".")
+    return ALIASES.get(fmt, fmt)
+
+
+def register(sources: str, target: str, cost: float = 1.0):
+    """Register the decorated function as a converter from each of `sources` (space separated) to `target`."""
+    def wrap(fn: ConvertFn) -> ConvertFn:
+        for source in sources.split():
+            CONVERTERS.setdefault(normalize(source), {})[normalize(target)] = Converter(
+                normalize(source), normalize(target), cost, fn)
+        find_route.cache_clear()
+        return fn
+    return wrap
+
+
+@lru_cache(maxsize=256)
+def find_route(source: str, target: str) -> Optional[tuple[Converter, ...]]:
+    """Cheapest chain of converters from `source` to `target` (Dijkstra over the registry), or None."""
+    source, target = normalize(source), normalize(target)
+    best = {source: 0.0}
+    queue: List[tuple[float, int, str, tuple]] = [(0.0, 0, source, ())]
+    tie = 0
+    while queue:
+        cost, _, fmt, path = heapq.heappop(queue)
+        if fmt == target:
+            return path or None
+        if cost > best.get(fmt, float("inf")):
+            continue
+        for conv in CONVERTERS.get(fmt, {}).values():
+            total = cost + conv.cost
+            if total < best.get(conv.target, float("inf")):
+                best[conv.target] = total
+                tie += 1
+                heapq.heappush(queue, (total, tie, conv.target, path + (conv,)))
+    return None
+
+
+def targets(source: str) -> List[str]:
+    """Every format reachable from `source`."""
+    source = normalize(source)
+    seen, todo = {source}, [source]
+    while todo:
+        for target in CONVERTERS.get(todo.pop(), {}):
+            if target not in seen:
+                seen.add(target)
+                todo.append(target)
+    return sorted(seen - {source})
+
+
+def convert_file(src: Path, target: str, out_path: Path, progress: Optional[ProgressFn] = None,
+                 **options) -> tuple[List[str], List[str]]:
+    """
+    Convert `src` to `target` along the cheapest route, writing intermediate
+    formats to temp files next to `out_path`. Returns the formats visited and
+    any notes from the converters. Raises ValueError if no route exists.
+    """
+    progress = progress or (lambda msg, pct: None)
+    route = find_route(src.suffix, target)
+    if not route:
+        raise ValueError(f"Unsupported conversion: {src.suffix} -> {target}")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    notes: List[str] = []
+    with tempfile.TemporaryDirectory(dir=out_path.parent, prefix=".convert-") as tmp:
+        current = src
+        for i, conv in enumerate(route):
+            last = i == len(route) - 1
+            dest = out_path if last else Path(tmp) / f"step{i}.{conv.target}"
+            lo, span = 5 + 90 * i / len(route), 90 / len(route)
+            hop_progress = (lambda msg, pct, lo=lo, span=span: progress(msg, int(lo + span * pct / 100)))
+            if len(route) > 1:
+                progress(f"Converting {conv.source} -> {conv.target}", int(lo))
+            note = conv.fn(current, dest, hop_progress, options)
+            if note:
+                notes.append(note)
+            current = dest
+    return [route[0].source] + [c.target for c in route], notes
+
+
+# ---------- Converters ----------
+# Libraries are imported inside each converter so that only the ones a route uses are loaded.
+
+@register("pdf", "docx", cost=5)
+def pdf_to_docx(src: Path, out: Path, progress: ProgressFn, options: dict) -> str:
+    from utils.extract import pdf_to_docx as extract_to_docx
+    from utils.pdf_tools import page_count
+    engine = extract_to_docx(str(src), out, page_count(src), progress, options.get("engine"))
+    return f"{engine} text extraction"
+
+
+@register("docx", "pdf", cost=3)
+def docx_to_pdf(src: Path, out: Path, progress: ProgressFn, options: dict):
+    from utils.docx_layout import docx_to_pdf as layout_docx
+    layout_docx(src, out, progress)
+
+
+@register("docx", "txt", cost=1 + LOSSY)
+def docx_to_txt(src: Path, out: Path, progress: ProgressFn, options: dict):
+    from docx import Document
+    with open(out, "w", encoding="utf-8") as f:
+        for para in Document(str(src)).paragraphs:
+            f.write(para.text + "\n")
+
+
+@register("txt", "pdf")
+def txt_to_pdf(src: Path, out: Path, progress: ProgressFn, options: dict):
+    from utils.text_pdf import txt_to_pdf as render_text
+    render_text(src, out, bool(options.get("monospace")), progress)
+
+
+@register("txt", "docx")
+def txt_to_docx(src: Path, out: Path, progress: ProgressFn, options: dict):
+    from docx import Document
+    doc = Document()
+    with open(src, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            doc.add_paragraph(line.rstrip("\n"))
+    doc.save(str(out))
+
+
+@register("csv", "xlsx")
+def csv_to_xlsx(src: Path, out: Path, progress: ProgressFn, options: dict):
+    import csv
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    with open(src, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+        for row in csv.reader(f):
+            ws.append(row)
+    wb.save(str(out))
+
+
+@register("xlsx", "csv")
+def xlsx_to_csv(src: Path, out: Path, progress: ProgressFn, options: dict):
+    import csv
+    from openpyxl import load_workbook
+    wb = load_workbook(str(src), read_only=True, data_only=True)
+    try:
+        with open(out, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            for row in wb.active.iter_rows(values_only=True):
+                writer.writerow(["" if v is None else v for v in row])
+    finally:
+        wb.close()
+
+
+@register("csv", "txt")
+def csv_to_txt(src: Path, out: Path, progress: ProgressFn, options: dict):
+    """Fixed-width table: every column padded to its widest cell (capped at 40 characters)."""
+    import csv
+    with open(src, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+        rows = [[cell[:40] for cell in row] for row in csv.reader(f)]
+    widths: List[int] = []
+    for row in rows:
+        for i, cell in enumerate(row):
+            if i == len(widths):
+                widths.append(0)
+            widths[i] = max(widths[i], len(cell))
+    with open(out, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write("  ".join(cell.ljust(w) for cell, w in zip(row, widths)).rstrip() + "\n")
+
+
+@register("jpg png", "pdf")
+def image_to_pdf(src: Path, out: Path, progress: ProgressFn, options: dict):
+    from PIL import Image
+    img = Image.open(src)
+    img = img.convert('RGB')
+    img.save(str(out), "PDF", resolution=100.0)
+
+
+@register("jpg", "png")
+def jpg_to_png(src: Path, out: Path, progress: ProgressFn, options: dict):
+    from PIL import Image
+    Image.open(src).save(str(out))
+
+
+@register("png", "jpg")
+def png_to_jpg(src: Path, out: Path, progress: ProgressFn, options: dict):
+    from PIL import Image
+    Image.open(src).convert('RGB').save(str(out))
+
+
+@register("jpg png", "docx")
+def image_to_docx(src: Path, out: Path, progress: ProgressFn, options: dict):
+    """The image at its own size, scaled down to the text width if wider."""
+    from docx import Document
+    doc = Document()
+    section = doc.sections[0]
+    text_width = section.page_width - section.left_margin - section.right_margin
+    picture = doc.add_picture(str(src))
+    if picture.width > text_width:
+        picture.height = int(picture.height * text_width / picture.width)
+        picture.width = text_width
+    doc.save(str(out))
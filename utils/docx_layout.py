@@ -0,0 +1,276 @@
+from __future__ import annotations
+import re
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+BODY_SIZE = 12.0
+LEADING = 1.2  # line height as a multiple of the largest font size on the line
+PARAGRAPH_SPACING = 4.0
+MARGIN = 50.0
+# Paragraph style id -> (font size, bold)
+HEADING_STYLES = {
+    "Title": (24.0, True),
+    "Heading1": (18.0, True),
+    "Heading2": (15.0, True),
+    "Heading3": (13.0, True),
+}
+FONTS = {
+    (False, False): "Helvetica",
+    (True, False): "Helvetica-Bold",
+    (False, True): "Helvetica-Oblique",
+    (True, True): "Helvetica-BoldOblique",
+}
+PAGE_BREAK = "\f"
+
+ProgressFn = Callable[[str, int], None]
+
+
+class Run(NamedTuple):
+    text: str
+    font: str
+    size: float
+
+
+# ---------- Reading ----------
+
+def _on(props, tag: str) -> Optional[bool]:
+    el = props.find(W + tag) if props is not None else None
+    if el is None:
+        return None
+    return el.get(W + "val", "true") not in ("0", "false", "none")
+
+
+def _paragraph_runs(p) -> List[Run]:
+    ppr = p.find(W + "pPr")
+    style = ppr.find(W + "pStyle") if ppr is not None else None
+    size, bold = HEADING_STYLES.get(style.get(W + "val") if style is not None else "", (BODY_SIZE, False))
+    runs: List[Run] = []
+    if ppr is not None and ppr.find(W + "pageBreakBefore") is not None:
+        runs.append(Run(PAGE_BREAK, FONTS[False, False], size))
+    for r in p.iter(W + "r"):
+        rpr = r.find(W + "rPr")
+        b, i = _on(rpr, "b"), _on(rpr, "i")
+        sz = rpr.find(W + "sz") if rpr is not None else None
+        run_size = float(sz.get(W + "val")) / 2 if sz is not None and sz.get(W + "val", "").isdigit() else size
+        font = FONTS[bold if b is None else b, bool(i)]
+        parts = []
+        for child in r:
+            if child.tag == W + "t":
+                parts.append(child.text or "")
+            elif child.tag == W + "tab":
+                parts.append("    ")
+            elif child.tag == W + "br":
+                parts.append(PAGE_BREAK if child.get(W + "type") == "page" else "\n")
+        if parts:
+            runs.append(Run("".join(parts), font, run_size))
+    return runs
+
+
+class _CountingReader:
+    def __init__(self, f):
+        self._f = f
+        self.read_bytes = 0
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._f.read(n)
+        self.read_bytes += len(data)
+        return data
+
+
+def iter_paragraphs(src: Path, progress: Optional[ProgressFn] = None) -> Iterator[List[Run]]:
+    """
+    Yield each paragraph of a DOCX body (table cells included) as styled runs,
+    parsing word/document.xml incrementally. Finished elements are freed, so
+    memory does not grow with the document.
+    """
+    from lxml import etree
+    with zipfile.ZipFile(src) as zf:
+        info = zf.getinfo("word/document.xml")
+        with zf.open(info) as raw:
+            f = _CountingReader(raw)
+            for n, (_, p) in enumerate(etree.iterparse(f, events=("end",), tag=W + "p"), start=1):
+                # Paragraphs inside text boxes are handled with their own end event
+                if p.getparent() is not None and p.getparent().tag == W + "txbxContent":
+                    continue
+                yield _paragraph_runs(p)
+                p.clear()
+                while p.getprevious() is not None:
+                    del p.getparent()[0]
+                if progress and n % 200 == 0:
+                    progress(f"Laid out {n} paragraphs", int(f.read_bytes / max(info.file_size, 1) * 95))
+
+
+# ---------- Measuring ----------
+
+class FontMetrics:
+    """
+    Glyph widths per font at 1000 units, looked up from reportlab once per
+    (font, character), plus the widths of words already measured: running
+    text repeats a small vocabulary, so most lookups are a single dict hit.
+    """
+
+    def __init__(self, max_words: int = 100_000):
+        self._chars: Dict[str, Dict[str, float]] = {}
+        self._words: Dict[str, Dict[str, float]] = {}
+        self.max_words = max_words
+
+    def width(self, text: str, font: str, size: float) -> float:
+        words = self._words.get(font)
+        if words is None:
+            words = self._words[font] = {}
+            self._chars[font] = {}
+        w = words.get(text)
+        if w is None:
+            chars = self._chars[font]
+            w = 0.0
+            for ch in text:
+                cw = chars.get(ch)
+                if cw is None:
+                    from reportlab.pdfbase.pdfmetrics import stringWidth
+                    cw = chars[ch] = stringWidth(ch, font, 1000)
+                w += cw
+            if len(words) < self.max_words:
+                words[text] = w
+        return w * size / 1000
+
+
+METRICS = FontMetrics()
+_TOKENS = re.compile(r"\n|\f|[^\S\n\f]+|[^\s]+")
+
+
+# ---------- Layout ----------
+
+class _Page:
+    """Text object for the current page; Tf is only emitted when the font actually changes."""
+
+    def __init__(self, c, top: float):
+        self.c = c
+        self.text = c.beginText()
+        self.font: Optional[tuple[str, float]] = None
+        self.y = top
+
+    def line(self, x: float, segments: List[Run]):
+        self.text.setTextOrigin(x, self.y)
+        for seg in segments:
+            if self.font != (seg.font, seg.size):
+                self.text.setFont(seg.font, seg.size)
+                self.font = (seg.font, seg.size)
+            self.text.textOut(seg.text)
+
+    def finish(self):
+        self.c.drawText(self.text)
+        self.c.showPage()
+
+
+class TextLayout:
+    """Greedy line breaking by measured width, with pagination, onto a reportlab canvas."""
+
+    def __init__(self, c, pagesize, margin: float = MARGIN, metrics: FontMetrics = METRICS):
+        self.c = c
+        self.width, self.height = pagesize
+        self.margin = margin
+        self.max_width = self.width - 2 * margin
+        self.metrics = metrics
+        self.page = _Page(c, self.height - margin)
+        self.pages = 1
+
+    def _new_page(self):
+        if self.page.y >= self.height - self.margin:
+            return  # nothing on this page yet
+        self.page.finish()
+        self.page = _Page(self.c, self.height - self.margin)
+        self.pages += 1
+
+    def _emit(self, segments: List[Run], line_size: float):
+        advance = line_size * LEADING
+        if self.page.y - advance < self.margin and self.page.y < self.height - self.margin:
+            self._new_page()
+        self.page.y -= advance
+        # Trailing spaces are not drawn
+        while segments and not segments[-1].text.strip():
+            segments.pop()
+        if segments:
+            last = segments[-1]
+            segments[-1] = last._replace(text=last.text.rstrip())
+            self.page.line(self.margin, segments)
+
+    @staticmethod
+    def _close(line: List[Run], parts: List[str], run: Run):
+        """Turn the tokens gathered from `run` into a segment; one segment per font change."""
+        if not parts:
+            return
+        text = "".join(parts)
+        parts.clear()
+        if line and line[-1].font == run.font and line[-1].size == run.size:
+            line[-1] = line[-1]._replace(text=line[-1].text + text)
+        else:
+            line.append(Run(text, run.font, run.size))
+
+    def paragraph(self, runs: List[Run]):
+        line: List[Run] = []  # finished segments of the current line
+        parts: List[str] = []  # tokens of the current run on this line
+        line_width = size = 0.0
+        start = self.page.y, self.pages
+        width = self.metrics.width
+        for run in runs:
+            for token in _TOKENS.findall(run.text):
+                if token == PAGE_BREAK or token == "\n":
+                    self._close(line, parts, run)
+                    if token == "\n" or line:
+                        self._emit(line, size or run.size)
+                    line, line_width, size = [], 0.0, 0.0
+                    if token == PAGE_BREAK:
+                        self._new_page()
+                    continue
+                w = width(token, run.font, run.size)
+                if token[0].isspace():
+                    if line or parts:
+                        parts.append(token)
+                        line_width += w
+                    continue
+                if (line or parts) and line_width + w > self.max_width:
+                    self._close(line, parts, run)
+                    self._emit(line, size)
+                    line, line_width, size = [], 0.0, 0.0
+                while w > self.max_width:
+                    # A single word wider than the line: break it by characters
+                    cut = self._fit(token, run)
+                    self._emit([Run(token[:cut], run.font, run.size)], run.size)
+                    token = token[cut:]
+                    w = width(token, run.font, run.size)
+                parts.append(token)
+                line_width += w
+                if run.size > size:
+                    size = run.size
+            self._close(line, parts, run)
+        if line or (self.page.y, self.pages) == start:
+            # An empty paragraph still takes a line
+            self._emit(line, size or max((r.size for r in runs), default=BODY_SIZE))
+        self.page.y -= PARAGRAPH_SPACING
+
+    def _fit(self, token: str, run: Run) -> int:
+        width = 0.0
+        for i, ch in enumerate(token):
+            width += self.metrics.width(ch, run.font, run.size)
+            if width > self.max_width:
+                return max(1, i)
+        return len(token)
+
+    def finish(self):
+        self.page.finish()
+
+
+def docx_to_pdf(src: Path, out_path: Path, progress: Optional[ProgressFn] = None, pagesize=None) -> int:
+    """Stream the paragraphs of `src` onto PDF pages; returns the page count."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    c = canvas.Canvas(str(out_path), pagesize=pagesize or letter, pageCompression=1)
+    layout = TextLayout(c, pagesize or letter)
+    for runs in iter_paragraphs(src, progress):
+        layout.paragraph(runs)
+    layout.finish()
+    c.save()
+    return layout.pages
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from utils.job_store import TERMINAL_STATUSES
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, state: dict):
+        self.loop = loop
+        self.state = dict(state)
+        self.changed = asyncio.Event()
+        self._lock = threading.Lock()
+
+    def offer(self, fields: dict):
+        # Called from any thread; merging into one state dict is the coalescing step
+        with self._lock:
+            self.state.update(fields)
+        try:
+            self.loop.call_soon_threadsafe(self.changed.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.state)
+
+
+class JobEvents:
+    """
+    In-process fan-out of job status changes to push subscribers (SSE/WebSocket).
+
+    Register `publish` as a job store listener; every `_update` a task makes
+    lands here. Each subscriber keeps only the latest merged state and gets at
+    most one message per `min_interval`, however fast a task reports progress.
+    Jobs running in another server process are not published here, so an idle
+    stream re-reads the store every `poll_interval` seconds as a fallback.
+    """
+
+    def __init__(self, min_interval: float = 0.25, poll_interval: float = 2.0):
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self._subs: dict[str, set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, job_id: str, fields: dict):
+        with self._lock:
+            subs = list(self._subs.get(job_id, ()))
+        for sub in subs:
+            sub.offer(fields)
+
+    async def stream(self, job_id: str, initial: dict,
+                     poll: Callable[[], Optional[dict]]) -> AsyncIterator[Optional[dict]]:
+        """
+        Yield the job state now and after each change until it is terminal.
+        Yields None when nothing changed for `poll_interval` (use it as a heartbeat).
+        """
+        sub = _Subscriber(asyncio.get_running_loop(), initial)
+        with self._lock:
+            self._subs.setdefault(job_id, set()).add(sub)
+        try:
+            sent = sub.snapshot()
+            yield sent
+            last_sent = time.monotonic()
+            while sent.get("status") not in TERMINAL_STATUSES:
+                try:
+                    await asyncio.wait_for(sub.changed.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    fresh = await asyncio.to_thread(poll)
+                    if fresh:
+                        sub.offer(fresh)
+                sub.changed.clear()
+                state = sub.snapshot()
+                if state == sent:
+                    yield None
+                    continue
+                # Coalesce bursts: wait out the rest of the interval, then send the latest state
+                delay = self.min_interval - (time.monotonic() - last_sent)
+                if delay > 0 and state.get("status") not in TERMINAL_STATUSES:
+                    await asyncio.sleep(delay)
+                    sub.changed.clear()
+                    state = sub.snapshot()
+                sent = state
+                last_sent = time.monotonic()
+                yield sent
+        finally:
+            with self._lock:
+                subs = self._subs.get(job_id)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subs[job_id]
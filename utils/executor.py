@@ -0,0 +1,539 @@
+from __future__ import annotations
+import math
+import multiprocessing as mp
+import os
+import shutil
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+from utils.job_store import JobStore, TERMINAL_STATUSES
+from utils.scheduler import FairQueue, INTERACTIVE, PRIORITY_CLASSES, priority_class
+
+
+# ---------- Child side ----------
+
+# Tag for timing samples sent over the status pipe: (_METRIC, name, seconds)
+_METRIC = "__metric__"
+
+# Processes a task may run for its own pools; set by the executor in each worker (None outside one)
+_INNER_WORKERS: Optional[int] = None
+
+
+def inner_workers(configured: int) -> int:
+    """
+    Size for a task's own process pool (split, image recompression, text
+    extraction): `configured`, capped inside an executor worker by its share of
+    the executor's CPU budget, so JOB_WORKERS bounds the whole host.
+    """
+    if _INNER_WORKERS is None:
+        return configured
+    return max(1, min(configured, _INNER_WORKERS))
+
+
+def limit_inner_workers(n: int):
+    global _INNER_WORKERS
+    _INNER_WORKERS = n if _INNER_WORKERS is None else min(n, _INNER_WORKERS)
+
+
+@contextmanager
+def serial_inner_pools():
+    """
+    Run task-internal pools serially for the duration. For tasks that call
+    other tasks from several threads: those pools fork, and a child forked
+    while another thread holds a lock (qpdf, pdfplumber, logging) can deadlock.
+    """
+    global _INNER_WORKERS
+    saved = _INNER_WORKERS
+    _INNER_WORKERS = 1
+    try:
+        yield
+    finally:
+        _INNER_WORKERS = saved
+
+
+class _PipeStatus:
+    """`job_status` stand-in inside a worker process; forwards `_update` calls to the parent."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.status = "processing"
+        self.message = ""
+        self.progress = 0
+
+    def set(self, status: str, message: str = "", progress: Optional[int] = None):
+        self.status = status
+        self.message = message
+        if progress is not None:
+            self.progress = progress
+        self._send((status, message, progress))
+
+    def metric(self, name: str, seconds: float):
+        self._send((_METRIC, name, seconds))
+
+    def _send(self, msg: tuple):
+        try:
+            self._conn.send(msg)
+        except (BrokenPipeError, OSError):
+            pass
+
+
+def _run_in_child(conn, fn, args, cpu_limit, inner):
+    # Own process group, so killing the job also kills subprocesses (e.g. Ghostscript)
+    os.setsid()
+    limit_inner_workers(inner)
+    if cpu_limit:
+        import resource
+        # Inherited by subprocesses; SIGXCPU terminates whichever exceeds it
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_limit), int(cpu_limit) + 5))
+    status = _PipeStatus(conn)
+    try:
+        fn(*args, status)
+    except BaseException as e:
+        status.set("error", str(e) or e.__class__.__name__)
+    finally:
+        conn.close()
+
+
+# ---------- Parent side ----------
+
+def _kill(proc):
+    """Kill a worker and its process group (subprocesses included)."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, TypeError):
+        pass
+    try:
+        proc.kill()
+    except Exception:
+        pass
+
+
+DEFAULT_QUEUE_LIMIT = 100
+
+# Wall-clock limits in seconds; CPU-time limits default to the same values
+DEFAULT_TIMEOUTS = {
+    "reorder": 120,
+    "rotate": 120,
+    "edit_docx": 60,
+    "edit_pdf": 60,
+    "merge": 300,
+    "split": 300,
+    "convert": 300,
+    "compress": 600,
+    "pipeline": 1200,
+}
+
+
+class QueueFull(RuntimeError):
+    """Raised by `submit` when an operation's queue is at its depth limit."""
+
+    def __init__(self, operation: str, limit: int, retry_after: int):
+        super().__init__(f"Too many queued {operation} jobs ({limit}); retry in {retry_after}s")
+        self.operation = operation
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class _OpStats:
+    __slots__ = ("queued", "running", "submitted", "rejected", "completed", "failed",
+                 "wait_total", "wait_max", "run_total")
+
+    def __init__(self):
+        self.queued = self.running = 0
+        self.submitted = self.rejected = self.completed = self.failed = 0
+        self.wait_total = self.wait_max = self.run_total = 0.0
+
+    def as_dict(self, limit: int) -> dict:
+        started = self.completed + self.failed + self.running
+        finished = self.completed + self.failed
+        return {
+            "queue_limit": limit,
+            "queued": self.queued,
+            "running": self.running,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_avg_s": round(self.wait_total / started, 3) if started else 0.0,
+            "wait_max_s": round(self.wait_max, 3),
+            "run_avg_s": round(self.run_total / finished, 3) if finished else 0.0,
+        }
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "avg_s": round(self.total / self.count, 3), "max_s": round(self.max, 3)}
+
+
+class _Task:
+    __slots__ = ("job_id", "operation", "fn", "args", "timeout", "cpu_limit", "tenant", "cost",
+                 "outputs", "enqueued_at")
+
+    def __init__(self, job_id, operation, fn, args, timeout, cpu_limit, tenant, cost, outputs):
+        self.job_id = job_id
+        self.operation = operation
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.tenant = tenant
+        self.cost = cost
+        self.outputs = outputs
+        self.enqueued_at = time.monotonic()
+
+
+class JobExecutor:
+    """
+    Bounded process pool for CPU-heavy PDF tasks, kept out of the web process.
+
+    Up to `workers` tasks run at once, each in its own worker process forked
+    from a preloaded fork server, so a crash, leak or runaway task only takes
+    down that task. Endpoints call `submit`, which just enqueues and returns;
+    dispatcher threads start the processes and relay their `_update` calls into
+    the job store.
+
+    Limits and cancellation: every operation has a wall-clock limit
+    (JOB_TIMEOUT_<OPERATION>, JOB_TIMEOUT or `DEFAULT_TIMEOUTS`) and a CPU-time
+    rlimit (JOB_CPU_LIMIT_<OPERATION>, JOB_CPU_LIMIT, else the wall-clock
+    value). Workers run in their own process group, so a timeout or `cancel`
+    kills the task together with any subprocess it started; the job ends as
+    `timeout` or `cancelled` and its declared `outputs` are removed. With a
+    `cancel_dir` shared by all server processes, a cancel issued to one uvicorn
+    worker reaches jobs queued or running in another.
+
+    Admission control: each operation has a queue depth limit (`queue_limits`,
+    or JOB_QUEUE_LIMIT_<OPERATION> / JOB_QUEUE_LIMIT from the environment);
+    `submit` raises `QueueFull` with a Retry-After estimate instead of letting
+    work pile up. Depth, wait time and rejections are reported by `metrics`.
+
+    Scheduling: pending tasks go through a `FairQueue` (priority classes with
+    aging, per-tenant fair share weighted by estimated cost). Heavy classes may
+    occupy at most `workers` processes; `interactive_slots` extra processes
+    (JOB_INTERACTIVE_SLOTS, default 1) only ever run interactive tasks, so
+    rotate/reorder stay fast while every worker is busy compressing.
+
+    Tasks may report durations with `job_status.metric(name, seconds)`; they
+    are aggregated per name under `timings` in `metrics`.
+
+    Pools a task starts itself are sized with `inner_workers`: each worker may
+    use `inner` processes (JOB_INNER_WORKERS, default CPUs / `workers`, at
+    least 1), so with one worker per CPU those pools run serially.
+    """
+
+    def __init__(self, store: JobStore, workers: Optional[int] = None, timeout: Optional[float] = None,
+                 start_method: Optional[str] = None, queue_limits: Optional[dict[str, int]] = None,
+                 interactive_slots: Optional[int] = None, cancel_dir: Optional[Path] = None):
+        self.store = store
+        self.workers = workers or int(os.getenv("JOB_WORKERS", 0)) or os.cpu_count() or 1
+        self.inner = int(os.getenv("JOB_INNER_WORKERS", 0)) or max(1, (os.cpu_count() or 1) // self.workers)
+        self.timeout = timeout
+        self._start_method = start_method or os.getenv("JOB_START_METHOD", "forkserver")
+        self._ctx = None
+        self.interactive_slots = (
+            interactive_slots if interactive_slots is not None else int(os.getenv("JOB_INTERACTIVE_SLOTS", 1))
+        )
+        self._pending = FairQueue()
+        self._heavy_running = 0
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._running: dict[str, mp.Process] = {}
+        self._closed = False
+        self.queue_limits = dict(queue_limits or {})
+        self._stats: dict[str, _OpStats] = {}
+        self._timings: dict[str, _Timing] = {}
+        self.cancel_dir = cancel_dir
+        if cancel_dir:
+            cancel_dir.mkdir(parents=True, exist_ok=True)
+        self._cancelled: set[str] = set()
+
+    # ----- public API -----
+
+    def submit(self, job_id: str, operation: str, fn, *args, timeout: Optional[float] = None,
+               tenant: str = "anonymous", cost: float = 1.0, outputs: Iterable[Path] = ()):
+        """Queue `fn(*args, job_status)` for `job_id`; returns immediately or raises `QueueFull`."""
+        self.submit_many([(job_id, operation, fn, args,
+                           {"timeout": timeout, "tenant": tenant, "cost": cost, "outputs": outputs})])
+
+    def submit_many(self, entries: Iterable[tuple]):
+        """
+        Queue several `(job_id, operation, fn, args, options)` entries as one unit,
+        `options` being `submit`'s keyword arguments. Queue limits are checked for
+        the whole set first, so either every entry is queued or `QueueFull` is raised
+        and none is.
+        """
+        tasks = []
+        for job_id, operation, fn, args, options in entries:
+            wall = options.get("timeout") or self.timeout_for(operation)
+            tasks.append(_Task(job_id, operation, fn, tuple(args), wall, self.cpu_limit_for(operation, wall),
+                               options.get("tenant", "anonymous"), options.get("cost", 1.0),
+                               list(options.get("outputs", ()))))
+        wanted: dict[str, int] = {}
+        for task in tasks:
+            wanted[task.operation] = wanted.get(task.operation, 0) + 1
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Executor is shut down")
+            for operation, count in wanted.items():
+                stats = self._op_stats(operation)
+                limit = self.queue_limit(operation)
+                if stats.queued + count > limit:
+                    stats.rejected += count
+                    raise QueueFull(operation, limit, self._retry_after(operation))
+            self._ensure_started()
+            for task in tasks:
+                # A cancel left over from an earlier task of this job must not hit the new one
+                self._cancelled.discard(task.job_id)
+                if self.cancel_dir:
+                    (self.cancel_dir / task.job_id).unlink(missing_ok=True)
+                stats = self._op_stats(task.operation)
+                stats.queued += 1
+                stats.submitted += 1
+                self._pending.push(task)
+                self.store.update(task.job_id, status="queued", message=f"Queued {task.operation}", progress=0)
+            self._cond.notify_all()
+
+    def queue_limit(self, operation: str) -> int:
+        if operation not in self.queue_limits:
+            env = os.getenv(f"JOB_QUEUE_LIMIT_{operation.upper()}") or os.getenv("JOB_QUEUE_LIMIT")
+            self.queue_limits[operation] = int(env) if env else DEFAULT_QUEUE_LIMIT
+        return self.queue_limits[operation]
+
+    def timeout_for(self, operation: str) -> float:
+        env = os.getenv(f"JOB_TIMEOUT_{operation.upper()}") or os.getenv("JOB_TIMEOUT")
+        if env:
+            return float(env)
+        return self.timeout or DEFAULT_TIMEOUTS.get(operation, 300)
+
+    def cpu_limit_for(self, operation: str, wall: float) -> Optional[float]:
+        env = os.getenv(f"JOB_CPU_LIMIT_{operation.upper()}") or os.getenv("JOB_CPU_LIMIT")
+        return float(env) if env else wall
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job. Returns True if this process owned it;
+        otherwise, if the store shows the job queued or processing, the request
+        is left in `cancel_dir` for the owning process.
+        """
+        with self._cond:
+            task = self._pending.remove(job_id)
+            if task is not None:
+                self._op_stats(task.operation).queued -= 1
+            proc = self._running.get(job_id)
+            if proc is not None:
+                self._cancelled.add(job_id)
+        if task is not None:
+            self._cleanup(task)
+            self.store.update(job_id, status="cancelled", message="Cancelled before start")
+            return True
+        if proc is not None:
+            _kill(proc)
+            return True
+        job = self.store.get(job_id)
+        if self.cancel_dir and job and job["status"] in ("queued", "processing"):
+            (self.cancel_dir / job_id).touch()
+        return False
+
+    def metrics(self) -> dict:
+        with self._cond:
+            ops = {op: st.as_dict(self.queue_limit(op)) for op, st in self._stats.items()}
+            return {
+                "workers": self.workers,
+                "interactive_slots": self.interactive_slots,
+                "running": len(self._running),
+                "queued": len(self._pending),
+                "operations": ops,
+                "timings": {name: t.as_dict() for name, t in sorted(self._timings.items())},
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            pending = self._pending.drain()
+            for task in pending:
+                self._op_stats(task.operation).queued -= 1
+            running = list(self._running.values())
+            self._cond.notify_all()
+        for task in pending:
+            self.store.update(task.job_id, status="error", message="Server shutting down")
+        for proc in running:
+            _kill(proc)
+        for t in self._threads:
+            t.join(timeout=5)
+
+    # ----- internals -----
+
+    def _op_stats(self, operation: str) -> _OpStats:
+        # caller holds self._cond
+        stats = self._stats.get(operation)
+        if stats is None:
+            stats = self._stats[operation] = _OpStats()
+        return stats
+
+    def _retry_after(self, operation: str) -> int:
+        # caller holds self._cond; time for the workers to drain what is ahead
+        stats = self._stats[operation]
+        finished = stats.completed + stats.failed
+        per_task = stats.run_total / finished if finished else 5.0
+        return max(1, math.ceil(per_task * (stats.queued + 1) / self.workers))
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        if self._start_method == "forkserver":
+            ctx = mp.get_context("forkserver")
+            ctx.set_forkserver_preload(["utils.pdf_tools", "utils.blob_store", "utils.pipeline", "utils.ghostscript"])
+        else:
+            ctx = mp.get_context(self._start_method)
+        self._ctx = ctx
+        for i in range(self.workers + self.interactive_slots):
+            t = threading.Thread(target=self._dispatch_loop, name=f"job-dispatch-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        if job_id in self._cancelled:
+            return True
+        if self.cancel_dir and (self.cancel_dir / job_id).exists():
+            self._cancelled.add(job_id)
+            return True
+        return False
+
+    def _cleanup(self, task: _Task):
+        self._cancelled.discard(task.job_id)
+        if self.cancel_dir:
+            (self.cancel_dir / task.job_id).unlink(missing_ok=True)
+        for p in map(Path, task.outputs):
+            if p.is_dir():
+                shutil.rmtree(p, ignore_errors=True)
+            else:
+                p.unlink(missing_ok=True)
+
+    def _next_task(self) -> Optional[_Task]:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return None
+                    allowed = PRIORITY_CLASSES if self._heavy_running < self.workers else (INTERACTIVE,)
+                    task = self._pending.pop(allowed)
+                    if task is not None:
+                        break
+                    self._cond.wait()
+                stats = self._op_stats(task.operation)
+                stats.queued -= 1
+                if self._cancel_requested(task.job_id):
+                    cancelled = True
+                else:
+                    cancelled = False
+                    if priority_class(task.operation) != INTERACTIVE:
+                        self._heavy_running += 1
+                    wait = time.monotonic() - task.enqueued_at
+                    stats.running += 1
+                    stats.wait_total += wait
+                    stats.wait_max = max(stats.wait_max, wait)
+            if not cancelled:
+                return task
+            self._cleanup(task)
+            self.store.update(task.job_id, status="cancelled", message="Cancelled before start")
+
+    def _dispatch_loop(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            started = time.monotonic()
+            ok = False
+            try:
+                ok = self._run(task)
+            except Exception as e:
+                self.store.update(task.job_id, status="error", message=f"Executor failure: {e}")
+            finally:
+                with self._cond:
+                    if priority_class(task.operation) != INTERACTIVE:
+                        self._heavy_running -= 1
+                    self._cond.notify_all()
+                    stats = self._op_stats(task.operation)
+                    stats.running -= 1
+                    stats.run_total += time.monotonic() - started
+                    if ok:
+                        stats.completed += 1
+                    else:
+                        stats.failed += 1
+
+    def _run(self, task: _Task) -> bool:
+        handle = self.store.handle(task.job_id)
+        recv, send = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(
+            target=_run_in_child, args=(send, task.fn, task.args, task.cpu_limit, self.inner),
+            name=f"job-{task.job_id}",
+        )
+        handle.set("processing", f"Started {task.operation}")
+        proc.start()
+        send.close()
+        with self._cond:
+            self._running[task.job_id] = proc
+        deadline = time.monotonic() + task.timeout
+        timed_out = cancelled = False
+        try:
+            while True:
+                if self._cancel_requested(task.job_id):
+                    cancelled = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                if not recv.poll(min(remaining, 1.0)):
+                    continue
+                try:
+                    status, message, progress = recv.recv()
+                except EOFError:
+                    break  # child finished (or died) and closed its end
+                if status == _METRIC:
+                    with self._cond:
+                        self._timings.setdefault(message, _Timing()).add(progress)
+                    continue
+                handle.set(status, message, progress)
+        finally:
+            recv.close()
+            if proc.is_alive() and (timed_out or cancelled):
+                _kill(proc)
+            proc.join()
+            with self._cond:
+                self._running.pop(task.job_id, None)
+            cancelled = cancelled or self._cancel_requested(task.job_id)
+
+        if handle.status not in TERMINAL_STATUSES:
+            if cancelled:
+                handle.set("cancelled", f"{task.operation} cancelled")
+            elif timed_out:
+                handle.set("timeout", f"{task.operation} exceeded {task.timeout:.0f}s wall-clock limit")
+            elif proc.exitcode == -signal.SIGXCPU:
+                handle.set("timeout", f"{task.operation} exceeded {task.cpu_limit:.0f}s CPU limit")
+            elif proc.exitcode:
+                handle.set("error", f"Worker crashed (exit code {proc.exitcode})")
+            else:
+                handle.set("error", "Worker exited without reporting a result")
+        handle.flush()
+        if handle.status == "done":
+            self._cancelled.discard(task.job_id)
+            if self.cancel_dir:
+                (self.cancel_dir / task.job_id).unlink(missing_ok=True)
+            return True
+        self._cleanup(task)
+        return False
@@ -0,0 +1,135 @@
+from __future__ import annotations
+import fcntl
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+# Host-wide number of concurrent Ghostscript processes, shared by every worker
+GS_SLOTS = int(os.getenv("GS_SLOTS", 0)) or os.cpu_count() or 1
+# Rendering threads per Ghostscript process
+GS_THREADS = int(os.getenv("GS_THREADS", 0)) or max(1, (os.cpu_count() or 1) // GS_SLOTS)
+GS_SLOT_DIR = Path(os.getenv("GS_SLOT_DIR") or Path(tempfile.gettempdir()) / "pdf-gs-slots")
+# Documents with at least this many pages are compressed in parallel page ranges. Opt-in (0 disables):
+# the re-merged output keeps pages only, not outlines, forms, named destinations, page labels or metadata
+GS_SPLIT_MIN_PAGES = int(os.getenv("GS_SPLIT_MIN_PAGES", 0))
+GS_MIN_PART_PAGES = 50
+
+PDFSETTINGS = {
+    'low': '/screen',
+    'medium': '/ebook',
+    'high': '/printer',
+    'max': '/prepress',
+}
+
+
+def find_gs() -> Optional[str]:
+    return shutil.which('gs') or shutil.which('ghostscript')
+
+
+def _try_slot(i: int):
+    f = open(GS_SLOT_DIR / f"slot{i}", "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+    except OSError:
+        f.close()
+        return None
+
+
+@contextmanager
+def gs_slots(wanted: int = 1, poll_interval: float = 0.1) -> Iterator[int]:
+    """
+    Hold between 1 and `wanted` of the GS_SLOTS slots; yields how many were
+    granted. Slots are flock()ed files, so the limit holds across worker
+    processes and is released automatically if a worker is killed. Waits only
+    for the first slot; extra ones are taken if free right now.
+    """
+    GS_SLOT_DIR.mkdir(parents=True, exist_ok=True)
+    held = []
+    try:
+        while not held:
+            for i in range(GS_SLOTS):
+                f = _try_slot(i)
+                if f:
+                    held.append(f)
+                    break
+            else:
+                time.sleep(poll_interval)
+        for i in range(GS_SLOTS):
+            if len(held) >= wanted:
+                break
+            f = _try_slot(i)
+            if f:
+                held.append(f)
+        yield len(held)
+    finally:
+        for f in held:
+            f.close()
+
+
+def gs_command(gs: str, src: str, out: Path, pdfsettings: str,
+               first: Optional[int] = None, last: Optional[int] = None) -> List[str]:
+    cmd = [
+        gs, '-sDEVICE=pdfwrite', '-dCompatibilityLevel=1.4',
+        f'-dPDFSETTINGS={pdfsettings}', '-dNOPAUSE', '-dQUIET', '-dBATCH',
+        f'-dNumRenderingThreads={GS_THREADS}',
+    ]
+    if first is not None:
+        cmd += [f'-dFirstPage={first}', f'-dLastPage={last}']
+    return cmd + [f'-sOutputFile={out}', str(src)]
+
+
+def page_ranges(pages: int, parts: int) -> List[tuple[int, int]]:
+    size = math.ceil(pages / parts)
+    return [(a, min(pages, a + size - 1)) for a in range(1, pages + 1, size)]
+
+
+def compress_with_gs(gs: str, src: str, out_path: Path, pdfsettings: str, pages: int,
+                     timeout: float, progress: Callable[[str, int], None]):
+    """
+    Compress `src` with Ghostscript under the host-wide slot limit. Large
+    documents are cut into page ranges that run as parallel gs processes (one
+    per slot granted) and are merged back with the deduplicating merge engine,
+    so fonts repeated across the parts are stored once. That merge keeps only
+    the pages, which is why splitting is off unless GS_SPLIT_MIN_PAGES is set.
+    Raises subprocess.TimeoutExpired / CalledProcessError like subprocess.run.
+    """
+    from utils.pdf_tools import merge_engine
+
+    wanted = 1
+    if GS_SPLIT_MIN_PAGES and pages >= GS_SPLIT_MIN_PAGES:
+        wanted = min(GS_SLOTS, pages // GS_MIN_PART_PAGES)
+    with gs_slots(wanted) as granted:
+        if granted < 2:
+            progress("Compressing with Ghostscript", 10)
+            subprocess.run(gs_command(gs, src, out_path, pdfsettings), check=True, timeout=timeout)
+            return
+        ranges = page_ranges(pages, granted)
+        part_dir = Path(tempfile.mkdtemp(prefix=".gs-", dir=out_path.parent))
+        try:
+            parts = [part_dir / f"part{i}.pdf" for i in range(len(ranges))]
+            procs = [subprocess.Popen(gs_command(gs, src, part, pdfsettings, a, b))
+                     for part, (a, b) in zip(parts, ranges)]
+            progress(f"Compressing {pages} pages in {len(procs)} parallel parts", 10)
+            deadline = time.monotonic() + timeout
+            try:
+                for n, proc in enumerate(procs, start=1):
+                    code = proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+                    if code:
+                        raise subprocess.CalledProcessError(code, proc.args)
+                    progress(f"Compressed part {n}/{len(procs)}", int(10 + n / len(procs) * 75))
+            finally:
+                for proc in procs:
+                    if proc.poll() is None:
+                        proc.kill()
+                        proc.wait()
+            progress("Merging compressed parts", 90)
+            merge_engine()([str(p) for p in parts], out_path, None)
+        finally:
+            shutil.rmtree(part_dir, ignore_errors=True)
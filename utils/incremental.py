@@ -0,0 +1,175 @@
+from __future__ import annotations
+import io
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject, NumberObject
+
+# Set PDF_INCREMENTAL_SAVE=0 to always rewrite the whole document
+INCREMENTAL_SAVE = os.getenv("PDF_INCREMENTAL_SAVE", "1") != "0"
+_TAIL = 2048
+
+Ref = Tuple[int, int]
+
+
+def _startxref(path: Path) -> Optional[int]:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - _TAIL))
+        tail = f.read()
+    pos = tail.rfind(b"startxref")
+    if pos < 0:
+        return None
+    try:
+        return int(tail[pos + 9:].split()[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _uses_xref_stream(path: Path, offset: int) -> bool:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return not f.read(4).startswith(b"xref")
+
+
+def _open(src: str) -> Optional[PdfReader]:
+    """Reader for `src` if an update section can be appended to it, else None."""
+    reader = PdfReader(src)
+    if reader.is_encrypted:
+        return None
+    return reader
+
+
+def _serialize(obj) -> bytes:
+    buf = io.BytesIO()
+    obj.write_to_stream(buf, None)
+    return buf.getvalue()
+
+
+def _subsections(ids: List[int]) -> List[List[int]]:
+    runs: List[List[int]] = []
+    for i in sorted(ids):
+        if runs and i == runs[-1][-1] + 1:
+            runs[-1].append(i)
+        else:
+            runs.append([i])
+    return runs
+
+
+def append_update(src: str, out_path: Path, reader: PdfReader, changed: Dict[Ref, DictionaryObject]) -> bool:
+    """
+    Write `src` plus one incremental update section (PDF 32000 7.5.6) that
+    replaces the `changed` objects. The original bytes are copied by the kernel
+    (copy_file_range/reflink where available); only the changed objects, a
+    small xref section and the trailer are serialized. The section uses the
+    same xref form as the file it extends (table or stream).
+    """
+    prev = _startxref(Path(src))
+    if prev is None:
+        return False
+    xref_stream = _uses_xref_stream(Path(src), prev)
+    # PyPDF2 drops /Size from xref-stream trailers, so also derive it from the object numbers seen
+    known = [idnum for table in reader.xref.values() for idnum in table] + list(reader.xref_objStm)
+    size = max(int(reader.trailer.get("/Size", 0)), max(known, default=0) + 1,
+               max(idnum for idnum, _ in changed) + 1)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(src, out_path)
+    offsets: Dict[int, Tuple[int, int]] = {}
+    with open(out_path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) not in (b"\n", b"\r"):
+            f.write(b"\n")
+        for (idnum, gen), obj in sorted(changed.items()):
+            offsets[idnum] = (f.tell(), gen)
+            f.write(b"%d %d obj\n" % (idnum, gen) + _serialize(obj) + b"\nendobj\n")
+
+        trailer = DictionaryObject()
+        for key in ("/Root", "/Info", "/ID"):
+            if key in reader.trailer:
+                trailer[NameObject(key)] = reader.trailer.raw_get(key)
+        trailer[NameObject("/Prev")] = NumberObject(prev)
+
+        xref_at = f.tell()
+        if xref_stream:
+            # The xref stream is itself a new object and lists its own offset
+            offsets[size] = (xref_at, 0)
+            size += 1
+            rows, index = [], []
+            for run in _subsections(list(offsets)):
+                index += [NumberObject(run[0]), NumberObject(len(run))]
+                rows += [b"\x01" + offsets[i][0].to_bytes(8, "big") + offsets[i][1].to_bytes(2, "big") for i in run]
+            data = b"".join(rows)
+            trailer[NameObject("/Type")] = NameObject("/XRef")
+            trailer[NameObject("/Size")] = NumberObject(size)
+            trailer[NameObject("/W")] = ArrayObject([NumberObject(1), NumberObject(8), NumberObject(2)])
+            trailer[NameObject("/Index")] = ArrayObject(index)
+            trailer[NameObject("/Length")] = NumberObject(len(data))
+            f.write(b"%d 0 obj\n" % (size - 1) + _serialize(trailer) + b"\nstream\n" + data + b"\nendstream\nendobj\n")
+        else:
+            trailer[NameObject("/Size")] = NumberObject(size)
+            f.write(b"xref\n")
+            for run in _subsections(list(offsets)):
+                f.write(b"%d %d\n" % (run[0], len(run)))
+                for i in run:
+                    f.write(b"%010d %05d n\r\n" % offsets[i])
+            f.write(b"trailer\n" + _serialize(trailer) + b"\n")
+        f.write(b"startxref\n%d\n%%%%EOF\n" % xref_at)
+    return True
+
+
+def _ref(obj) -> Ref:
+    ref = obj.indirect_reference
+    return ref.idnum, ref.generation
+
+
+def incremental_rotate(src: str, degrees: int, pages: set[int], out_path: Path) -> bool:
+    """Rotate `pages` (1-based; empty means all) by appending new page dictionaries only."""
+    if degrees % 90:
+        return False
+    reader = _open(src)
+    if reader is None:
+        return False
+    changed: Dict[Ref, DictionaryObject] = {}
+    for idx, page in enumerate(reader.pages, start=1):
+        if pages and idx not in pages:
+            continue
+        if page.indirect_reference is None:
+            return False
+        # reader.pages carries inherited attributes, so /Rotate is the effective value
+        updated = DictionaryObject(page.items())
+        updated[NameObject("/Rotate")] = NumberObject((int(page.get("/Rotate", 0)) + degrees) % 360)
+        changed[_ref(page)] = updated
+    if not changed:
+        return False
+    return append_update(src, out_path, reader, changed)
+
+
+def incremental_reorder(src: str, order: List[int], out_path: Path) -> bool:
+    """
+    Reorder (or drop) pages by appending a new root /Pages dictionary. Only
+    flat page trees are handled: a nested tree would need new /Parent links
+    for every page. Repeated pages need copies, so they are left to a full
+    rewrite as well.
+    """
+    if not order or len(set(order)) != len(order):
+        return False
+    reader = _open(src)
+    if reader is None:
+        return False
+    root = reader.trailer["/Root"]
+    pages_ref = root.raw_get("/Pages")
+    tree = root["/Pages"]
+    kids = tree["/Kids"] if "/Kids" in tree else []
+    if getattr(pages_ref, "idnum", None) is None or len(kids) != len(reader.pages):
+        return False
+    if any(kid.get_object().get("/Type") != "/Page" for kid in kids):
+        return False
+    new_tree = DictionaryObject(tree.items())
+    new_tree[NameObject("/Kids")] = ArrayObject([kids[i - 1] for i in order])
+    new_tree[NameObject("/Count")] = NumberObject(len(order))
+    return append_update(src, out_path, reader, {(pages_ref.idnum, pages_ref.generation): new_tree})
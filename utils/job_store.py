@@ -0,0 +1,213 @@
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Optional
+
+TERMINAL_STATUSES = {"done", "error", "cancelled", "timeout"}
+JOB_FIELDS = ("job_id", "status", "message", "output_path", "progress")
+
+
+class JobStore(ABC):
+    """
+    Job metadata backend. Jobs are plain dicts with the `JobStatus` fields;
+    files stay on disk. Backends must be safe to share across threads and,
+    except for the in-memory one, across worker processes.
+    """
+
+    def __init__(self):
+        self._listeners: list[Callable[[str, dict], None]] = []
+
+    @abstractmethod
+    def create(self, job: dict):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def _save(self, job_id: str, fields: dict):
+        """Apply `fields` to a stored job; `update` then notifies listeners."""
+
+    def update(self, job_id: str, **fields):
+        self._save(job_id, fields)
+        self.publish(job_id, fields)
+
+    def add_listener(self, listener: Callable[[str, dict], None]):
+        """Register `listener(job_id, changed_fields)`, called for every status change in this process."""
+        self._listeners.append(listener)
+
+    def publish(self, job_id: str, fields: dict):
+        for listener in self._listeners:
+            try:
+                listener(job_id, fields)
+            except Exception:
+                pass
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def handle(self, job_id: str, min_interval: float = 0.5) -> "JobHandle":
+        return JobHandle(self, job_id, min_interval)
+
+
+class MemoryJobStore(JobStore):
+    """Single-process store; status is lost on restart."""
+
+    def __init__(self):
+        super().__init__()
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _save(self, job_id: str, fields: dict):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+
+class SQLiteJobStore(JobStore):
+    """Local persistent store shared by every uvicorn worker on the host (WAL mode)."""
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, status TEXT NOT NULL, message TEXT,"
+            " output_path TEXT, progress INTEGER NOT NULL DEFAULT 0, updated_at REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Connections must not cross a fork; reopen in child processes
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job: dict):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, message, output_path, progress, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (job["job_id"], job["status"], job.get("message"), job.get("output_path"),
+             job.get("progress") or 0, time.time()),
+        )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT job_id, status, message, output_path, progress FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _save(self, job_id: str, fields: dict):
+        fields = {k: v for k, v in fields.items() if k in JOB_FIELDS and k != "job_id"}
+        if not fields:
+            return
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._conn().execute(
+            f"UPDATE jobs SET {cols}, updated_at = ? WHERE job_id = ?",
+            (*fields.values(), time.time(), job_id),
+        )
+
+
+class MongoJobStore(JobStore):
+    """Cluster-wide store on the MongoDB configured in database.py (`jobs` collection)."""
+
+    collection = "jobs"
+
+    def __init__(self):
+        super().__init__()
+        import database
+        if database.db is None:
+            raise RuntimeError("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+        self._db = database
+        database.db[self.collection].create_index("job_id", unique=True)
+
+    def create(self, job: dict):
+        self._db.create_document(self.collection, dict(job))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        docs = self._db.get_documents(self.collection, {"job_id": job_id}, limit=1)
+        if not docs:
+            return None
+        return {k: docs[0].get(k) for k in JOB_FIELDS}
+
+    def _save(self, job_id: str, fields: dict):
+        self._db.update_document(self.collection, {"job_id": job_id}, fields)
+
+
+class JobHandle:
+    """
+    Write-coalescing view of one job, handed to tasks as `job_status`.
+
+    Tasks call `_update` from hot loops; only status changes, terminal states
+    and at most one progress write per `min_interval` seconds reach the
+    backend. Anything still pending is written by `flush()`. Every change is
+    still published to the store's in-process listeners (see utils/events.py).
+    """
+
+    def __init__(self, store: JobStore, job_id: str, min_interval: float = 0.5):
+        self.store = store
+        self.job_id = job_id
+        self.min_interval = min_interval
+        current = store.get(job_id) or {}
+        self.status = current.get("status", "queued")
+        self.message = current.get("message")
+        self.progress = current.get("progress", 0)
+        self._dirty = False
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, status: str, message: str = "", progress: Optional[int] = None):
+        with self._lock:
+            changed = status != self.status
+            self.status = status
+            self.message = message
+            if progress is not None:
+                self.progress = progress
+            self._dirty = True
+            now = time.monotonic()
+            if changed or status in TERMINAL_STATUSES or now - self._last_write >= self.min_interval:
+                self._write(now)
+            self.store.publish(self.job_id, {"status": status, "message": message, "progress": self.progress})
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._write(time.monotonic())
+
+    def _write(self, now: float):
+        self.store._save(self.job_id, {"status": self.status, "message": self.message, "progress": self.progress})
+        self._dirty = False
+        self._last_write = now
+
+
+def get_job_store(backend: Optional[str] = None, path: Optional[Path] = None) -> JobStore:
+    """Build the backend named by `backend` or JOB_STORE_BACKEND (sqlite|mongo|memory)."""
+    backend = (backend or os.getenv("JOB_STORE_BACKEND", "sqlite")).lower()
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "mongo":
+        return MongoJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore(Path(os.getenv("JOB_DB_PATH", path or "jobs.sqlite3")))
+    raise ValueError(f"Unknown job store backend: {backend}")
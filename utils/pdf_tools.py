@@ -1,17 +1,25 @@
 from __future__ import annotations
+import hashlib
+import os
+import shutil
 from pathlib import Path
 from typing import List
 
 from PyPDF2 import PdfReader, PdfWriter
-from PIL import Image
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.pagesizes import letter
+
+from utils.executor import inner_workers
 
 
 def _update(job, status: str, message: str = "", progress: int | None = None):
     try:
         if job is None:
             return
+        if hasattr(job, "set"):
+            # JobHandle: coalesces writes to the job store
+            job.set(status, message, progress)
+            return
         job.status = status
         job.message = message
         if progress is not None:
@@ -20,44 +28,182 @@ def _update(job, status: str, message: str = "", progress: int | None = None):
         pass
 
 
-# ---------- Thumbnails ----------
-
-def generate_pdf_thumbnails(src: Path, out_dir: Path, dpi: int = 110) -> List[Path]:
-    """Best-effort thumbnail generation. If pdf2image/poppler are unavailable, return []."""
+def page_count(src) -> int:
+    """Page count from the page tree root's /Count, without walking every page."""
     try:
-        from pdf2image import convert_from_path  # optional dependency, may require poppler
+        with open(src, 'rb') as f:
+            reader = PdfReader(f)
+            return int(reader.trailer["/Root"]["/Pages"]["/Count"])
     except Exception:
-        return []
+        return 0
+
+
+# ---------- Thumbnails ----------
+
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+THUMBNAIL_CHUNK_PAGES = 8
+
+
+def _rasterize_range(src: Path, first: int, last: int, out_dir: Path, size: int) -> List[Path]:
+    """Render pages first..last with poppler straight to JPEG files at thumbnail size."""
+    from pdf2image import convert_from_path
+    import tempfile
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".render-") as tmp:
+        paths = convert_from_path(
+            str(src), size=size, first_page=first, last_page=last, output_folder=tmp,
+            fmt="jpeg", jpegopt={"quality": 85, "optimize": True}, paths_only=True,
+        )
+        out: List[Path] = []
+        for page, path in zip(range(first, last + 1), sorted(paths)):
+            dest = out_dir / f"{src.stem}_p{page}.jpg"
+            os.replace(path, dest)
+            out.append(dest)
+        return out
+
+
+def iter_pdf_thumbnails(src: Path, out_dir: Path, size: int = 320):
+    """
+    Yield thumbnail paths as page ranges finish. Each range is one pdftoppm
+    process that rasterizes directly at `size` (fit box) and writes JPEGs to
+    disk, so no page image is held in memory here. Up to THUMBNAIL_WORKERS
+    ranges render at once.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    pages = page_count(src)
+    if not pages:
+        return
     out_dir.mkdir(parents=True, exist_ok=True)
+    ranges = [(a, min(pages, a + THUMBNAIL_CHUNK_PAGES - 1)) for a in range(1, pages + 1, THUMBNAIL_CHUNK_PAGES)]
+    with ThreadPoolExecutor(inner_workers(max(1, THUMBNAIL_WORKERS))) as pool:
+        futures = [pool.submit(_rasterize_range, src, a, b, out_dir, size) for a, b in ranges]
+        for fut in as_completed(futures):
+            yield from fut.result()
+
+
+def generate_pdf_thumbnails(src: Path, out_dir: Path, size: int = 320) -> List[Path]:
+    """Best-effort thumbnail generation. If pdf2image/poppler are unavailable, return []."""
     try:
-        images = convert_from_path(str(src), dpi=dpi)
+        paths = list(iter_pdf_thumbnails(src, out_dir, size))
     except Exception:
         return []
-    paths: List[Path] = []
-    for idx, img in enumerate(images, start=1):
-        thumb = img.copy()
-        thumb.thumbnail((320, 320))
-        out_path = out_dir / f"{src.stem}_p{idx}.jpg"
-        thumb.save(out_path, format="JPEG", quality=85)
-        paths.append(out_path)
-    return paths
+    return sorted(paths, key=lambda p: int(p.stem.rsplit("_p", 1)[1]))
 
 
 # ---------- Merge ----------
 
+try:
+    import pikepdf  # optional fast path: object-level copying in qpdf
+except Exception:
+    pikepdf = None
+
+# auto | pikepdf | pypdf2
+MERGE_ENGINE = os.getenv("PDF_MERGE_ENGINE", "auto").lower()
+
+
+def _merge_pypdf2(pdfs: List[str], out_path: Path, job_status):
+    writer = PdfWriter()
+    total = len(pdfs)
+    for i, p in enumerate(pdfs, start=1):
+        reader = PdfReader(p)
+        for page in reader.pages:
+            writer.add_page(page)
+        _update(job_status, "processing", f"Merged {i}/{total}", int(5 + (i/total)*85))
+    with open(out_path, 'wb') as f:
+        writer.write(f)
+
+
+def _object_key(obj, memo: dict, depth: int = 0):
+    """Structural fingerprint of a PDF object; equal keys mean interchangeable objects."""
+    if depth > 16:
+        raise ValueError("object too deep to fingerprint")
+    if not isinstance(obj, pikepdf.Object):
+        return repr(obj)
+    og = obj.objgen if obj.is_indirect else None
+    if og and og in memo:
+        return memo[og]
+    code = obj._type_code
+    if code == pikepdf.ObjectType.stream:
+        items = tuple(sorted((k, _object_key(v, memo, depth + 1)) for k, v in obj.items() if k != "/Length"))
+        key = ("stream", items, hashlib.sha256(obj.read_raw_bytes()).hexdigest())
+    elif code == pikepdf.ObjectType.dictionary:
+        if obj.get("/Type") == pikepdf.Name.Page:
+            raise ValueError("page objects are not shared resources")
+        key = ("dict", tuple(sorted((k, _object_key(v, memo, depth + 1)) for k, v in obj.items())))
+    elif code == pikepdf.ObjectType.array:
+        key = ("array", tuple(_object_key(v, memo, depth + 1) for v in obj))
+    else:
+        key = obj.unparse()
+    if og:
+        memo[og] = key
+    return key
+
+
+def dedupe_resources(pdf) -> int:
+    """
+    Point page /Font and /XObject entries that are byte-identical (the same font
+    program or image embedded by several merged files) at one shared object.
+    Orphaned copies are dropped when the file is saved. Returns how many
+    references were redirected.
+    """
+    canonical: dict = {}
+    memo: dict = {}
+    replaced = 0
+    for page in pdf.pages:
+        resources = page.obj.get("/Resources")
+        if resources is None:
+            continue
+        for category in ("/Font", "/XObject"):
+            entries = resources.get(category)
+            if entries is None:
+                continue
+            for name in list(entries.keys()):
+                ref = entries[name]
+                if not ref.is_indirect:
+                    continue
+                try:
+                    key = _object_key(ref, memo)
+                except ValueError:
+                    continue
+                keep = canonical.setdefault(key, ref)
+                if keep.objgen != ref.objgen:
+                    entries[name] = keep
+                    replaced += 1
+    return replaced
+
+
+def _merge_pikepdf(pdfs: List[str], out_path: Path, job_status):
+    from contextlib import ExitStack
+    total = len(pdfs)
+    # Sources stay open until save: foreign page content is copied lazily
+    with ExitStack() as stack, pikepdf.Pdf.new() as pdf_out:
+        for i, p in enumerate(pdfs, start=1):
+            src = stack.enter_context(pikepdf.Pdf.open(p))
+            pdf_out.pages.extend(src.pages)
+            _update(job_status, "processing", f"Merged {i}/{total}", int(5 + (i/total)*80))
+        deduped = dedupe_resources(pdf_out)
+        _update(job_status, "processing", f"Writing ({deduped} shared resources deduplicated)", 90)
+        pdf_out.save(str(out_path), object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+
+MERGE_ENGINES = {"pypdf2": _merge_pypdf2}
+if pikepdf is not None:
+    MERGE_ENGINES["pikepdf"] = _merge_pikepdf
+
+
+def merge_engine(name: str | None = None):
+    name = (name or MERGE_ENGINE).lower()
+    if name == "auto":
+        name = "pikepdf" if "pikepdf" in MERGE_ENGINES else "pypdf2"
+    if name not in MERGE_ENGINES:
+        raise ValueError(f"Merge engine '{name}' is not available")
+    return MERGE_ENGINES[name]
+
+
 def merge_pdfs_task(pdfs: List[str], out_path: Path, job_status):
     try:
         _update(job_status, "processing", "Merging PDFs", 5)
-        writer = PdfWriter()
-        total = len(pdfs)
-        for i, p in enumerate(pdfs, start=1):
-            reader = PdfReader(p)
-            for page in reader.pages:
-                writer.add_page(page)
-            _update(job_status, "processing", f"Merged {i}/{total}", int(5 + (i/total)*90))
         out_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(out_path, 'wb') as f:
-            writer.write(f)
+        merge_engine()(pdfs, out_path, job_status)
         _update(job_status, "done", f"Saved to {out_path}", 100)
     except Exception as e:
         _update(job_status, "error", str(e))
@@ -84,21 +230,67 @@ def parse_ranges(ranges: str, total_pages: int) -> List[tuple[int, int]]:
     return result
 
 
+# Split fans out to this many processes once a document has SPLIT_PARALLEL_MIN_PAGES pages
+SPLIT_WORKERS = int(os.getenv("SPLIT_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+SPLIT_PARALLEL_MIN_PAGES = int(os.getenv("SPLIT_PARALLEL_MIN_PAGES", 200))
+
+_split_reader = None
+
+
+def _open_mapped(src_pdf: str) -> PdfReader:
+    """PdfReader over a read-only memory map; pages are parsed from the shared page cache."""
+    import mmap
+    with open(src_pdf, 'rb') as f:
+        return PdfReader(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _init_split_worker(src_pdf: str):
+    global _split_reader
+    _split_reader = _open_mapped(src_pdf)
+
+
+def _write_chunks(chunks: List[tuple[int, int, int]], out_dir: Path, reader: PdfReader | None = None) -> int:
+    """Write `(index, first, last)` chunks; each lands under its final name only once complete."""
+    reader = reader or _split_reader
+    for idx, a, b in chunks:
+        writer = PdfWriter()
+        for page in range(a-1, b):
+            writer.add_page(reader.pages[page])
+        out_path = out_dir / f"split_{idx}_{a}-{b}.pdf"
+        tmp_path = out_dir / f".{out_path.name}.part"
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+        os.replace(tmp_path, out_path)
+    return len(chunks)
+
+
 def split_pdf_task(src_pdf: str, ranges: str, out_dir: Path, job_status):
     try:
+        # Start empty so only this run's parts are kept; progress > 0 tells /split/{job}/download it happened
+        shutil.rmtree(out_dir, ignore_errors=True)
+        out_dir.mkdir(parents=True)
         _update(job_status, "processing", "Splitting", 5)
-        reader = PdfReader(src_pdf)
+        reader = _open_mapped(src_pdf)
         total = len(reader.pages)
-        chunks = parse_ranges(ranges, total)
-        for idx, (a, b) in enumerate(chunks, start=1):
-            writer = PdfWriter()
-            for page in range(a-1, b):
-                writer.add_page(reader.pages[page])
-            out_path = out_dir / f"split_{idx}_{a}-{b}.pdf"
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(out_path, 'wb') as f:
-                writer.write(f)
-            _update(job_status, "processing", f"Wrote part {idx}/{len(chunks)}", int(5 + (idx/len(chunks))*90))
+        chunks = [(idx, a, b) for idx, (a, b) in enumerate(parse_ranges(ranges, total), start=1)]
+        workers = min(inner_workers(SPLIT_WORKERS), len(chunks))
+        if workers < 2 or total < SPLIT_PARALLEL_MIN_PAGES:
+            for i, chunk in enumerate(chunks, start=1):
+                _write_chunks([chunk], out_dir, reader)
+                _update(job_status, "processing", f"Wrote part {i}/{len(chunks)}", int(5 + (i/len(chunks))*90))
+        else:
+            import multiprocessing as mp
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            # Small batches keep progress (and the streamed ZIP) moving; each worker maps the source once
+            batch = max(1, min(50, len(chunks) // (workers * 8)))
+            batches = [chunks[i:i + batch] for i in range(0, len(chunks), batch)]
+            done = 0
+            with ProcessPoolExecutor(workers, mp_context=mp.get_context("fork"),
+                                     initializer=_init_split_worker, initargs=(src_pdf,)) as pool:
+                futures = [pool.submit(_write_chunks, b, out_dir) for b in batches]
+                for fut in as_completed(futures):
+                    done += fut.result()
+                    _update(job_status, "processing", f"Wrote {done}/{len(chunks)} parts", int(5 + (done/len(chunks))*90))
         _update(job_status, "done", "Split complete", 100)
     except Exception as e:
         _update(job_status, "error", str(e))
@@ -108,12 +300,16 @@ def split_pdf_task(src_pdf: str, ranges: str, out_dir: Path, job_status):
 
 def reorder_pages_task(src_pdf: str, order: str, out_path: Path, job_status):
     try:
+        from utils.incremental import INCREMENTAL_SAVE, incremental_reorder
         reader = PdfReader(src_pdf)
-        writer = PdfWriter()
         new_order = [int(x.strip()) for x in order.split(',') if x.strip()]
+        new_order = [i for i in new_order if 1 <= i <= len(reader.pages)]
+        if INCREMENTAL_SAVE and incremental_reorder(src_pdf, new_order, out_path):
+            _update(job_status, "done", "Reordered (incremental update)", 100)
+            return
+        writer = PdfWriter()
         for i in new_order:
-            if 1 <= i <= len(reader.pages):
-                writer.add_page(reader.pages[i-1])
+            writer.add_page(reader.pages[i-1])
         out_path.parent.mkdir(parents=True, exist_ok=True)
         with open(out_path, 'wb') as f:
             writer.write(f)
@@ -126,11 +322,15 @@ def reorder_pages_task(src_pdf: str, order: str, out_path: Path, job_status):
 
 def rotate_pages_task(src_pdf: str, degrees: int, pages: str, out_path: Path, job_status):
     try:
-        reader = PdfReader(src_pdf)
-        writer = PdfWriter()
+        from utils.incremental import INCREMENTAL_SAVE, incremental_rotate
         to_rotate = set()
         if pages:
             to_rotate = {int(x.strip()) for x in pages.split(',') if x.strip()}
+        if INCREMENTAL_SAVE and incremental_rotate(src_pdf, degrees, to_rotate, out_path):
+            _update(job_status, "done", "Rotated (incremental update)", 100)
+            return
+        reader = PdfReader(src_pdf)
+        writer = PdfWriter()
         for idx, page in enumerate(reader.pages, start=1):
             if not pages or idx in to_rotate:
                 page.rotate(degrees)
@@ -145,122 +345,132 @@ def rotate_pages_task(src_pdf: str, degrees: int, pages: str, out_path: Path, jo
 
 # ---------- Compress ----------
 
+# Hard cap for one Ghostscript run; the job's own wall-clock/CPU limits still apply
+GS_TIMEOUT = float(os.getenv("GS_TIMEOUT", 540))
+
+
+def _timing(job, name: str, seconds: float):
+    """Report a duration to the executor's /metrics timings (no-op outside a worker)."""
+    if hasattr(job, "metric"):
+        try:
+            job.metric(name, seconds)
+        except Exception:
+            pass
+
+
+def _compress_once(src_pdf: str, preset: str, out_path: Path, progress) -> tuple[str, str]:
+    """
+    One compression run with Ghostscript if available, else the built-in
+    compressor; returns the engine that produced the output ("gs" or
+    "builtin") and a short description. Ghostscript timeouts propagate.
+    """
+    import subprocess
+    from utils.ghostscript import PDFSETTINGS, compress_with_gs, find_gs
+    gs = find_gs()
+    if gs:
+        try:
+            compress_with_gs(gs, src_pdf, out_path, PDFSETTINGS[preset], page_count(src_pdf),
+                             GS_TIMEOUT, progress)
+            return "gs", f"Ghostscript ({preset})"
+        except subprocess.TimeoutExpired:
+            out_path.unlink(missing_ok=True)
+            raise
+        except Exception as e:
+            # Fall back to pure Python
+            progress(f"GS failed, fallback: {e}", 5)
+    from utils.compressor import compress_pdf
+    stats = compress_pdf(src_pdf, out_path, preset, progress)
+    return "builtin", f"{preset}, {stats['images_recompressed']} images recompressed"
+
+
 def compress_pdf_task(src_pdf: str, preset: str, out_path: Path, job_status):
     """
     Try to compress using Ghostscript if available (auto-detected),
-    otherwise perform a safe rewrite via PyPDF2.
-    Presets: low, medium, high (mapped to gs downsample settings).
+    otherwise use the built-in compressor (utils/compressor.py).
+    Presets: low, medium, high, max (mapped to gs downsample settings).
     """
     try:
-        import shutil, subprocess
+        import subprocess, time
+        from utils.ghostscript import PDFSETTINGS
+        preset = (preset or 'medium').lower()
+        if preset not in PDFSETTINGS:
+            raise ValueError(f"Unknown preset '{preset}'")
         _update(job_status, "processing", "Compressing", 5)
         out_path.parent.mkdir(parents=True, exist_ok=True)
-
-        gs = shutil.which('gs') or shutil.which('ghostscript')
-        if gs:
-            # Map presets to quality
-            preset = (preset or 'medium').lower()
-            quality_map = {
-                'low': '/screen',
-                'medium': '/ebook',
-                'high': '/printer',
-                'max': '/prepress'
-            }
-            pdfsettings = quality_map.get(preset, '/ebook')
-            cmd = [
-                gs, '-sDEVICE=pdfwrite', '-dCompatibilityLevel=1.4',
-                f'-dPDFSETTINGS={pdfsettings}', '-dNOPAUSE', '-dQUIET', '-dBATCH',
-                f'-sOutputFile={str(out_path)}', str(src_pdf)
-            ]
-            try:
-                subprocess.run(cmd, check=True)
-                _update(job_status, "done", f"Compressed with Ghostscript ({preset})", 100)
-                return
-            except Exception as e:
-                # Fall back to pure Python
-                _update(job_status, "processing", f"GS failed, fallback: {e}")
-        # Fallback: rewrite using PyPDF2
-        reader = PdfReader(src_pdf)
-        writer = PdfWriter()
-        for page in reader.pages:
-            writer.add_page(page)
-        with open(out_path, 'wb') as f:
-            writer.write(f)
-        _update(job_status, "done", f"Compressed (fallback: {preset})", 100)
+        started = time.monotonic()
+        try:
+            engine, how = _compress_once(src_pdf, preset, out_path, lambda msg, pct: _update(job_status, "processing", msg, pct))
+        except subprocess.TimeoutExpired:
+            _update(job_status, "timeout", f"Ghostscript exceeded {GS_TIMEOUT:.0f}s")
+            return
+        _timing(job_status, f"compress.{engine}.{preset}", time.monotonic() - started)
+        saved = 100 - out_path.stat().st_size * 100 // max(os.path.getsize(src_pdf), 1)
+        _update(job_status, "done", f"Compressed ({how}, {saved}% smaller)", 100)
     except Exception as e:
         _update(job_status, "error", str(e))
 
 
-# ---------- Convert ----------
-from textwrap import wrap as textwrap
-import csv
-from openpyxl import Workbook
-
-def convert_task(src_path: str, target: str, out_path: Path, job_status):
+def compress_to_target_task(src_pdf: str, target_bytes: int, out_path: Path, job_status):
+    """
+    Compress with the least aggressive preset whose output fits `target_bytes`.
+    Presets are tried on a small sample of pages first to estimate the full
+    size, so normally only one full run is needed; if the estimate was too
+    optimistic the next preset is run.
+    """
+    import shutil, subprocess, tempfile
     try:
-        _update(job_status, "processing", "Converting", 5)
-        src = Path(src_path)
-        target = target.lower()
+        from utils.compressor import PRESET_ORDER, estimate_sizes
         out_path.parent.mkdir(parents=True, exist_ok=True)
+        size = os.path.getsize(src_pdf)
+        if size <= target_bytes:
+            shutil.copyfile(src_pdf, out_path)
+            _update(job_status, "done", f"Already under target ({size} bytes)", 100)
+            return
 
-        if src.suffix.lower() == '.pdf' and target == 'docx':
-            import pdfplumber
-            from docx import Document
-            doc = Document()
-            with pdfplumber.open(str(src)) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text() or ''
-                    doc.add_paragraph(text)
-                    doc.add_page_break()
-            doc.save(str(out_path))
-        elif src.suffix.lower() == '.docx' and target == 'pdf':
-            from docx import Document
-            document = Document(str(src))
-            c = canvas.Canvas(str(out_path), pagesize=letter)
-            width, height = letter
-            y = height - 60
-            for para in document.paragraphs:
-                c.setFont("Helvetica", 12)
-                text = para.text
-                for line in textwrap(text, 90):
-                    c.drawString(40, y, line)
-                    y -= 14
-                    if y < 60:
-                        c.showPage()
-                        y = height - 60
-            c.save()
-        elif src.suffix.lower() in ('.jpg', '.jpeg', '.png') and target == 'pdf':
-            img = Image.open(src)
-            img = img.convert('RGB')
-            img.save(str(out_path), "PDF", resolution=100.0)
-        elif src.suffix.lower() == '.txt' and target == 'pdf':
-            c = canvas.Canvas(str(out_path), pagesize=A4)
-            width, height = A4
-            y = height - 40
-            with open(src, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    c.drawString(40, y, line.strip())
-                    y -= 14
-                    if y < 40:
-                        c.showPage()
-                        y = height - 40
-            c.save()
-        elif src.suffix.lower() == '.csv' and target == 'xlsx':
-            wb = Workbook()
-            ws = wb.active
-            with open(src, 'r', encoding='utf-8', errors='ignore') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    ws.append(row)
-            wb.save(str(out_path))
-        elif src.suffix.lower() in ('.jpg', '.jpeg') and target == 'png':
-            Image.open(src).save(str(out_path))
-        elif src.suffix.lower() == '.png' and target == 'jpg':
-            Image.open(src).convert('RGB').save(str(out_path))
+        _update(job_status, "processing", "Estimating sizes on sample pages", 5)
+        quiet = lambda msg, pct: None
+        estimates = estimate_sizes(src_pdf, lambda sample, preset, out: _compress_once(sample, preset, out, quiet),
+                                   target_bytes)
+        fitting = [p for p in PRESET_ORDER if p in estimates and estimates[p] <= target_bytes]
+        start = PRESET_ORDER.index(fitting[0]) if fitting else len(PRESET_ORDER) - 1
+
+        with tempfile.TemporaryDirectory(dir=out_path.parent) as tmp:
+            best = None
+            for preset in PRESET_ORDER[start:]:
+                _update(job_status, "processing", f"Compressing with {preset} (estimate {estimates.get(preset)} bytes)", 30)
+                candidate = Path(tmp) / f"{preset}.pdf"
+                _compress_once(src_pdf, preset, candidate, quiet)
+                got = candidate.stat().st_size
+                if best is None or got < best[1]:
+                    best = (preset, got, candidate)
+                if got <= target_bytes:
+                    break
+            preset, got, candidate = best
+            os.replace(candidate, out_path)
+        if got <= target_bytes:
+            _update(job_status, "done", f"Compressed to {got} bytes with {preset} (target {target_bytes})", 100)
         else:
-            raise ValueError(f"Unsupported conversion: {src.suffix} -> {target}")
+            _update(job_status, "done", f"Target {target_bytes} not reachable; smallest output {got} bytes ({preset})", 100)
+    except subprocess.TimeoutExpired:
+        _update(job_status, "timeout", f"Ghostscript exceeded {GS_TIMEOUT:.0f}s")
+    except Exception as e:
+        _update(job_status, "error", str(e))
 
-        _update(job_status, "done", "Converted", 100)
+
+# ---------- Convert ----------
+
+def convert_task(src_path: str, target: str, out_path: Path, job_status, engine: str | None = None,
+                 monospace: bool = False):
+    try:
+        from utils.converters import convert_file
+        _update(job_status, "processing", "Converting", 5)
+        formats, notes = convert_file(Path(src_path), target, out_path,
+                                      lambda msg, pct: _update(job_status, "processing", msg, pct),
+                                      engine=engine, monospace=monospace)
+        message = "Converted" if len(formats) == 2 else f"Converted via {' -> '.join(formats)}"
+        if notes:
+            message += f" ({', '.join(notes)})"
+        _update(job_status, "done", message, 100)
     except Exception as e:
         _update(job_status, "error", str(e))
 
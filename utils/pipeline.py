@@ -0,0 +1,241 @@
+from __future__ import annotations
+import json
+import os
+import re
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List
+
+from utils.executor import serial_inner_pools
+from utils.ghostscript import PDFSETTINGS
+from utils.pdf_tools import (
+    _update,
+    compress_pdf_task,
+    compress_to_target_task,
+    convert_task,
+    generate_pdf_thumbnails,
+    merge_pdfs_task,
+    reorder_pages_task,
+    rotate_pages_task,
+    split_pdf_task,
+)
+
+UPLOAD_REF = "upload"
+# Threads per pipeline for independent branches (the pipeline itself is one worker process)
+PIPELINE_THREADS = int(os.getenv("PIPELINE_THREADS", 4))
+MAX_STEPS = 32
+# Step ids name directories under the job's output dir, so only plain names are allowed
+STEP_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+# Written next to the results when a pipeline finishes: {"outputs": [final step ids]}
+MANIFEST = ".pipeline.json"
+
+
+class PipelineError(ValueError):
+    pass
+
+
+class _StepStatus:
+    """Captures a task's final `_update` so the pipeline can tell whether a step worked."""
+
+    status = "queued"
+    message = ""
+    progress = 0
+
+
+def _check(status: _StepStatus, label: str):
+    if status.status != "done":
+        raise PipelineError(f"{label}: {status.message or status.status}")
+
+
+# ---------- Step runners: (inputs, params, step_dir) -> outputs ----------
+
+def _merge(inputs: List[Path], params: dict, step_dir: Path) -> List[Path]:
+    out = step_dir / "merged.pdf"
+    st = _StepStatus()
+    merge_pdfs_task([str(p) for p in inputs], out, st)
+    _check(st, "merge")
+    return [out]
+
+
+def _each(task, suffix=".pdf"):
+    """Apply a single-file task to every input, one output per input."""
+    def run(inputs: List[Path], params: dict, step_dir: Path) -> List[Path]:
+        outputs = []
+        for src in inputs:
+            ext = suffix(params) if callable(suffix) else suffix
+            out = step_dir / f"{src.stem}{ext}"
+            st = _StepStatus()
+            task(src, params, out, st)
+            _check(st, src.name)
+            outputs.append(out)
+        return outputs
+    return run
+
+
+def _split(inputs: List[Path], params: dict, step_dir: Path) -> List[Path]:
+    outputs = []
+    for src in inputs:
+        part_dir = step_dir / src.stem if len(inputs) > 1 else step_dir
+        st = _StepStatus()
+        split_pdf_task(str(src), params.get("ranges", ""), part_dir, st)
+        _check(st, src.name)
+        outputs.extend(sorted(part_dir.glob("*.pdf")))
+    return outputs
+
+
+def _thumbnails(inputs: List[Path], params: dict, step_dir: Path) -> List[Path]:
+    outputs = []
+    for src in inputs:
+        thumbs = generate_pdf_thumbnails(src, step_dir)
+        if not thumbs:
+            raise PipelineError(f"thumbnails: could not render {src.name} (pdf2image/poppler missing?)")
+        outputs.extend(thumbs)
+    return outputs
+
+
+STEPS = {
+    "merge": _merge,
+    "split": _split,
+    "reorder": _each(lambda src, p, out, st: reorder_pages_task(str(src), p["order"], out, st)),
+    "rotate": _each(lambda src, p, out, st: rotate_pages_task(
+        str(src), int(p.get("degrees", 90)), p.get("pages", ""), out, st)),
+    "compress": _each(lambda src, p, out, st: compress_to_target_task(str(src), p["target_bytes"], out, st)
+                      if p.get("target_bytes") is not None
+                      else compress_pdf_task(str(src), p.get("preset", "medium"), out, st)),
+    "convert": _each(lambda src, p, out, st: convert_task(
+        str(src), p["target"], out, st, p.get("engine"), bool(p.get("monospace"))),
+                     suffix=lambda p: "." + Path(str(p["target"]).lower()).name),
+    "thumbnails": _thumbnails,
+}
+REQUIRED_PARAMS = {"reorder": ("order",), "convert": ("target",)}
+
+
+def plan(steps: List[dict], uploads: List[str]) -> List[dict]:
+    """
+    Validate pipeline steps and fill in defaults. Each step is
+    `{"id", "operation", "params", "inputs"}`; `inputs` names earlier steps,
+    `"upload"` (every uploaded file) or `"upload:<filename>"`, and defaults to
+    the previous step (the uploads for the first one). Only references to
+    earlier steps are allowed, so the steps always form a DAG.
+    """
+    if not steps:
+        raise PipelineError("Pipeline has no steps")
+    if len(steps) > MAX_STEPS:
+        raise PipelineError(f"Pipeline has more than {MAX_STEPS} steps")
+    names = {Path(u).name for u in uploads}
+    planned: List[dict] = []
+    seen: set[str] = set()
+    for i, raw in enumerate(steps):
+        op = raw.get("operation")
+        if op not in STEPS:
+            raise PipelineError(f"Step {i}: unknown operation '{op}'")
+        step_id = str(raw.get("id") or f"{i + 1}_{op}")
+        if step_id in seen or step_id.startswith(UPLOAD_REF) or not STEP_ID.fullmatch(step_id):
+            raise PipelineError(f"Step {i}: invalid or duplicate id '{step_id}'")
+        params = dict(raw.get("params") or {})
+        missing = [k for k in REQUIRED_PARAMS.get(op, ()) if k not in params]
+        if missing:
+            raise PipelineError(f"Step {step_id}: missing params {', '.join(missing)}")
+        if op == "compress" and params.get("target_bytes") is not None:
+            try:
+                params["target_bytes"] = int(params["target_bytes"])
+            except (TypeError, ValueError):
+                raise PipelineError(f"Step {step_id}: target_bytes must be an integer")
+            if params["target_bytes"] <= 0:
+                raise PipelineError(f"Step {step_id}: target_bytes must be positive")
+        elif op == "compress":
+            params["preset"] = str(params.get("preset") or "medium").lower()
+            if params["preset"] not in PDFSETTINGS:
+                raise PipelineError(f"Step {step_id}: unknown preset '{params['preset']}'")
+        inputs = raw.get("inputs") or [planned[-1]["id"] if planned else UPLOAD_REF]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        for ref in inputs:
+            if ref == UPLOAD_REF:
+                continue
+            if ref.startswith(UPLOAD_REF + ":"):
+                if ref.split(":", 1)[1] not in names:
+                    raise PipelineError(f"Step {step_id}: no uploaded file '{ref.split(':', 1)[1]}'")
+            elif ref not in seen:
+                raise PipelineError(f"Step {step_id}: input '{ref}' is not an earlier step")
+        seen.add(step_id)
+        planned.append({"id": step_id, "operation": op, "params": params, "inputs": list(inputs)})
+    return planned
+
+
+def final_steps(steps: List[dict]) -> List[str]:
+    """Steps whose output no other step consumes (plus any marked `keep`): the pipeline's results."""
+    consumed = {ref for s in steps for ref in s["inputs"]}
+    return [s["id"] for s in steps if s["id"] not in consumed or s["params"].get("keep")]
+
+
+def run_pipeline_task(steps: List[dict], uploads: List[str], work_dir: Path, out_dir: Path, job_status):
+    """
+    Run a planned pipeline inside one worker process. Intermediate results are
+    temp files under `work_dir` (on the job's output volume) that the next step
+    reads directly; independent branches run concurrently on a thread pool,
+    so the steps' own process pools run serially (forking from a threaded
+    process can deadlock).
+    Only the final steps' outputs are moved to `out_dir/<step id>/`, and their
+    ids are recorded in `out_dir/MANIFEST`.
+    """
+    by_name = {Path(u).name: Path(u) for u in uploads}
+    results: Dict[str, List[Path]] = {}
+    deps = {s["id"]: {r for r in s["inputs"] if not r.startswith(UPLOAD_REF)} for s in steps}
+    remaining = {s["id"]: s for s in steps}
+    total = len(steps)
+
+    def resolve(ref: str) -> List[Path]:
+        if ref == UPLOAD_REF:
+            return [Path(u) for u in uploads]
+        if ref.startswith(UPLOAD_REF + ":"):
+            return [by_name[ref.split(":", 1)[1]]]
+        return results[ref]
+
+    def run_step(step: dict) -> List[Path]:
+        inputs = [p for ref in step["inputs"] for p in resolve(ref)]
+        if not inputs:
+            raise PipelineError(f"Step {step['id']}: no input files")
+        step_dir = work_dir / step["id"]
+        step_dir.mkdir(parents=True, exist_ok=True)
+        return STEPS[step["operation"]](inputs, step["params"], step_dir)
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+    (out_dir / MANIFEST).unlink(missing_ok=True)
+    try:
+        _update(job_status, "processing", f"Running {total} steps", 1)
+        with serial_inner_pools(), ThreadPoolExecutor(max_workers=PIPELINE_THREADS) as pool:
+            running = {}
+            while remaining or running:
+                for step_id, step in list(remaining.items()):
+                    if deps[step_id] <= results.keys():
+                        running[pool.submit(run_step, step)] = step_id
+                        del remaining[step_id]
+                if not running:
+                    raise PipelineError("Pipeline has unsatisfiable dependencies")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    step_id = running.pop(fut)
+                    try:
+                        results[step_id] = fut.result()
+                    except Exception:
+                        remaining.clear()  # let running branches finish, start nothing new
+                        for other in running:
+                            other.cancel()
+                        raise
+                    _update(job_status, "processing", f"Finished step {step_id}",
+                            int(5 + len(results) / total * 90))
+
+        finals = final_steps(steps)
+        for step_id in finals:
+            dest = out_dir / step_id
+            shutil.rmtree(dest, ignore_errors=True)
+            os.replace(work_dir / step_id, dest)
+        (out_dir / MANIFEST).write_text(json.dumps({"outputs": finals}))
+        _update(job_status, "done", f"Pipeline complete: {', '.join(finals)}", 100)
+    except Exception as e:
+        _update(job_status, "error", str(e))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Iterable, List, Optional
+
+# Priority classes, most urgent first
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BULK = "bulk"
+PRIORITY_CLASSES = (INTERACTIVE, STANDARD, BULK)
+
+OPERATION_CLASSES = {
+    "reorder": INTERACTIVE,
+    "rotate": INTERACTIVE,
+    "edit_docx": INTERACTIVE,
+    "edit_pdf": INTERACTIVE,
+    "merge": STANDARD,
+    "split": STANDARD,
+    "convert": STANDARD,
+    "pipeline": STANDARD,
+    "compress": BULK,
+}
+
+# Cost model: seconds-ish units = base + per_page * pages + per_mb * megabytes
+_COST = {
+    #            base  per_page  per_mb
+    "reorder":  (0.1,  0.002,    0.02),
+    "rotate":   (0.1,  0.002,    0.02),
+    "edit_docx": (0.1, 0.0,      0.0),
+    "edit_pdf": (0.1,  0.0,      0.0),
+    "merge":    (0.2,  0.005,    0.05),
+    "split":    (0.2,  0.01,     0.05),
+    "convert":  (0.5,  0.05,     0.1),
+    "compress": (1.0,  0.1,      0.5),
+    "pipeline": (1.0,  0.1,      0.5),
+}
+_DEFAULT_COST = (0.5, 0.05, 0.1)
+
+
+def priority_class(operation: str) -> str:
+    return OPERATION_CLASSES.get(operation, STANDARD)
+
+
+def estimate_cost(operation: str, inputs: Iterable[str] = ()) -> float:
+    """Cheap cost estimate from file sizes and PDF page counts (trailer only, no page parsing)."""
+    from utils.pdf_tools import page_count
+    base, per_page, per_mb = _COST.get(operation, _DEFAULT_COST)
+    cost = base
+    for path in inputs:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        cost += per_mb * size / (1024 * 1024)
+        if str(path).lower().endswith(".pdf"):
+            cost += per_page * page_count(path)
+    return cost
+
+
+class FairQueue:
+    """
+    Pending-task queue with strict priority classes, aging and per-tenant fair share.
+
+    `pop` serves the most urgent class that has work, except that a class is
+    promoted one level for every `aging` seconds its oldest task has waited, so
+    bulk work is delayed but never starved. Inside a class, tenants are served
+    by start-time fair queuing: each tenant's virtual time advances by the cost
+    of the tasks it has been given, and the tenant furthest behind goes next, so
+    a tenant submitting thousands of jobs cannot crowd out the others. A tenant
+    with nothing queued keeps no virtual time: when it comes back it starts at
+    the minimum of the active tenants, with no credit banked while it was idle.
+    Tasks must have `tenant`, `cost`, `operation`, `job_id` and `enqueued_at` attributes.
+    """
+
+    def __init__(self, aging: Optional[float] = None):
+        self.aging = aging or float(os.getenv("JOB_PRIORITY_AGING", 60))
+        self._queues: dict[str, OrderedDict[str, deque]] = {c: OrderedDict() for c in PRIORITY_CLASSES}
+        self._vtime: dict[str, float] = {}  # tenants with queued tasks only
+        self._queued: dict[str, int] = {}
+        self._clock = 0.0  # virtual start time of the last task served
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        for tenants in self._queues.values():
+            for q in tenants.values():
+                yield from q
+
+    def push(self, task):
+        tenants = self._queues[priority_class(task.operation)]
+        if task.tenant not in self._vtime:
+            # New or returning tenants start at the current minimum so they get no backlog credit
+            self._vtime[task.tenant] = min(self._vtime.values(), default=self._clock)
+        self._queued[task.tenant] = self._queued.get(task.tenant, 0) + 1
+        tenants.setdefault(task.tenant, deque()).append(task)
+        self._len += 1
+
+    def _dequeued(self, tenant: str):
+        self._len -= 1
+        self._queued[tenant] -= 1
+        if not self._queued[tenant]:
+            del self._queued[tenant]
+            del self._vtime[tenant]
+
+    def pop(self, allowed: Iterable[str] = PRIORITY_CLASSES):
+        """Remove and return the next task from one of the `allowed` classes, or None."""
+        now = time.monotonic()
+        best = None
+        for rank, cls in enumerate(PRIORITY_CLASSES):
+            tenants = self._queues[cls]
+            if cls not in allowed or not tenants:
+                continue
+            oldest = min(q[0].enqueued_at for q in tenants.values())
+            effective = rank - int((now - oldest) / self.aging)
+            if best is None or effective < best[0]:
+                best = (effective, cls)
+        if best is None:
+            return None
+        tenants = self._queues[best[1]]
+        tenant = min(tenants, key=lambda t: self._vtime[t])
+        q = tenants[tenant]
+        task = q.popleft()
+        if not q:
+            del tenants[tenant]
+        self._clock = self._vtime[tenant]
+        self._vtime[tenant] += task.cost
+        self._dequeued(tenant)
+        return task
+
+    def remove(self, job_id: str):
+        """Remove and return the pending task for `job_id`, or None."""
+        for tenants in self._queues.values():
+            for tenant, q in tenants.items():
+                for task in q:
+                    if task.job_id == job_id:
+                        q.remove(task)
+                        if not q:
+                            del tenants[tenant]
+                        self._dequeued(tenant)
+                        return task
+        return None
+
+    def drain(self) -> List:
+        tasks = list(self)
+        for tenants in self._queues.values():
+            tenants.clear()
+        self._vtime.clear()
+        self._queued.clear()
+        self._len = 0
+        return tasks
@@ -0,0 +1,168 @@
+from __future__ import annotations
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+# Characters read per chunk; lines are cut from the chunks, so memory does not depend on file size
+TXT_CHUNK_CHARS = 1 << 20
+MARGIN = 40.0
+# (font, size, leading) per layout
+LAYOUTS = {
+    "proportional": ("Helvetica", 12.0, 14.0),
+    "monospace": ("Courier", 9.0, 11.0),
+}
+# C0 controls other than tab and form feed cannot be drawn; drop them
+_CONTROL = {c: None for c in (*range(0, 9), 11, 13, *range(14, 32), 127)}
+
+ProgressFn = Callable[[str, int], None]
+
+
+def iter_lines(src: Path, progress: Optional[ProgressFn] = None) -> Iterator[Optional[str]]:
+    """Lines of `src` (tabs expanded) read chunk by chunk; None marks a form feed (page break)."""
+    total = max(os.path.getsize(src), 1)
+    rest = ""
+    with open(src, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            chunk = f.read(TXT_CHUNK_CHARS)
+            if not chunk:
+                break
+            lines = (rest + chunk.translate(_CONTROL)).split("\n")
+            rest = lines.pop()
+            for line in lines:
+                if "\f" in line:
+                    parts = line.split("\f")
+                    yield parts[0].expandtabs(4)
+                    for part in parts[1:]:
+                        yield None
+                        if part:
+                            yield part.expandtabs(4)
+                    continue
+                yield line.expandtabs(4) if "\t" in line else line
+            if progress:
+                progress("Rendering text", int(f.buffer.tell() / total * 95))
+    if rest:
+        yield rest.expandtabs(4)
+
+
+def wrap_monospace(line: str, cols: int) -> List[str]:
+    """Break at the last space that keeps at least half a line, else hard at `cols`."""
+    out = []
+    while len(line) > cols:
+        cut = line.rfind(" ", 0, cols + 1)
+        if cut < cols // 2:
+            cut = cols
+        out.append(line[:cut].rstrip(" "))
+        line = line[cut:].lstrip(" ")
+    out.append(line)
+    return out
+
+
+class _ProportionalWrapper:
+    def __init__(self, font: str, size: float, max_width: float):
+        from utils.docx_layout import METRICS
+        self.font, self.size, self.max_width = font, size, max_width
+        self.width = METRICS.width
+        # Lines with at most this many characters fit whatever they contain
+        widest = max(self.width(chr(c), font, size) for c in range(32, 127))
+        self.safe_chars = int(max_width // widest)
+
+    def __call__(self, line: str) -> List[str]:
+        if len(line) <= self.safe_chars:
+            return [line]
+        # Measure word by word: word widths are cached, whole lines rarely repeat
+        out: List[str] = []
+        current, current_width = "", 0.0
+        space = self.width(" ", self.font, self.size)
+        for word in line.split(" "):
+            w = self.width(word, self.font, self.size)
+            if current and current_width + space + w > self.max_width:
+                out.append(current)
+                current, current_width = "", 0.0
+            while w > self.max_width:
+                # A word wider than the line: break it by characters
+                cut, acc = 0, 0.0
+                for ch in word:
+                    acc += self.width(ch, self.font, self.size)
+                    if acc > self.max_width:
+                        break
+                    cut += 1
+                out.append(word[:max(cut, 1)])
+                word = word[max(cut, 1):]
+                w = self.width(word, self.font, self.size)
+            if current:
+                current += " " + word
+                current_width += space + w
+            else:
+                current, current_width = word, w
+        out.append(current)
+        return out
+
+
+@contextmanager
+def _binary_streams():
+    """
+    Write page streams Flate-compressed only. reportlab adds ASCII85 on top by
+    default, which is 25% larger and, without its C accelerator, costs about as
+    much time as laying out the text.
+    """
+    from reportlab import rl_config
+    saved = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = saved
+
+
+def txt_to_pdf(src: Path, out_path: Path, monospace: bool = False,
+               progress: Optional[ProgressFn] = None, pagesize=None) -> int:
+    """
+    Render a text file into PDF pages with one reportlab text object per page:
+    the font is set once per page and each line is a single `T*` line, with
+    long lines wrapped to the page width. `monospace` uses Courier and wraps
+    by column count, which is the fastest layout for logs. Returns the page count.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    width, height = pagesize or A4
+    font, size, leading = LAYOUTS["monospace" if monospace else "proportional"]
+    max_width = width - 2 * MARGIN
+    if monospace:
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        cols = max(1, int(max_width // stringWidth("M", font, size)))
+        wrap = lambda line: [line] if len(line) <= cols else wrap_monospace(line, cols)
+    else:
+        wrap = _ProportionalWrapper(font, size, max_width)
+    per_page = max(1, int((height - 2 * MARGIN) // leading))
+
+    with _binary_streams():
+        c = canvas.Canvas(str(out_path), pagesize=(width, height), pageCompression=1)
+        pages = 0
+        text, used = None, 0
+
+        def new_page():
+            nonlocal text, used, pages
+            if text is not None:
+                c.drawText(text)
+                c.showPage()
+            text = c.beginText(MARGIN, height - MARGIN - size)
+            text.setFont(font, size, leading)
+            used = 0
+            pages += 1
+
+        new_page()
+        for line in iter_lines(src, progress):
+            if line is None:
+                if used:
+                    new_page()
+                continue
+            for piece in wrap(line):
+                if used == per_page:
+                    new_page()
+                text.textLine(piece)
+                used += 1
+        c.drawText(text)
+        c.showPage()
+        c.save()
+    return pages
@@ -0,0 +1,215 @@
+from __future__ import annotations
+import fcntl
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+from PIL import Image, features
+
+THUMBNAIL_SIZE = 320
+MIN_SIZE, MAX_SIZE = 32, 1024
+SPRITE_SIZE = 160
+SPRITE_COLUMNS = 10
+SPRITE_PER_SHEET = 50
+MAX_PER_SHEET = 100
+# Sheets are rendered in the web process: bound tile size and total pixels per sheet (~12 MB as RGB)
+MAX_SPRITE_SIZE = 256
+MAX_SHEET_PIXELS = 2048 * 2048
+THUMBNAIL_CACHE_BYTES = int(os.getenv("THUMBNAIL_CACHE_BYTES", 512 * 1024 * 1024))
+
+
+class RasterizerUnavailable(RuntimeError):
+    pass
+
+
+# name -> (Pillow format, file extension, media type, save options)
+_FORMATS = {
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 85}),
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", "avif", "image/avif", {"quality": 60}),
+}
+
+
+def available_formats() -> list[str]:
+    """Output formats this Pillow build can encode (AVIF needs Pillow >= 11.2 or a plugin)."""
+    out = ["jpeg"]
+    if features.check("webp"):
+        out.append("webp")
+    if "AVIF" in Image.SAVE:
+        out.append("avif")
+    return out
+
+
+def image_format(name: str) -> str:
+    """Canonical format name for `name`; ValueError if this build cannot encode it."""
+    name = (name or "jpeg").lower()
+    if name == "jpg":
+        name = "jpeg"
+    if name not in available_formats():
+        raise ValueError(f"Unsupported image format '{name}'; available: {', '.join(available_formats())}")
+    return name
+
+
+def media_type(fmt: str) -> str:
+    return _FORMATS[fmt][2]
+
+
+def render_page(src: Path, page: int, size: int = THUMBNAIL_SIZE) -> Image.Image:
+    """Rasterize one page (1-based) directly at the size that fits `size` x `size`."""
+    try:
+        from pdf2image import convert_from_path  # optional dependency, requires poppler
+    except Exception as e:
+        raise RasterizerUnavailable("pdf2image is not installed") from e
+    try:
+        images = convert_from_path(str(src), size=size, first_page=page, last_page=page)
+    except Exception as e:
+        raise RasterizerUnavailable(str(e)) from e
+    if not images:
+        raise ValueError(f"Page {page} could not be rendered")
+    return images[0]
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of rendered pages and sprite sheets keyed by file digest +
+    name (page or sheet, size) + format, with
+    LRU eviction under a byte budget. A hit refreshes the file's mtime; once
+    the cache outgrows `budget`, the least recently used files are removed
+    until it is back under 90% of it. Safe to share between server processes.
+    """
+
+    def __init__(self, root: Path, budget: int = THUMBNAIL_CACHE_BYTES):
+        self.root = root
+        self.budget = budget
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._size: Optional[int] = None  # this process's running estimate
+
+    def path(self, digest: str, name: str, fmt: str = "jpeg") -> Path:
+        return self.root / digest[:2] / f"{digest}_{name}.{_FORMATS[fmt][1]}"
+
+    def get(self, digest: str, name: str, render: Callable[[], Image.Image], fmt: str = "jpeg") -> Path:
+        """Cached image `name` (e.g. `p3_320`) of the file `digest`, rendering it on a miss."""
+        pil_format, _, _, options = _FORMATS[fmt]
+        path = self.path(digest, name, fmt)
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+        img = render()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        img.convert("RGB").save(tmp, format=pil_format, **options)
+        added = tmp.stat().st_size
+        os.replace(tmp, path)
+        self._account(added)
+        return path
+
+    def get_json(self, digest: str, name: str, compute: Callable[[], dict]) -> dict:
+        """Cached JSON data `name` of the file `digest` (e.g. a sprite index), computed on a miss."""
+        path = self.root / digest[:2] / f"{digest}_{name}.json"
+        try:
+            data = json.loads(path.read_text())
+            os.utime(path)
+            return data
+        except (FileNotFoundError, ValueError):
+            pass
+        data = compute()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(data))
+        added = tmp.stat().st_size
+        os.replace(tmp, path)
+        self._account(added)
+        return data
+
+    def _entries(self):
+        for p in self.root.glob("*/*"):
+            if p.name.startswith("."):
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            yield st.st_mtime, st.st_size, p
+
+    def _account(self, added: int):
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += added
+        if self._size > self.budget:
+            self.evict()
+
+    def evict(self):
+        with open(self.root / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            goal = int(self.budget * 0.9)
+            for _, size, path in entries:
+                if total <= goal:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+            self._size = total
+
+
+def clamp_size(size: int) -> int:
+    return max(MIN_SIZE, min(MAX_SIZE, size))
+
+
+# ---------- Sprite sheets ----------
+
+def clamp_sprite(per_sheet: int, size: int) -> tuple[int, int]:
+    """Tile size within MIN_SIZE..MAX_SPRITE_SIZE, and at most as many tiles as fit in MAX_SHEET_PIXELS."""
+    size = max(MIN_SIZE, min(MAX_SPRITE_SIZE, size))
+    return max(1, min(MAX_PER_SHEET, MAX_SHEET_PIXELS // (size * size), per_sheet)), size
+
+
+def _tile_size(page, size: int) -> tuple[int, int]:
+    w, h = float(page.mediabox.width), float(page.mediabox.height)
+    if int(page.get("/Rotate", 0)) % 180:
+        w, h = h, w
+    scale = size / max(w, h, 1)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def sprite_index(src: Path, size: int, per_sheet: int, columns: int = SPRITE_COLUMNS) -> dict:
+    """
+    Layout of every page on sprite sheets of `per_sheet` tiles: one
+    `size` x `size` cell per page, row-major, with the page's scaled box at the
+    cell's top-left corner. Computed from the page boxes only, nothing is rendered.
+    """
+    from PyPDF2 import PdfReader
+    reader = PdfReader(str(src))
+    columns = max(1, min(columns, per_sheet))
+    sheets: list[list[dict]] = []
+    for n, page in enumerate(reader.pages):
+        slot = n % per_sheet
+        if slot == 0:
+            sheets.append([])
+        w, h = _tile_size(page, size)
+        sheets[-1].append({"page": n + 1, "x": (slot % columns) * size, "y": (slot // columns) * size, "w": w, "h": h})
+    return {"tile": size, "columns": columns, "per_sheet": per_sheet, "pages": len(reader.pages), "sheets": sheets}
+
+
+def render_sheet(src: Path, tiles: list[dict], size: int, columns: int) -> Image.Image:
+    """Render the pages of one sheet with a single poppler run and paste them into place."""
+    try:
+        from pdf2image import convert_from_path
+    except Exception as e:
+        raise RasterizerUnavailable("pdf2image is not installed") from e
+    rows = (len(tiles) + columns - 1) // columns
+    sheet = Image.new("RGB", (min(len(tiles), columns) * size, rows * size), "white")
+    try:
+        images = convert_from_path(str(src), size=size, first_page=tiles[0]["page"], last_page=tiles[-1]["page"])
+    except Exception as e:
+        raise RasterizerUnavailable(str(e)) from e
+    for tile, img in zip(tiles, images):
+        if img.size != (tile["w"], tile["h"]):
+            img = img.resize((tile["w"], tile["h"]))
+        sheet.paste(img, (tile["x"], tile["y"]))
+    return sheet
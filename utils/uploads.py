@@ -0,0 +1,296 @@
+from __future__ import annotations
+import fcntl
+import hashlib
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+from utils.blob_store import MANIFEST_NAME, BlobStore, record_digest
+
+
+class UploadRejected(ValueError):
+    """Raised when an upload breaks a limit (type, size, malformed body)."""
+
+
+# ---------- Streaming multipart ----------
+
+class StreamingUploadParser:
+    """
+    Incremental multipart/form-data parser that writes every file part straight
+    to `dest_dir` as bytes arrive. Nothing is spooled: memory per upload is one
+    network chunk plus the write buffer, and `max_size` is enforced mid-stream so
+    an oversize file aborts the request without reading the rest of the body.
+
+    With a `blob_store`, parts are hashed while they stream into the store's temp
+    area, deduplicated by digest and hardlinked into `dest_dir`.
+    """
+
+    def __init__(
+        self,
+        content_type: str,
+        dest_dir: Path,
+        allowed_types: Iterable[str],
+        max_size: int,
+        chunk_size: int = 1024 * 1024,
+        blob_store: Optional[BlobStore] = None,
+    ):
+        _, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise UploadRejected("Expected multipart/form-data with a boundary")
+        self.dest_dir = dest_dir
+        self.allowed_types = set(allowed_types)
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.blob_store = blob_store
+        self.saved: List[Path] = []
+        self.digests: dict[str, str] = {}
+
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._out = None
+        self._out_path: Optional[Path] = None
+        self._tmp_path: Optional[Path] = None
+        self._hash = None
+        self._written = 0
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    # parser callbacks
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if not filename:
+            return  # plain form field or empty file input; ignored
+        filename = filename.decode("utf-8", errors="replace")
+        content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+        if content_type not in self.allowed_types:
+            raise UploadRejected(f"Unsupported type: {content_type}")
+        safe_name = Path(filename).name
+        if not safe_name or safe_name.startswith("."):
+            raise UploadRejected(f"Invalid file name: {filename}")
+        self._out_path = self.dest_dir / safe_name
+        self._tmp_path = self.blob_store.tmp_path() if self.blob_store else self._out_path
+        self._out = open(self._tmp_path, "wb", buffering=self.chunk_size)
+        self._hash = hashlib.sha256()
+        self._written = 0
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._out is None:
+            return
+        self._written += end - start
+        if self._written > self.max_size:
+            raise UploadRejected(f"File too large: {self._out_path.name}")
+        chunk = data[start:end]
+        self._hash.update(chunk)
+        self._out.write(chunk)
+
+    def _on_part_end(self):
+        if self._out is None:
+            return
+        self._out.close()
+        self._out = None
+        digest = self._hash.hexdigest()
+        if self.blob_store:
+            blob = self.blob_store.ingest(self._tmp_path, digest)
+            self.blob_store.link_into(blob, self._out_path)
+            record_digest(self.dest_dir, self._out_path.name, digest)
+        self.saved.append(self._out_path)
+        self.digests[self._out_path.name] = digest
+        self._out_path = None
+
+    # public API
+
+    def feed(self, chunk: bytes):
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadRejected(f"Malformed multipart body: {e}")
+
+    def finish(self) -> List[Path]:
+        try:
+            self._parser.finalize()
+        except MultipartParseError as e:
+            raise UploadRejected(f"Malformed multipart body: {e}")
+        if self._out is not None:
+            self.abort()
+            raise UploadRejected("Truncated multipart body")
+        return self.saved
+
+    def abort(self):
+        """Close and remove the partially written file, if any."""
+        if self._out is not None:
+            self._out.close()
+            self._tmp_path.unlink(missing_ok=True)
+            self._out = None
+            self._out_path = None
+
+    def discard(self):
+        """`abort`, then remove every file this upload already saved (and the digest manifest) from `dest_dir`."""
+        self.abort()
+        for path in self.saved:
+            path.unlink(missing_ok=True)
+        self.saved.clear()
+        self.digests.clear()
+        (self.dest_dir / MANIFEST_NAME).unlink(missing_ok=True)
+
+
+# ---------- Resumable sessions ----------
+
+class UploadConflict(ValueError):
+    """Raised when a chunk does not start at the session's current offset."""
+
+
+_MAGIC = {
+    "application/pdf": (b"%PDF-",),
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (b"PK\x03\x04",),
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": (b"PK\x03\x04",),
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": (b"PK\x03\x04",),
+}
+
+
+def validate_upload(path: Path, content_type: str):
+    """Cheap integrity check run before any task sees a file: magic bytes, and for PDFs a parse."""
+    with open(path, "rb") as f:
+        head = f.read(1024)
+    magics = _MAGIC.get(content_type)
+    if magics and not any(m in head for m in magics):
+        raise UploadRejected(f"File content does not match {content_type}")
+    if content_type == "application/pdf":
+        from PyPDF2 import PdfReader
+        try:
+            len(PdfReader(str(path)).pages)
+        except Exception as e:
+            raise UploadRejected(f"Invalid PDF: {e}")
+
+
+class _ChunkWriter:
+    def __init__(self, f, limit: int):
+        self._f = f
+        self._limit = limit
+
+    def write(self, chunk: bytes):
+        if self._f.tell() + len(chunk) > self._limit:
+            raise UploadRejected("Chunk exceeds declared upload length")
+        self._f.write(chunk)
+
+
+class ResumableUpload:
+    """
+    tus-style upload session stored inside the job's upload directory.
+
+    The partial file is `.<upload_id>.part` and its metadata `.<upload_id>.json`;
+    the current offset is simply the size of the part file, which is fsynced
+    after every chunk, so a restarted server resumes exactly where it stopped.
+    Dotfiles are ignored by every task, so nothing sees the file until
+    `finalize` validates it and renames it into place.
+    """
+
+    def __init__(self, dest_dir: Path, upload_id: str):
+        self.dest_dir = dest_dir
+        self.upload_id = upload_id
+        self.part_path = dest_dir / f".{upload_id}.part"
+        self.meta_path = dest_dir / f".{upload_id}.json"
+
+    @classmethod
+    def create(cls, dest_dir: Path, filename: str, length: int, content_type: str) -> "ResumableUpload":
+        safe_name = Path(filename).name
+        if not safe_name or safe_name.startswith("."):
+            raise UploadRejected(f"Invalid file name: {filename}")
+        session = cls(dest_dir, uuid.uuid4().hex)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        session.part_path.touch()
+        session.meta_path.write_text(json.dumps({
+            "filename": safe_name,
+            "length": length,
+            "content_type": content_type,
+        }))
+        return session
+
+    @property
+    def meta(self) -> dict:
+        try:
+            return json.loads(self.meta_path.read_text())
+        except FileNotFoundError:
+            raise LookupError("Upload session not found")
+
+    @property
+    def length(self) -> int:
+        return int(self.meta["length"])
+
+    @property
+    def offset(self) -> int:
+        try:
+            return self.part_path.stat().st_size
+        except FileNotFoundError:
+            raise LookupError("Upload session not found")
+
+    @contextmanager
+    def writer(self, offset: int):
+        """Yield a writer appending at `offset` under an exclusive lock; fsyncs on exit."""
+        length = self.length
+        with open(self.part_path, "r+b") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflict("Another chunk is being written to this upload")
+            try:
+                current = os.fstat(f.fileno()).st_size
+                if offset != current:
+                    raise UploadConflict(f"Offset mismatch: expected {current}")
+                f.seek(current)
+                try:
+                    yield _ChunkWriter(f, length)
+                finally:
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def finalize(self, blob_store: Optional[BlobStore] = None) -> Path:
+        meta = self.meta
+        if self.offset != int(meta["length"]):
+            raise UploadConflict(f"Upload incomplete: {self.offset}/{meta['length']} bytes")
+        validate_upload(self.part_path, meta["content_type"])
+        out_path = self.dest_dir / meta["filename"]
+        self.part_path.replace(out_path)
+        self.meta_path.unlink(missing_ok=True)
+        if blob_store:
+            # Hash state can't survive a restart, so hash once on completion
+            record_digest(self.dest_dir, out_path.name, blob_store.ingest_file(out_path))
+        return out_path
+
+    def discard(self):
+        self.part_path.unlink(missing_ok=True)
+        self.meta_path.unlink(missing_ok=True)